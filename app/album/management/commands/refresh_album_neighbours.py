@@ -0,0 +1,37 @@
+"""
+Django command to recompute the albums often listed together.
+"""
+from django.core.management.base import BaseCommand
+
+from album.neighbours import refresh_neighbours
+
+
+class Command(BaseCommand):
+    """Django command to refresh album neighbours."""
+
+    help = (
+        'Recompute the neighbours of albums whose lists changed, or of '
+        'every album with --all.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute the neighbours of every album.',
+        )
+        parser.add_argument(
+            '--processes',
+            type=int,
+            help='Worker processes scoring chunks of albums.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        refreshed = refresh_neighbours(
+            full=options['all'],
+            processes=options['processes'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed neighbours of {refreshed} albums.'
+        ))
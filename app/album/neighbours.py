@@ -0,0 +1,186 @@
+"""
+Albums often listed together, precomputed from public lists.
+
+Lists are read as a sparse album-by-list incidence matrix, counting an
+album on a list when it scores on the community chart. The neighbours of
+an album are the albums with the highest cosine similarity to it, the
+number of lists they share divided by the geometric mean of the number of
+lists each is on. Albums are scored in chunks, optionally spread across a
+process pool.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+import numpy as np
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from core.models import AlbumNeighbour, AlbumNeighbourQueue, Entry
+from chart.scoring import score_entries
+
+
+class Incidence:
+    """Album-by-list incidence matrix stored both row and column wise."""
+
+    def __init__(self, list_ids, album_ids):
+        self.albums, album_index = np.unique(album_ids, return_inverse=True)
+        lists, list_index = np.unique(list_ids, return_inverse=True)
+        self.album_lists = self._compress(
+            album_index, list_index, len(self.albums),
+        )
+        self.list_albums = self._compress(
+            list_index, album_index, len(lists),
+        )
+        self.degrees = np.diff(self.album_lists[0]).astype(np.float64)
+
+    @staticmethod
+    def _compress(rows, columns, count):
+        """Return ``(indptr, indices)`` of a CSR matrix of ones."""
+        order = np.argsort(rows, kind='stable')
+        indptr = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=count), out=indptr[1:])
+        return indptr, columns[order]
+
+    @staticmethod
+    def _gather(csr, rows):
+        """Return the row and column of every stored value in rows."""
+        indptr, indices = csr
+        starts, stops = indptr[rows], indptr[rows + 1]
+        sizes = stops - starts
+        owners = np.repeat(np.arange(len(rows)), sizes)
+        offsets = np.arange(sizes.sum()) - np.repeat(
+            np.cumsum(sizes) - sizes, sizes,
+        )
+        return owners, indices[np.repeat(starts, sizes) + offsets]
+
+    def neighbours(self, rows, top_k):
+        """Return the top_k neighbours of album indexes rows.
+
+        Returns ``(albums, neighbours, ranks, scores)`` with album ids.
+        """
+        owners, lists = self._gather(self.album_lists, rows)
+        pair_owners, targets = self._gather(self.list_albums, lists)
+        sources = rows[owners[pair_owners]]
+        keep = sources != targets
+        sources, targets = sources[keep], targets[keep]
+        pairs, shared = np.unique(
+            sources * len(self.albums) + targets, return_counts=True,
+        )
+        sources, targets = np.divmod(pairs, len(self.albums))
+        scores = shared / np.sqrt(
+            self.degrees[sources] * self.degrees[targets]
+        )
+        order = np.lexsort((self.albums[targets], -scores, sources))
+        sources, targets, scores = (
+            sources[order], targets[order], scores[order],
+        )
+        starts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+        sizes = np.diff(np.append(starts, len(sources)))
+        ranks = np.arange(len(sources)) - np.repeat(starts, sizes)
+        keep = ranks < top_k
+        return (
+            self.albums[sources[keep]],
+            self.albums[targets[keep]],
+            ranks[keep],
+            scores[keep],
+        )
+
+
+_incidence = None
+
+
+def _init_worker(incidence):
+    global _incidence
+    _incidence = incidence
+
+
+def _neighbours_chunk(args):
+    rows, top_k = args
+    return _incidence.neighbours(rows, top_k)
+
+
+def load_incidence(batch_size=5000):
+    """Read the incidence matrix of public lists from their entries."""
+    rows = Entry.objects.filter(owner_list__public=True).order_by(
+        'owner_list_id', 'position', 'id',
+    ).values_list('owner_list_id', 'album_id')
+    entries = np.fromiter(
+        chain.from_iterable(rows.iterator(chunk_size=batch_size)),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    (lists, albums, _points), _chart = score_entries(
+        entries[:, 0], entries[:, 1],
+    )
+    return Incidence(lists, albums)
+
+
+def compute_neighbours(incidence, album_ids=None, top_k=None,
+                       chunk_size=None, processes=None):
+    """Yield neighbour arrays for album_ids, or every album, by chunk."""
+    options = getattr(settings, 'ALBUM_NEIGHBOURS', {})
+    top_k = top_k or options.get('TOP_K', 10)
+    chunk_size = chunk_size or options.get('CHUNK_SIZE', 1000)
+    processes = processes or options.get('PROCESSES', 1)
+    if album_ids is None:
+        rows = np.arange(len(incidence.albums))
+    else:
+        rows = np.flatnonzero(np.isin(incidence.albums, album_ids))
+    chunks = [
+        (rows[start:start + chunk_size], top_k)
+        for start in range(0, len(rows), chunk_size)
+    ]
+    if processes <= 1 or len(chunks) <= 1:
+        _init_worker(incidence)
+        yield from map(_neighbours_chunk, chunks)
+        return
+    # Forked workers must not share the parent's database connections.
+    connections.close_all()
+    with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(incidence,)) as pool:
+        yield from pool.map(_neighbours_chunk, chunks)
+
+
+def refresh_neighbours(album_ids=None, full=False, **options):
+    """Recompute the neighbours of album_ids, or of every album if full.
+
+    Without either only the queued albums are refreshed. Queue entries
+    are cleared once done unless their album was queued again meanwhile.
+    Returns the number of albums refreshed.
+    """
+    started = timezone.now()
+    queued = AlbumNeighbourQueue.objects.filter(queued_at__lte=started)
+    if album_ids is None and not full:
+        album_ids = list(queued.values_list('album_id', flat=True))
+        if not album_ids:
+            return 0
+    incidence = load_incidence()
+    results = list(compute_neighbours(incidence, album_ids, **options))
+    table = connection.ops.quote_name(AlbumNeighbour._meta.db_table)
+    with transaction.atomic():
+        if album_ids is None:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table}')
+        else:
+            AlbumNeighbour.objects.filter(album_id__in=album_ids).delete()
+            queued = queued.filter(album_id__in=album_ids)
+        queued.delete()
+        for albums, neighbours, ranks, scores in results:
+            AlbumNeighbour.objects.bulk_create([
+                AlbumNeighbour(
+                    album_id=album_id,
+                    neighbour_id=neighbour_id,
+                    rank=rank,
+                    score=score,
+                )
+                for album_id, neighbour_id, rank, score in zip(
+                    albums.tolist(), neighbours.tolist(),
+                    ranks.tolist(), scores.tolist(),
+                )
+            ], batch_size=5000)
+    if album_ids is None:
+        return len(incidence.albums)
+    return len(album_ids)
@@ -5,7 +5,7 @@ from rest_framework import serializers
 
 from django.contrib.auth.validators import UnicodeUsernameValidator
 
-from core.models import Album, Artist, Genre
+from core.models import Album, AlbumNeighbour, Artist, Genre
 
 
 class ArtistHelperSerializer(serializers.ModelSerializer):
@@ -55,8 +55,12 @@ class AlbumSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Album
-        fields = ['id', 'title', 'artist', 'release_date', 'avg_rating', 'rating_count', 'primary_genres', 'secondary_genres', 'image']
-        read_only_fields = ['id']
+        fields = [
+            'id', 'title', 'artist', 'release_date', 'avg_rating',
+            'rating_count', 'primary_genres', 'secondary_genres', 'image',
+            'list_count', 'public_list_count',
+        ]
+        read_only_fields = ['id', 'list_count', 'public_list_count']
 
 
     def _get_or_create_artist(self, artists, album):
@@ -111,6 +115,25 @@ class AlbumSerializer(serializers.ModelSerializer):
         return instance
 
 
+class AlbumNeighbourSerializer(serializers.ModelSerializer):
+    """Serializer for an album often listed together with another."""
+    id = serializers.IntegerField(source='neighbour_id', read_only=True)
+    title = serializers.CharField(source='neighbour.title', read_only=True)
+
+    class Meta:
+        model = AlbumNeighbour
+        fields = ['id', 'title', 'score']
+        read_only_fields = fields
+
+
+class AlbumDetailSerializer(AlbumSerializer):
+    """Serializer for album detail view."""
+    neighbours = AlbumNeighbourSerializer(many=True, read_only=True)
+
+    class Meta(AlbumSerializer.Meta):
+        fields = AlbumSerializer.Meta.fields + ['neighbours']
+
+
 class AlbumImageSerializer(serializers.ModelSerializer):
     """Serializer for uploading images to albums."""
 
@@ -14,7 +14,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Album, Artist, Genre
+from core.models import Album, Artist, Entry, Genre, List
 
 from album.serializers import AlbumSerializer
 
@@ -774,6 +774,31 @@ class PrivateAlbumSuperuserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data['results'], serializer.data)
 
+    def test_sort_album_by_popularity_desc(self):
+        """Test sorting album list by the public lists they are on."""
+        album3 = create_album()
+        album1 = create_album(title='Sample Album 2')
+        album2 = create_album(title='Sample Album 3')
+        for albums in [[album1, album2], [album1]]:
+            album_list = List.objects.create(
+                user=self.user, label='Sample', public=True,
+            )
+            for album in albums:
+                Entry.objects.create(album=album, owner_list=album_list)
+        for album in [album1, album2, album3]:
+            album.refresh_from_db()
+
+        query_params = {
+            'sortby': '-popularity'
+        }
+
+        res = self.client.get(ALBUMS_URL, query_params)
+
+        serializer = AlbumSerializer([album1, album2, album3], many=True)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(res.data['results'][0]['public_list_count'], 2)
+
 class ImageUploadTests(TestCase):
     """Tests for image upload API"""
 
@@ -0,0 +1,64 @@
+"""
+Tests for the async album list view.
+"""
+import json
+from datetime import date
+
+from asgiref.sync import async_to_sync
+
+from django.test import AsyncRequestFactory, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from album.tests.test_album_api import create_album
+from album.views import album_list_async
+from core.models import Genre
+
+
+ALBUMS_URL = reverse('album:album-list')
+
+
+class AsyncAlbumListTests(TransactionTestCase):
+    """Test listing albums through the ASGI application."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.factory = AsyncRequestFactory()
+        rock = Genre.objects.create(name='Rock')
+        pop = Genre.objects.create(name='Pop')
+        for year in range(1990, 2020):
+            album = create_album(
+                title=f'Album {year}',
+                release_date=date(year, 1, 1),
+                rating_count=year,
+            )
+            album.primary_genres.add(rock if year % 2 else pop)
+            album.secondary_genres.add(pop)
+
+    def _list(self, params):
+        request = self.factory.get(ALBUMS_URL, params)
+        return async_to_sync(album_list_async)(request)
+
+    def test_matches_sync_list(self):
+        """Test async pages equal the sync view's pages."""
+        for params in [
+            {},
+            {'page': 2},
+            {'sortby': '-year'},
+            {'year': '2000,2010', 'sortby': 'ratingcount'},
+            {'ingenres': Genre.objects.get(name='Rock').id},
+        ]:
+            expected = self.client.get(ALBUMS_URL, params)
+
+            res = self._list(params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(json.loads(res.content), expected.json())
+
+    def test_page_out_of_range(self):
+        """Test pages past the last one are not found."""
+        res = self._list({'page': 3})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,182 @@
+"""
+Tests for albums often listed together.
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import (
+    Album,
+    AlbumNeighbour,
+    AlbumNeighbourQueue,
+    Entry,
+    List,
+)
+
+from album.neighbours import Incidence, compute_neighbours
+
+
+def specific_album_url(album_id):
+    """Create and return a specific album URL."""
+    return reverse('album:album-detail', args=[album_id])
+
+
+def create_album(title='Sample Album title'):
+    """Create and return a sample album."""
+    return Album.objects.create(
+        title=title,
+        release_date=date.fromisoformat('2000-01-01'),
+        avg_rating=Decimal('1.00'),
+        rating_count=1_000,
+    )
+
+
+def create_public_list(user, albums):
+    """Create a public list of albums in order."""
+    list_obj = List.objects.create(user=user, label='Sample', public=True)
+    Entry.objects.bulk_create([
+        Entry(
+            owner_list=list_obj,
+            album=album,
+            position=Entry.POSITION_GAP * (index + 1),
+        )
+        for index, album in enumerate(albums)
+    ])
+    list_obj.refresh_summary()
+    return list_obj
+
+
+class IncidenceTests(SimpleTestCase):
+    """Test computing neighbours from an incidence matrix."""
+
+    def setUp(self):
+        # Album 10 is on lists 1, 2 and 3, album 11 on 1 and 2, album 12 on
+        # 1 and album 13 on 3.
+        self.incidence = Incidence(
+            np.array([1, 1, 1, 2, 2, 3, 3]),
+            np.array([10, 11, 12, 10, 11, 10, 13]),
+        )
+
+    def _neighbours(self, **options):
+        found = {}
+        for albums, neighbours, _ranks, scores in compute_neighbours(
+                self.incidence, **options):
+            for album, neighbour, score in zip(albums, neighbours, scores):
+                found.setdefault(int(album), []).append(
+                    (int(neighbour), round(float(score), 4))
+                )
+        return found
+
+    def test_cosine_neighbours_best_first(self):
+        """Test neighbours are ranked by cosine similarity."""
+        found = self._neighbours(processes=1)
+
+        self.assertEqual(found[11], [(10, 0.8165), (12, 0.7071)])
+        self.assertEqual(found[13], [(10, 0.5774)])
+
+    def test_top_k(self):
+        """Test only the top_k neighbours are kept."""
+        found = self._neighbours(top_k=1, processes=1)
+
+        self.assertEqual(found[10], [(11, 0.8165)])
+
+    def test_selected_albums_in_chunks(self):
+        """Test chunking a selection of albums gives the same result."""
+        whole = self._neighbours(processes=1)
+
+        found = self._neighbours(
+            album_ids=[11, 13], chunk_size=1, processes=1,
+        )
+
+        self.assertEqual(found, {11: whole[11], 13: whole[13]})
+
+
+class AlbumNeighboursTests(TestCase):
+    """Test refreshing and serving album neighbours."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.albums = [create_album(f'Album {i}') for i in range(3)]
+
+    def test_list_changes_queue_albums(self):
+        """Test changing a public list queues every album on it."""
+        list_obj = create_public_list(self.user, self.albums[:2])
+        AlbumNeighbourQueue.objects.all().delete()
+
+        list_obj.entries.filter(album=self.albums[0]).delete()
+        list_obj.refresh_summary()
+
+        self.assertEqual(
+            set(AlbumNeighbourQueue.objects.values_list(
+                'album_id', flat=True,
+            )),
+            {self.albums[0].id, self.albums[1].id},
+        )
+
+    def test_reorder_does_not_queue_albums(self):
+        """Test moving entries keeps the neighbours as they are."""
+        list_obj = create_public_list(self.user, self.albums[:2])
+        AlbumNeighbourQueue.objects.all().delete()
+        first = list_obj.entries.order_by('position').first()
+        first.position = Entry.POSITION_GAP * 10
+        first.save()
+
+        list_obj.refresh_summary()
+
+        self.assertFalse(AlbumNeighbourQueue.objects.exists())
+
+    def test_refresh_queued_albums(self):
+        """Test the command refreshes and dequeues queued albums."""
+        create_public_list(self.user, self.albums[:2])
+
+        out = StringIO()
+        call_command('refresh_album_neighbours', stdout=out)
+
+        self.assertFalse(AlbumNeighbourQueue.objects.exists())
+        self.assertEqual(
+            list(AlbumNeighbour.objects.filter(
+                album=self.albums[0],
+            ).values_list('neighbour_id', 'rank')),
+            [(self.albums[1].id, 0)],
+        )
+        self.assertIn('Refreshed neighbours of 2 albums.', out.getvalue())
+
+    def test_refresh_drops_stale_neighbours(self):
+        """Test albums no longer listed together lose their neighbours."""
+        list_obj = create_public_list(self.user, self.albums[:2])
+        call_command('refresh_album_neighbours', stdout=StringIO())
+
+        list_obj.public = False
+        list_obj.save()
+        call_command('refresh_album_neighbours', stdout=StringIO())
+
+        self.assertFalse(AlbumNeighbour.objects.exists())
+
+    def test_album_detail_includes_neighbours(self):
+        """Test album detail lists neighbours in one extra query."""
+        create_public_list(self.user, self.albums)
+        create_public_list(self.user, self.albums[:2])
+        call_command('refresh_album_neighbours', '--all', stdout=StringIO())
+        url = specific_album_url(self.albums[0].id)
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(n['id'], n['title']) for n in res.data['neighbours']],
+            [(self.albums[1].id, 'Album 1'), (self.albums[2].id, 'Album 2')],
+        )
@@ -9,6 +9,7 @@ from django.urls import (
 from rest_framework.routers import DefaultRouter
 
 from album import views
+from core.async_views import async_views_enabled, split_by_method
 
 
 router = DefaultRouter()
@@ -19,4 +20,11 @@ app_name = 'album'
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+]
+
+if async_views_enabled():
+    # Album lists are read asynchronously, creating albums stays sync.
+    urlpatterns.insert(0, path('', split_by_method(
+        views.album_list_async,
+        views.AlbumViewSet.as_view({'get': 'list', 'post': 'create'}),
+    ), name='album-list'))
\ No newline at end of file
@@ -11,17 +11,25 @@ from rest_framework import (
 
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, SAFE_METHODS
 
 from django_filters import rest_framework as filters
 
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 
+import asyncio
 import datetime
 
-from core.models import Album, Artist, Genre
+from core.async_views import (
+    InvalidPage,
+    page_bounds,
+    paginated_data,
+    run_sync,
+    serve,
+)
+from core.models import Album, AlbumNeighbour, Artist, Genre
 from album import serializers
+from user.authentication import CachedTokenAuthentication
 
 from decimal import Decimal
 
@@ -29,7 +37,7 @@ class AlbumViewSet(viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     serializer_class = serializers.AlbumSerializer
     queryset = Album.objects.all().order_by('id')
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     # filter_backends = [filters.DjangoFilterBackend]
     # filterset_fields = ['release_date']
 
@@ -51,6 +59,8 @@ class AlbumViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == 'upload_image':
             return serializers.AlbumImageSerializer
+        if self.action == 'retrieve':
+            return serializers.AlbumDetailSerializer
 
         return self.serializer_class
 
@@ -117,6 +127,13 @@ class AlbumViewSet(viewsets.ModelViewSet):
         """Retrieve album queryset."""
         year = self.request.query_params.get('year')
         queryset = self.queryset
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch(
+                'neighbours',
+                queryset=AlbumNeighbour.objects.select_related(
+                    'neighbour',
+                ).only('album', 'neighbour__title', 'rank', 'score'),
+            ))
         if year:
             queryset = self._get_year_queryset(queryset, year)
         ingenres = self.request.query_params.get('ingenres')
@@ -145,6 +162,10 @@ class AlbumViewSet(viewsets.ModelViewSet):
                 return queryset.order_by('rating_count').distinct()
             elif sortby == '-ratingcount':
                 return queryset.order_by('-rating_count').distinct()
+            elif sortby == 'popularity':
+                return queryset.order_by('public_list_count', 'id').distinct()
+            elif sortby == '-popularity':
+                return queryset.order_by('-public_list_count', 'id').distinct()
         return queryset.order_by('id').distinct()
 
 
@@ -161,12 +182,41 @@ class AlbumViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _album_page(queryset, start, stop, request):
+    albums = list(queryset.prefetch_related(
+        'artist', 'primary_genres', 'secondary_genres',
+    )[start:stop])
+    return serializers.AlbumSerializer(
+        albums, many=True, context={'request': request},
+    ).data
+
+
+async def album_list_async(request):
+    """Serve AlbumViewSet.list from the ASGI application.
+
+    The count and the page of albums are queried concurrently.
+    """
+    return await serve(AlbumViewSet, request, 'list', _album_list)
+
+
+async def _album_list(view):
+    number, start, stop = page_bounds(view.request)
+    queryset = view.get_queryset()
+    count, data = await asyncio.gather(
+        run_sync(queryset.count),
+        run_sync(_album_page, queryset, start, stop, view.request),
+    )
+    if number > 1 and start >= count:
+        raise InvalidPage()
+    return paginated_data(view.request, number, count, data)
+
+
 class BaseAlbumAttrViewSet(mixins.DestroyModelMixin,
                            mixins.UpdateModelMixin,
                            mixins.ListModelMixin,
                            viewsets.GenericViewSet):
     """Base viewset for attributes."""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get_permissions(self):
@@ -192,7 +242,7 @@ class ArtistViewSet(BaseAlbumAttrViewSet):
 class GenreViewSet(viewsets.ModelViewSet):
     serializer_class = serializers.GenreSerializer
     queryset = Genre.objects.all().order_by('id')
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
 
     def get_permissions(self):
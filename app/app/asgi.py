@@ -11,6 +11,16 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from core.backends.postgresql.base import warm_pools
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+from search.backends import warm_backend  # noqa: E402
+
+# Open pooled database connections and load search indexes before taking
+# requests.
+warm_pools()
+warm_backend()
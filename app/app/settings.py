@@ -47,18 +47,25 @@ INSTALLED_APPS = [
     'album',
     'artist',
     'search',
+    'chart',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.MemoryProfilingMiddleware',
+    'core.middleware.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -81,24 +88,192 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Serve search and album lists with async views, see core.async_views.
+# Turned on by app/asgi.py.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # Connections per process are pooled between requests, see
+        # core.backends.postgresql.pool. A MAX_SIZE of 0 disables pooling.
+        'POOL': {
+            'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 1)),
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            # Seconds before a connection is replaced.
+            'MAX_AGE': 1800,
+            # Seconds an idle connection above MIN_SIZE is kept open.
+            'MAX_IDLE': 300,
+            # Seconds to wait for a connection when all are in use.
+            'TIMEOUT': 10,
+            # Seconds idle after which a connection is pinged on checkout.
+            'CHECK_IDLE': 1,
+        },
+    }
+}
+
+# Read replicas, given as a comma separated list of hosts sharing the
+# primary's credentials. Safe requests read from one of them, see
+# core.middleware.ReplicaRoutingMiddleware. Tests read them through the
+# primary.
+DATABASE_REPLICAS = []
+
+for index, host in enumerate(
+        filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Seconds a client reads from the primary after writing.
+DATABASE_PRIMARY_PIN_SECONDS = 5
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+#
+# Search results, token lookups, throttle buckets and replica pins are
+# shared between worker processes through the default cache, so anything
+# running more than one process has to set REDIS_URL. The local memory
+# cache is kept per process and only fits runserver and tests.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+# Time SQL, serializers and renderers of every request, reported in a
+# Server-Timing header and a JSON line on the core.timing logger.
+SERVER_TIMING = {
+    'ENABLED': os.environ.get('SERVER_TIMING') == '1',
+    'HEADER': True,
+    'LOG': True,
+}
+
+# Metrics exported at /metrics. Worker processes of one server share a
+# DIRECTORY, which has to be emptied before they start. Without it every
+# process only exports its own metrics.
+METRICS = {
+    'DIRECTORY': os.environ.get('METRICS_DIR') or None,
+    # Seconds between refreshes of cache and pool metrics.
+    'COLLECT_INTERVAL': 10,
+    # Bearer token scrapers send in their Authorization header. Without
+    # one only staff users can read metrics.
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+}
+
+# Profiling of single requests, see core.middleware.ProfilingMiddleware.
+# Staff send X-Profile: sample|cprofile or ?profile=sample|cprofile.
+PROFILING = {
+    'ENABLED': True,
+    'HEADER': 'X-Profile',
+    'QUERY_PARAM': 'profile',
+    'PROFILER': 'sample',
+    # Seconds between stack samples.
+    'INTERVAL': 0.005,
+    # Share of all requests profiled into the ring buffer.
+    'SAMPLE_RATE': float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    'DIRECTORY': os.environ.get('PROFILE_DIR', '/tmp/profiles'),
+    # Profiles kept before the oldest are deleted.
+    'RING_SIZE': 100,
+}
+
+# Statements of requests slower than THRESHOLD_MS, stored per fingerprint
+# with the view and filters of the request and shown in the admin.
+SLOW_QUERIES = {
+    'ENABLED': True,
+    'THRESHOLD_MS': int(os.environ.get('SLOW_QUERY_MS', 200)),
+    # Share of slow SELECTs run again under EXPLAIN (ANALYZE, BUFFERS)
+    # after the response is sent, at most once per fingerprint every
+    # EXPLAIN_INTERVAL seconds in each worker, or over all of them with
+    # REDIS_URL set.
+    'EXPLAIN_SAMPLE_RATE': float(
+        os.environ.get('SLOW_QUERY_EXPLAIN_RATE', 0.1)
+    ),
+    'EXPLAIN_INTERVAL': 300,
+    'EXPLAIN_TIMEOUT_MS': 5000,
+    # Query parameters whose values describe the filters of a request,
+    # besides year, which is described by how many years it spans.
+    'FILTER_VALUES': ['sortby'],
+    'MAX_SAMPLES': 50,
+}
+
+# Allocation tracing with tracemalloc, controlled through /api/debug/memory/.
+MEMORY_PROFILING = {
+    'ENABLED': True,
+    # Trace from startup rather than once asked to.
+    'START': os.environ.get('TRACEMALLOC_AT_START') == '1',
+    # Frames kept per traced allocation when tracing from startup.
+    'FRAMES': 1,
+    # Responses at least this large have their peak allocation logged.
+    'LOG_RESPONSE_BYTES': 1024 * 1024,
+    'MAX_SNAPSHOTS': 10,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'core.memory': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+        'core.slow_queries': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
 }
 
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
+# PBKDF2 hashing runs on the bounded pool of user.hashers.
+PASSWORD_HASHERS = [
+    'user.hashers.PooledPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+PASSWORD_HASHING_POOL = {
+    'WORKERS': int(os.environ.get('PASSWORD_HASHING_WORKERS', 0)),
+    'QUEUE_SIZE': 16,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -147,6 +322,10 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 25,
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': '60/min',
+        'auth_email': '10/min',
+    },
 }
 
 CORS_ALLOWED_ORIGINS = [
@@ -155,4 +334,47 @@ CORS_ALLOWED_ORIGINS = [
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
-}
\ No newline at end of file
+}
+
+SEARCH_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_MAXSIZE': 1024,
+    'LOCAL_TIMEOUT': 30,
+    # Seconds and number of changes per type in-memory indexes can catch
+    # up on without indexing the type again.
+    'CHANGES_TIMEOUT': 3600,
+    'MAX_CHANGES': 100,
+}
+
+SEARCH_BACKEND = os.environ.get(
+    'SEARCH_BACKEND',
+    'search.backends.PostgresTrigramBackend',
+)
+
+SEARCH_SPELLING_DICTIONARY = os.environ.get(
+    'SEARCH_SPELLING_DICTIONARY',
+    '/vol/web/search/spelling.json',
+)
+
+SEARCH_SUGGESTION_THRESHOLD = 3
+
+SEARCH_ANALYTICS = {
+    'FLUSH_SIZE': 100,
+    'FLUSH_INTERVAL': 30,
+}
+
+LIST_DETAIL_MAX_ENTRIES = 100
+
+ALBUM_NEIGHBOURS = {
+    'TOP_K': 10,
+    'CHUNK_SIZE': 1000,
+    'PROCESSES': int(os.environ.get('ALBUM_NEIGHBOURS_PROCESSES', 1)),
+}
+
+TOKEN_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+    'LOCAL_MAXSIZE': 4096,
+    'LOCAL_TIMEOUT': 5,
+}
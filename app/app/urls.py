@@ -22,6 +22,8 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core import views as core_views
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -36,6 +38,9 @@ urlpatterns = [
     path('api/artist/', include('artist.urls')),
     path('api/list/', include('list.urls')),
     path('api/search/', include('search.urls')),
+    path('api/chart/', include('chart.urls')),
+    path('api/debug/', include('core.urls')),
+    path('metrics', core_views.metrics, name='metrics'),
 ]
 
 
@@ -11,6 +11,15 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from core.backends.postgresql.base import warm_pools
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
 application = get_wsgi_application()
+
+from search.backends import warm_backend  # noqa: E402
+
+# Open pooled database connections and load search indexes before taking
+# requests.
+warm_pools()
+warm_backend()
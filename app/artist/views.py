@@ -7,7 +7,6 @@ from rest_framework import (
     status,
 )
 
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny, SAFE_METHODS
 
 from django_filters import rest_framework as filters
@@ -16,6 +15,7 @@ from django.db.models import Q
 
 from core.models import Album, Artist
 from artist import serializers
+from user.authentication import CachedTokenAuthentication
 
 
 
@@ -23,7 +23,7 @@ class ArtistViewSet(viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     serializer_class = serializers.ArtistSerializer
     queryset = Artist.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     filter_backends = [filters.DjangoFilterBackend]
     filterset_fields = ['origin_country']
 
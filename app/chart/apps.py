@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class ChartConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'chart'
+
+    def ready(self):
+        from chart import signals  # noqa: F401
@@ -0,0 +1,76 @@
+"""
+Django command to rebuild the community chart from every public list.
+"""
+from itertools import chain
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import ChartEntry, Entry, List
+from chart.scoring import score_entries
+
+
+class Command(BaseCommand):
+    """Django command to recompute the community chart."""
+
+    help = (
+        'Rescore every public list and rebuild the community chart and '
+        'the chart points stored on lists.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows read and written per database round trip.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            # Lists are locked first, as refresh_chart() does, so no list
+            # can be rescored while the chart is rebuilt.
+            list(List.objects.select_for_update().values_list('id'))
+            rows = Entry.objects.filter(owner_list__public=True).order_by(
+                'owner_list_id', 'position', 'id',
+            ).values_list('owner_list_id', 'album_id')
+            entries = np.fromiter(
+                chain.from_iterable(rows.iterator(chunk_size=batch_size)),
+                dtype=np.int64,
+            ).reshape(-1, 2)
+            (lists, albums, points), chart = score_entries(
+                entries[:, 0], entries[:, 1],
+            )
+
+            table = connection.ops.quote_name(ChartEntry._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {table}')
+            ChartEntry.objects.bulk_create([
+                ChartEntry(
+                    album_id=int(album_id),
+                    score=int(score),
+                    appearances=int(appearances),
+                )
+                for album_id, score, appearances in zip(*chart)
+            ], batch_size=batch_size)
+
+            scored = {}
+            for list_id, album_id, value in zip(
+                    lists.tolist(), albums.tolist(), points.tolist()):
+                scored.setdefault(list_id, {})[str(album_id)] = value
+            List.objects.exclude(chart_points={}).update(chart_points={})
+            List.objects.bulk_update(
+                [
+                    List(id=list_id, chart_points=list_points)
+                    for list_id, list_points in scored.items()
+                ],
+                ['chart_points'],
+                batch_size=batch_size,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Scored {len(chart[0])} albums from {len(scored)} lists.'
+        ))
@@ -0,0 +1,47 @@
+"""
+Vectorized Borda scoring of the community chart.
+
+Entries of public lists are ranked within their list and the entry at rank
+r (from 0) earns ``ChartEntry.LIST_DEPTH - r`` points for its album, the
+same points ``List.chart_scores()`` gives when lists are rescored one at a
+time.
+"""
+import numpy as np
+
+from core.models import ChartEntry
+
+
+def _run_starts(*keys):
+    """Return a mask of the rows starting a new run of equal keys."""
+    starts = np.zeros(len(keys[0]), dtype=bool)
+    starts[:1] = True
+    for key in keys:
+        starts[1:] |= key[1:] != key[:-1]
+    return starts
+
+
+def score_entries(list_ids, album_ids, depth=ChartEntry.LIST_DEPTH):
+    """Score entries given in (list, position, id) order.
+
+    Returns ``(lists, albums, points)`` with the points each list gives
+    each album, an album listed twice counting at its best rank, and
+    ``(albums, scores, appearances)`` with the chart totals per album.
+    """
+    lists = np.asarray(list_ids, dtype=np.int64)
+    albums = np.asarray(album_ids, dtype=np.int64)
+    starts = np.flatnonzero(_run_starts(lists))
+    sizes = np.diff(np.append(starts, len(lists)))
+    points = depth - (np.arange(len(lists)) - np.repeat(starts, sizes))
+    keep = points > 0
+    lists, albums, points = lists[keep], albums[keep], points[keep]
+
+    order = np.lexsort((-points, albums, lists))
+    lists, albums, points = lists[order], albums[order], points[order]
+    best = _run_starts(lists, albums)
+    lists, albums, points = lists[best], albums[best], points[best]
+
+    chart_albums, inverse = np.unique(albums, return_inverse=True)
+    scores = np.zeros(len(chart_albums), dtype=np.int64)
+    np.add.at(scores, inverse, points)
+    appearances = np.bincount(inverse, minlength=len(chart_albums))
+    return (lists, albums, points), (chart_albums, scores, appearances)
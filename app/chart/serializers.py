@@ -0,0 +1,18 @@
+"""
+Serializers for the chart APIs.
+"""
+from rest_framework import serializers
+
+from core.models import ChartEntry
+
+from album.serializers import AlbumSerializer
+
+
+class ChartEntrySerializer(serializers.ModelSerializer):
+    """Serializer for an album's place in the community chart."""
+    album = AlbumSerializer(read_only=True)
+
+    class Meta:
+        model = ChartEntry
+        fields = ['album', 'score', 'appearances']
+        read_only_fields = fields
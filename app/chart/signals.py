@@ -0,0 +1,22 @@
+"""
+Signal handlers keeping the community chart in step with lists.
+"""
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from core.models import List
+
+
+@receiver(post_save, sender=List)
+def refresh_chart_on_save(sender, instance, created, update_fields, **kwargs):
+    """Rescore a list whose visibility may have changed."""
+    if created:
+        return
+    if update_fields is None or 'public' in update_fields:
+        instance.refresh_chart()
+
+
+@receiver(pre_delete, sender=List)
+def withdraw_chart_on_delete(sender, instance, **kwargs):
+    """Remove the points of a list before it is deleted."""
+    instance.refresh_chart(withdraw=True)
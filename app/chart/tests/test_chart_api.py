@@ -0,0 +1,209 @@
+"""
+Tests for the community chart.
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Album, ChartEntry, Entry, List
+
+
+CHART_URL = reverse('chart:chart-list')
+
+
+def create_album(title='Sample Album title'):
+    """Create and return a sample album."""
+    return Album.objects.create(
+        title=title,
+        release_date=date.fromisoformat('2000-01-01'),
+        avg_rating=Decimal('1.00'),
+        rating_count=1_000,
+    )
+
+
+def create_scored_list(user, albums, public=True):
+    """Create a list of albums in order and score it."""
+    list_obj = List.objects.create(user=user, label='Chart', public=public)
+    Entry.objects.bulk_create([
+        Entry(
+            owner_list=list_obj,
+            album=album,
+            position=Entry.POSITION_GAP * (index + 1),
+        )
+        for index, album in enumerate(albums)
+    ])
+    list_obj.refresh_summary()
+    return list_obj
+
+
+def chart_scores():
+    """Return the chart as a dict of album id to score and appearances."""
+    return {
+        album_id: (score, appearances)
+        for album_id, score, appearances in ChartEntry.objects.values_list(
+            'album_id', 'score', 'appearances',
+        )
+    }
+
+
+class ChartMaintenanceTests(TestCase):
+    """Test the chart is kept up to date incrementally."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.albums = [create_album(f'Album {i}') for i in range(3)]
+        self.depth = ChartEntry.LIST_DEPTH
+
+    def test_public_list_scores_albums(self):
+        """Test a public list adds Borda points for its albums."""
+        create_scored_list(self.user, self.albums[:2])
+        create_scored_list(self.user, self.albums[1:2])
+
+        self.assertEqual(chart_scores(), {
+            self.albums[0].id: (self.depth, 1),
+            self.albums[1].id: (2 * self.depth - 1, 2),
+        })
+
+    def test_private_list_does_not_score(self):
+        """Test private lists are left out of the chart."""
+        create_scored_list(self.user, self.albums, public=False)
+
+        self.assertEqual(chart_scores(), {})
+
+    def test_reorder_applies_difference(self):
+        """Test moving entries only shifts the points that changed."""
+        list_obj = create_scored_list(self.user, self.albums[:2])
+        first, second = list_obj.entries.order_by('position')
+        first.position = second.position + 1
+        first.save()
+
+        list_obj.refresh_summary()
+
+        self.assertEqual(chart_scores(), {
+            self.albums[0].id: (self.depth - 1, 1),
+            self.albums[1].id: (self.depth, 1),
+        })
+
+    def test_removed_album_leaves_chart(self):
+        """Test an album no list scores any more is dropped."""
+        list_obj = create_scored_list(self.user, self.albums[:2])
+        list_obj.entries.filter(album=self.albums[0]).delete()
+
+        list_obj.refresh_summary()
+
+        self.assertEqual(chart_scores(), {
+            self.albums[1].id: (self.depth, 1),
+        })
+
+    def test_unpublishing_withdraws_points(self):
+        """Test making a list private removes its points."""
+        list_obj = create_scored_list(self.user, self.albums[:2])
+        list_obj.public = False
+        list_obj.save()
+
+        self.assertEqual(chart_scores(), {})
+        list_obj.refresh_from_db()
+        self.assertEqual(list_obj.chart_points, {})
+
+    def test_deleting_list_withdraws_points(self):
+        """Test deleting a list removes its points."""
+        list_obj = create_scored_list(self.user, self.albums[:2])
+        create_scored_list(self.user, self.albums[:1])
+
+        list_obj.delete()
+
+        self.assertEqual(chart_scores(), {
+            self.albums[0].id: (self.depth, 1),
+        })
+
+    def test_deleted_album_is_skipped(self):
+        """Test rescoring a list ignores albums deleted in the meantime."""
+        list_obj = create_scored_list(self.user, self.albums[:2])
+        self.albums[0].delete()
+
+        list_obj.refresh_summary()
+
+        self.assertEqual(chart_scores(), {
+            self.albums[1].id: (self.depth, 1),
+        })
+
+    def test_recompute_matches_incremental(self):
+        """Test a full recompute gives the incrementally kept chart."""
+        create_scored_list(self.user, self.albums)
+        create_scored_list(self.user, self.albums[::-1])
+        create_scored_list(self.user, self.albums[:1], public=False)
+        expected = chart_scores()
+        points = dict(List.objects.values_list('id', 'chart_points'))
+        ChartEntry.objects.all().delete()
+        List.objects.update(chart_points={})
+
+        out = StringIO()
+        call_command('recompute_chart', stdout=out)
+
+        self.assertEqual(chart_scores(), expected)
+        self.assertEqual(
+            dict(List.objects.values_list('id', 'chart_points')), points,
+        )
+        self.assertIn('Scored 3 albums from 2 lists.', out.getvalue())
+
+
+class ChartAPITests(TestCase):
+    """Test the chart API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+
+    def test_chart_ordered_by_score(self):
+        """Test the chart lists the best scoring albums first."""
+        albums = [create_album(f'Album {i}') for i in range(3)]
+        create_scored_list(self.user, albums)
+        create_scored_list(self.user, albums[1:])
+
+        res = self.client.get(CHART_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [row['album']['id'] for row in res.data['results']],
+            [albums[1].id, albums[2].id, albums[0].id],
+        )
+        self.assertEqual(res.data['results'][0]['appearances'], 2)
+
+    def test_chart_keyset_pagination(self):
+        """Test following cursors walks the whole chart once."""
+        albums = [create_album(f'Album {i}') for i in range(5)]
+        create_scored_list(self.user, albums)
+
+        seen = []
+        res = self.client.get(CHART_URL, {'page_size': 2})
+        while True:
+            seen.extend(row['album']['id'] for row in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(seen, [album.id for album in albums])
+
+    def test_chart_query_count_is_constant(self):
+        """Test rendering a page doesn't query per album."""
+        albums = [create_album(f'Album {i}') for i in range(10)]
+        create_scored_list(self.user, albums)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(CHART_URL)
+
+        self.assertEqual(len(res.data['results']), 10)
@@ -0,0 +1,42 @@
+"""
+Tests for vectorized chart scoring.
+"""
+from django.test import SimpleTestCase
+
+from chart.scoring import score_entries
+
+
+class ScoreEntriesTests(SimpleTestCase):
+    """Test Borda scoring of ordered entries."""
+
+    def test_points_by_rank_within_list(self):
+        """Test entries earn fewer points the lower they rank."""
+        per_list, chart = score_entries([1, 1, 2], [10, 11, 11], depth=3)
+
+        self.assertEqual(per_list[0].tolist(), [1, 1, 2])
+        self.assertEqual(per_list[1].tolist(), [10, 11, 11])
+        self.assertEqual(per_list[2].tolist(), [3, 2, 3])
+        self.assertEqual(chart[0].tolist(), [10, 11])
+        self.assertEqual(chart[1].tolist(), [3, 5])
+        self.assertEqual(chart[2].tolist(), [1, 2])
+
+    def test_entries_below_depth_do_not_score(self):
+        """Test only the top entries of a list score."""
+        _per_list, chart = score_entries([1, 1, 1], [10, 11, 12], depth=2)
+
+        self.assertEqual(chart[0].tolist(), [10, 11])
+        self.assertEqual(chart[1].tolist(), [2, 1])
+
+    def test_duplicate_album_counts_at_best_rank(self):
+        """Test an album listed twice scores once at its best rank."""
+        per_list, chart = score_entries([1, 1, 1], [10, 11, 10], depth=3)
+
+        self.assertEqual(per_list[1].tolist(), [10, 11])
+        self.assertEqual(per_list[2].tolist(), [3, 2])
+        self.assertEqual(chart[2].tolist(), [1, 1])
+
+    def test_no_entries(self):
+        """Test scoring nothing returns an empty chart."""
+        _per_list, chart = score_entries([], [])
+
+        self.assertEqual(chart[0].tolist(), [])
@@ -0,0 +1,20 @@
+"""
+URLs for chart APIs.
+"""
+from django.urls import (
+    path,
+    include
+)
+
+from rest_framework.routers import DefaultRouter
+
+from chart import views
+
+router = DefaultRouter()
+router.register('', views.ChartViewSet, basename='chart')
+
+app_name = 'chart'
+
+urlpatterns = [
+    path('', include(router.urls))
+]
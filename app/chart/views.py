@@ -0,0 +1,37 @@
+"""
+Views for the chart APIs.
+"""
+from rest_framework import mixins, viewsets
+from rest_framework.pagination import CursorPagination
+
+from django.db.models import Prefetch
+
+from core.models import Artist, ChartEntry, Genre
+from chart import serializers
+
+
+class ChartCursorPagination(CursorPagination):
+    """Keyset pagination down the chart, best scores first."""
+    ordering = ('-score', 'album_id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class ChartViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """List the community chart of albums across public lists."""
+    serializer_class = serializers.ChartEntrySerializer
+    queryset = ChartEntry.objects.all()
+    pagination_class = ChartCursorPagination
+
+    def get_queryset(self):
+        genres = Genre.objects.only('id', 'name')
+        return self.queryset.filter(appearances__gt=0).select_related(
+            'album',
+        ).prefetch_related(
+            Prefetch('album__artist', queryset=Artist.objects.only(
+                'id', 'name',
+            )),
+            Prefetch('album__primary_genres', queryset=genres),
+            Prefetch('album__secondary_genres', queryset=genres),
+        )
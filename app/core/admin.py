@@ -3,6 +3,8 @@ Django admin customization.
 """
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Avg, Count, Max
+from django.utils.html import format_html_join
 from django.utils.translation import gettext_lazy as _
 
 from core import models
@@ -42,6 +44,81 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class SlowQuerySampleInline(admin.TabularInline):
+    """Recent slow executions of a statement."""
+    model = models.SlowQuerySample
+    fields = ['recorded_at', 'duration_ms', 'view', 'filters', 'database',
+              'params', 'plan']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+    show_change_link = True
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(models.SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Slow statements, the slowest in total first."""
+    list_display = ['statement_summary', 'calls', 'total_ms', 'mean_ms',
+                    'max_ms', 'last_seen']
+    ordering = ['-total_ms']
+    search_fields = ['statement']
+    fields = ['statement', 'fingerprint', 'calls', 'total_ms', 'max_ms',
+              'first_seen', 'last_seen', 'origins']
+    readonly_fields = fields
+    inlines = [SlowQuerySampleInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description=_('statement'))
+    def statement_summary(self, obj):
+        return obj.statement[:120]
+
+    @admin.display(description=_('mean ms'))
+    def mean_ms(self, obj):
+        return round(obj.mean_ms, 1)
+
+    @admin.display(description=_('views and filters'))
+    def origins(self, obj):
+        """Kept samples per view and filters, the slowest first."""
+        rows = obj.samples.values('view', 'filters').annotate(
+            samples=Count('id'),
+            mean=Avg('duration_ms'),
+            max=Max('duration_ms'),
+        ).order_by('-mean')
+        return format_html_join(
+            '\n', '<div>{} {}: {} samples, mean {} ms, max {} ms</div>',
+            (
+                (row['view'] or '-', row['filters'] or '-', row['samples'],
+                 round(row['mean'], 1), round(row['max'], 1))
+                for row in rows
+            ),
+        )
+
+
+@admin.register(models.SlowQuerySample)
+class SlowQuerySampleAdmin(admin.ModelAdmin):
+    """Slow executions, filterable by view to compare filters."""
+    list_display = ['recorded_at', 'view', 'filters', 'duration_ms',
+                    'database', 'explained']
+    list_filter = ['view', 'database']
+    search_fields = ['filters', 'query__statement']
+    readonly_fields = ['query', 'recorded_at', 'duration_ms', 'database',
+                       'view', 'filters', 'sql', 'params', 'plan']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(boolean=True, description=_('plan'))
+    def explained(self, obj):
+        return bool(obj.plan)
+
+
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Album)
-admin.site.register(models.Artist)
\ No newline at end of file
+admin.site.register(models.Artist)
+admin.site.register(models.SearchTerm)
+admin.site.register(models.ChartEntry)
@@ -0,0 +1,114 @@
+"""
+Helpers for async views served through the ASGI application.
+
+Django 4.0 has no async ORM, so queries run on worker threads, each with
+a database connection of its own. Independent queries can then be awaited
+together with ``asyncio.gather`` rather than one after another.
+"""
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import connections
+
+from rest_framework.exceptions import MethodNotAllowed, NotFound
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _call_and_close(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Hand the thread's connections back rather than leaving them open
+        # on a worker thread no request will close.
+        connections.close_all()
+
+
+async def run_sync(func, *args, **kwargs):
+    """Run blocking code, such as queries, on a worker thread."""
+    return await sync_to_async(_call_and_close, thread_sensitive=False)(
+        func, args, kwargs,
+    )
+
+
+def async_views_enabled():
+    """Return whether URLs should be served by the async views."""
+    return getattr(settings, 'ASYNC_VIEWS', False)
+
+
+def split_by_method(async_view, sync_view):
+    """Serve GET and HEAD with async_view and other methods with sync_view.
+
+    Both views are exempt from CSRF checks, like DRF views are.
+    """
+    sync_view = sync_to_async(sync_view)
+
+    async def view(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            return await async_view(request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
+
+
+async def serve(view_class, request, action, handler):
+    """Serve a safe request with an async handler behind a DRF viewset.
+
+    As in ``APIView.dispatch()``, the viewset's content negotiation,
+    authentication, permissions and throttles run first, and exceptions,
+    including those handler raises, go through its exception handler.
+    handler is awaited with the view and returns the response data.
+    """
+    view = view_class(action_map={'get': action, 'head': action})
+    view.args, view.kwargs = (), {}
+    request = view.initialize_request(request)
+    view.request = request
+    view.headers = view.default_response_headers
+    try:
+        await run_sync(view.initial, request)
+        if view.action is None:
+            raise MethodNotAllowed(request.method)
+        response = Response(await handler(view))
+    except Exception as exc:
+        response = view.handle_exception(exc)
+    response = view.finalize_response(request, response)
+    return response.render()
+
+
+class InvalidPage(NotFound):
+    """The requested page number is out of range."""
+    default_detail = 'Invalid page.'
+
+
+def page_bounds(request, page_size=None):
+    """Return the page number and slice bounds requested with ``page``."""
+    page_size = page_size or api_settings.PAGE_SIZE
+    try:
+        number = int(request.GET.get('page', 1))
+    except ValueError:
+        raise InvalidPage()
+    if number < 1:
+        raise InvalidPage()
+    start = (number - 1) * page_size
+    return number, start, start + page_size
+
+
+def paginated_data(request, number, count, results, page_size=None):
+    """Return results in the shape of DRF's PageNumberPagination."""
+    page_size = page_size or api_settings.PAGE_SIZE
+    url = request.build_absolute_uri()
+    next_link = previous_link = None
+    if number * page_size < count:
+        next_link = replace_query_param(url, 'page', number + 1)
+    if number == 2:
+        previous_link = remove_query_param(url, 'page')
+    elif number > 2:
+        previous_link = replace_query_param(url, 'page', number - 1)
+    return {
+        'count': count,
+        'next': next_link,
+        'previous': previous_link,
+        'results': results,
+    }
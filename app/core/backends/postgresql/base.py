@@ -0,0 +1,85 @@
+"""
+PostgreSQL backend drawing connections from a process-wide pool.
+
+Pooling is set up with a ``POOL`` dict in the database settings, taking
+the keyword arguments of ``ConnectionPool`` in upper case. Without it, or
+with a ``MAX_SIZE`` of 0, the backend behaves like Django's own. Leave
+``CONN_MAX_AGE`` at 0 so connections go back to the pool after every
+request.
+"""
+import logging
+from functools import partial
+
+from django.db import connections, DatabaseError
+from django.db.backends.postgresql import base
+
+from core.backends.postgresql.creation import DatabaseCreation
+from core.backends.postgresql.pool import get_pool
+
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    @property
+    def pool(self):
+        """Return the pool of this database, or None if not pooled."""
+        options = self.settings_dict.get('POOL') or {}
+        if not options.get('MAX_SIZE'):
+            return None
+        params = self.get_connection_params()
+        key = (self.alias, tuple(sorted(
+            (name, repr(value)) for name, value in params.items()
+        )))
+        return get_pool(self.alias, key, {
+            name.lower(): value for name, value in options.items()
+        })
+
+    def _open_connection(self, conn_params):
+        return super().get_new_connection(conn_params)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.getconn(
+            partial(self._open_connection, conn_params),
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level,
+        )
+        return connection
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+
+    def warm_pool(self):
+        """Open the minimum number of pooled connections."""
+        pool = self.pool
+        if pool is not None:
+            with self.wrap_database_errors:
+                pool.warm(partial(
+                    self._open_connection, self.get_connection_params(),
+                ))
+
+
+def warm_pools():
+    """Open the minimum pooled connections of every pooled database.
+
+    A database that can't be reached is left to connect on first use.
+    """
+    for alias in connections:
+        warm = getattr(connections[alias], 'warm_pool', None)
+        if warm is None:
+            continue
+        try:
+            warm()
+        except DatabaseError as exc:
+            logger.warning('Could not open pooled connections to %s: %s',
+                           alias, exc)
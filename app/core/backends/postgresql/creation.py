@@ -0,0 +1,19 @@
+"""
+Test database handling for the pooled PostgreSQL backend.
+"""
+from django.db.backends.postgresql import creation
+
+from core.backends.postgresql.pool import close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    # Pooled connections would keep the test database in use, blocking
+    # both dropping it and cloning it as a template.
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pools()
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,242 @@
+"""
+Process-wide pools of open PostgreSQL connections.
+
+Connections are checked out when Django connects and handed back when it
+closes, so a request reuses a warm connection instead of connecting and
+authenticating again. Each connection is checked before it's handed out
+and dropped once too old or idle too long.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No connection became available in time."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of connections to one database."""
+
+    def __init__(self, label='', min_size=1, max_size=10, max_age=1800,
+                 max_idle=300, timeout=10, check_idle=1):
+        self.label = label
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._cond = threading.Condition()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        # Idle connections with the time they were handed back, most
+        # recently used last.
+        self._idle = deque()
+        # Open connections with the time they were opened.
+        self._opened = {}
+        # Open connections plus connections being opened.
+        self._size = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.connects = 0
+        self.discards = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    def _check_fork(self):
+        # Connections inherited from a parent process belong to it, so are
+        # forgotten rather than closed.
+        if self._pid != os.getpid():
+            self._reset()
+
+    def __len__(self):
+        return self._size
+
+    def stats(self):
+        """Return the size and usage counters of the pool."""
+        with self._cond:
+            self._check_fork()
+            return {
+                'label': self.label,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+                'waiting': self.waiting,
+                'checkouts': self.checkouts,
+                'connects': self.connects,
+                'discards': self.discards,
+                'timeouts': self.timeouts,
+                'wait_seconds': self.wait_seconds,
+            }
+
+    def _expired(self, conn, returned, now):
+        return (now - self._opened.get(conn, now) >= self.max_age
+                or now - returned >= self.max_idle)
+
+    def _drop(self, conn):
+        """Close a connection and free its slot. Call with the lock held."""
+        self._opened.pop(conn, None)
+        self._size -= 1
+        self.discards += 1
+        self._cond.notify()
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _reserve(self, deadline):
+        """Return an idle connection, or None after reserving a new slot."""
+        with self._cond:
+            self._check_fork()
+            while True:
+                now = time.monotonic()
+                while self._idle:
+                    conn, returned = self._idle.pop()
+                    if not self._expired(conn, returned, now):
+                        return conn, returned
+                    self._drop(conn)
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, None
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'No connection to {self.label or "the database"} '
+                        f'became available within {self.timeout} seconds.'
+                    )
+                self.waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+
+    def _healthy(self, conn, returned):
+        """Return whether an idle connection can be handed out."""
+        if conn.closed or conn.info.transaction_status != \
+                extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - returned < self.check_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def _open(self, connect):
+        try:
+            conn = connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._opened[conn] = time.monotonic()
+            self.connects += 1
+        return conn
+
+    def getconn(self, connect):
+        """Check out a connection, opening one with connect if needed.
+
+        Waits up to ``timeout`` seconds for one to be handed back once
+        ``max_size`` connections are open, then raises PoolTimeout.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        while True:
+            conn, returned = self._reserve(deadline)
+            if conn is None:
+                conn = self._open(connect)
+                break
+            if self._healthy(conn, returned):
+                break
+            with self._cond:
+                self._drop(conn)
+        with self._cond:
+            self.checkouts += 1
+            self.wait_seconds += time.monotonic() - started
+        return conn
+
+    def putconn(self, conn):
+        """Hand back a connection, closing it if it can't be reused."""
+        with self._cond:
+            if self._pid != os.getpid() or conn not in self._opened:
+                return
+        reusable = not conn.closed
+        if reusable and conn.info.transaction_status != \
+                extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                reusable = False
+        with self._cond:
+            now = time.monotonic()
+            if not reusable or now - self._opened[conn] >= self.max_age:
+                self._drop(conn)
+                return
+            self._idle.append((conn, now))
+            # Least recently used connections above the minimum are closed
+            # once idle too long.
+            while (self._size > self.min_size and self._idle
+                   and now - self._idle[0][1] >= self.max_idle):
+                self._drop(self._idle.popleft()[0])
+            self._cond.notify()
+
+    def warm(self, connect):
+        """Open connections until at least ``min_size`` are open."""
+        while True:
+            with self._cond:
+                self._check_fork()
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open(connect)
+            with self._cond:
+                self._idle.appendleft((conn, time.monotonic()))
+                self._cond.notify()
+
+    def close(self):
+        """Close every idle connection."""
+        with self._cond:
+            self._check_fork()
+            while self._idle:
+                self._drop(self._idle.pop()[0])
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(label, key, options):
+    """Return the pool for connection parameters key, creating it."""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(label, **options)
+        return pool
+
+
+def pool_stats():
+    """Return the stats of every pool in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [pool.stats() for pool in pools]
+
+
+def close_pools():
+    """Close the idle connections of every pool in this process."""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
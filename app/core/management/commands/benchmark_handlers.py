@@ -0,0 +1,188 @@
+"""
+Django command to compare WSGI and ASGI throughput for API endpoints.
+"""
+import asyncio
+import io
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+DEFAULT_PATHS = [
+    '/api/search/?term=the',
+    '/api/album/',
+]
+
+HOST = 'localhost'
+
+
+def _environ(path, query):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+    }
+
+
+def _scope(path, query):
+    return {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode('utf-8'),
+        'query_string': query.encode('utf-8'),
+        'root_path': '',
+        'headers': [(b'host', HOST.encode('ascii'))],
+        'client': ('127.0.0.1', 0),
+        'server': (HOST, 80),
+    }
+
+
+def run_wsgi(targets, requests, concurrency):
+    """Time requests through the WSGI handler on a pool of threads."""
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+
+    def call(index):
+        path, query = targets[index % len(targets)]
+        statuses = []
+        start = time.perf_counter()
+        body = application(
+            _environ(path, query),
+            lambda status, headers: statuses.append(status),
+        )
+        b''.join(body)
+        return time.perf_counter() - start, int(statuses[0].split()[0])
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(call, range(requests)))
+    return time.perf_counter() - started, results
+
+
+def run_asgi(targets, requests, concurrency):
+    """Time requests through the ASGI handler on one event loop."""
+    from django.core.asgi import get_asgi_application
+
+    application = get_asgi_application()
+
+    async def call(index, slots):
+        path, query = targets[index % len(targets)]
+        statuses = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(message['status'])
+
+        async with slots:
+            start = time.perf_counter()
+            await application(_scope(path, query), receive, send)
+            return time.perf_counter() - start, statuses[0]
+
+    async def main():
+        slots = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(
+            call(index, slots) for index in range(requests)
+        ))
+
+    started = time.perf_counter()
+    results = asyncio.run(main())
+    return time.perf_counter() - started, results
+
+
+HANDLERS = {
+    'wsgi': run_wsgi,
+    'asgi': run_asgi,
+}
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the WSGI and ASGI deployments."""
+
+    help = ('Send the same requests through the WSGI and ASGI handlers and '
+            'compare throughput.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='Paths with query strings to request, in turn.',
+        )
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument(
+            '--handler',
+            choices=sorted(HANDLERS),
+            help='Benchmark one handler in this process. Both are run in '
+                 'their own process if omitted.',
+        )
+
+    def _run_child(self, handler, options):
+        # URLs pick sync or async views on import, so each handler gets a
+        # process configured the way its deployment is.
+        env = {
+            **os.environ,
+            'ASYNC_VIEWS': '1' if handler == 'asgi' else '0',
+            'PYTHONPATH': os.pathsep.join(
+                filter(None, [str(settings.BASE_DIR),
+                              os.environ.get('PYTHONPATH')])
+            ),
+        }
+        command = [
+            sys.executable, '-m', 'django', 'benchmark_handlers',
+            '--handler', handler,
+            '--requests', str(options['requests']),
+            '--concurrency', str(options['concurrency']),
+            *options['paths'],
+        ]
+        result = subprocess.run(command, env=env, capture_output=True,
+                                text=True)
+        if result.returncode:
+            raise CommandError(result.stderr)
+        self.stdout.write(result.stdout, ending='')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        handler = options['handler']
+        if handler is None:
+            for handler in sorted(HANDLERS, reverse=True):
+                self._run_child(handler, options)
+            return
+        targets = []
+        for path in options['paths'] or DEFAULT_PATHS:
+            url = urlsplit(path)
+            targets.append((url.path, url.query))
+
+        elapsed, results = HANDLERS[handler](
+            targets, options['requests'], options['concurrency'],
+        )
+        timings = sorted(timing for timing, _status in results)
+        errors = sum(status >= 400 for _timing, status in results)
+        self.stdout.write(
+            f'{handler:>4}: {len(results) / elapsed:.1f} requests/s, '
+            f'mean {statistics.mean(timings) * 1000:.1f}ms, '
+            f'p95 {timings[int(len(timings) * 0.95)] * 1000:.1f}ms, '
+            f'{errors} errors over {len(results)} requests '
+            f'at concurrency {options["concurrency"]}'
+        )
@@ -0,0 +1,19 @@
+"""
+Django command to recount the lists every album appears in.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Album
+
+
+class Command(BaseCommand):
+    """Django command to reconcile album list counters."""
+
+    help = 'Recount the lists and public lists every album appears in.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        fixed = Album.reconcile_list_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed list counts of {fixed} albums.'
+        ))
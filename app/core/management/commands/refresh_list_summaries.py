@@ -0,0 +1,22 @@
+"""
+Django command to recompute the denormalized summaries of lists.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import List
+
+
+class Command(BaseCommand):
+    """Django command to refresh list summaries."""
+
+    help = 'Recompute entry counts, covers and top genres of every list.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        refreshed = 0
+        for list_obj in List.objects.order_by('id').iterator():
+            list_obj.refresh_summary()
+            refreshed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {refreshed} list summaries.'
+        ))
@@ -0,0 +1,42 @@
+"""
+Django command to respread entry positions of crowded lists.
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.models import Entry, List
+
+
+class Command(BaseCommand):
+    """Django command to respread list entry positions."""
+
+    help = (
+        'Renumber the entry positions of lists where neighbouring entries '
+        'have run out of room to move entries between them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-gap',
+            type=int,
+            default=64,
+            help='Respread lists with two entries closer than this.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        table = connection.ops.quote_name(Entry._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT DISTINCT owner_list_id FROM ('
+                f'SELECT owner_list_id, position - LAG(position) OVER '
+                f'(PARTITION BY owner_list_id ORDER BY position, id) AS gap '
+                f'FROM {table}) AS gaps WHERE gap < %s',
+                [options['min_gap']],
+            )
+            list_ids = [row[0] for row in cursor.fetchall()]
+        for list_obj in List.objects.filter(id__in=list_ids).only('id'):
+            list_obj.respread_positions()
+        self.stdout.write(self.style.SUCCESS(
+            f'Respread positions of {len(list_ids)} lists.'
+        ))
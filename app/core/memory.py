@@ -0,0 +1,134 @@
+"""
+Tracing of Python allocations in a live worker process.
+
+Tracing is started and stopped at runtime with tracemalloc. Snapshots
+are kept in the process that took them, so every call has to reach the
+same worker; each response names the process it came from.
+"""
+import os
+import threading
+import time
+import tracemalloc
+from itertools import count
+
+from django.conf import settings
+
+
+GROUPINGS = ('lineno', 'filename', 'traceback')
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+_snapshots = {}
+_ids = count(1)
+_lock = threading.Lock()
+
+
+class NotTracing(Exception):
+    """Allocations are not being traced."""
+
+
+def _max_snapshots():
+    return getattr(settings, 'MEMORY_PROFILING', {}).get('MAX_SNAPSHOTS', 10)
+
+
+def start(frames=1):
+    """Start tracing allocations, keeping frames frames per trace."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop():
+    """Stop tracing and drop every snapshot."""
+    tracemalloc.stop()
+    with _lock:
+        _snapshots.clear()
+
+
+def rss_bytes():
+    """Return the resident set size of this process, if known."""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def status():
+    """Return the tracing state of this process."""
+    traced, peak = tracemalloc.get_traced_memory()
+    with _lock:
+        snapshots = [
+            {'id': snapshot_id, 'taken_at': taken_at, 'traced_bytes': size}
+            for snapshot_id, (taken_at, size, _snapshot)
+            in sorted(_snapshots.items())
+        ]
+    return {
+        'pid': os.getpid(),
+        'tracing': tracemalloc.is_tracing(),
+        'frames': tracemalloc.get_traceback_limit(),
+        'traced_bytes': traced,
+        'peak_bytes': peak,
+        'rss_bytes': rss_bytes(),
+        'snapshots': snapshots,
+    }
+
+
+def take_snapshot():
+    """Snapshot traced allocations and return its id.
+
+    Only the newest ``MEMORY_PROFILING['MAX_SNAPSHOTS']`` are kept.
+    """
+    if not tracemalloc.is_tracing():
+        raise NotTracing()
+    snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    size = tracemalloc.get_traced_memory()[0]
+    with _lock:
+        snapshot_id = next(_ids)
+        _snapshots[snapshot_id] = (time.time(), size, snapshot)
+        for old_id in sorted(_snapshots)[:-_max_snapshots()]:
+            del _snapshots[old_id]
+    return snapshot_id
+
+
+def _get(snapshot_id):
+    with _lock:
+        return _snapshots[snapshot_id][2]
+
+
+def _location(stat, group_by):
+    if group_by == 'filename':
+        return stat.traceback[0].filename
+    return [f'{frame.filename}:{frame.lineno}' for frame in stat.traceback]
+
+
+def top(snapshot_id, group_by='lineno', limit=25):
+    """Return the largest allocation sites of a snapshot."""
+    stats = _get(snapshot_id).statistics(group_by)
+    return [
+        {
+            'location': _location(stat, group_by),
+            'size': stat.size,
+            'count': stat.count,
+        }
+        for stat in stats[:limit]
+    ]
+
+
+def diff(first_id, second_id, group_by='lineno', limit=25):
+    """Return the allocation sites that grew most between two snapshots."""
+    stats = _get(second_id).compare_to(_get(first_id), group_by)
+    return [
+        {
+            'location': _location(stat, group_by),
+            'size': stat.size,
+            'size_diff': stat.size_diff,
+            'count': stat.count,
+            'count_diff': stat.count_diff,
+        }
+        for stat in stats[:limit]
+    ]
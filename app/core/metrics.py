@@ -0,0 +1,448 @@
+"""
+Process-shared metrics exported in the Prometheus text format.
+
+Every process keeps its values in a memory mapped file of doubles in
+``METRICS['DIRECTORY']``, next to a file naming the series of each slot.
+Recording a value is a dict lookup cached on the metric child and an
+in-place add under a lock. A scrape sums the files of every process,
+counting gauges of live processes only. Without a directory values live
+in anonymous memory and only the scraping process is exported.
+"""
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import weakref
+from bisect import bisect_left
+
+from django.conf import settings
+
+from core.backends.postgresql.pool import pool_stats
+
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+SLOT_SIZE = 8
+
+INITIAL_SLOTS = 4096
+
+_FILE_NAME = re.compile(r'^(\d+)\.keys$')
+
+
+class _Store:
+    """Slots of one process, backed by a file or by anonymous memory."""
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.pid = os.getpid()
+        self.slots = {}
+        self.lock = threading.Lock()
+        self._keys = None
+        self._file = None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            base = os.path.join(directory, str(self.pid))
+            self._keys = open(f'{base}.keys', 'w', encoding='utf-8')
+            self._file = open(f'{base}.values', 'w+b')
+        self._map(INITIAL_SLOTS)
+
+    def _map(self, capacity):
+        size = capacity * SLOT_SIZE
+        if self._file is None:
+            memory = mmap.mmap(-1, size)
+            if getattr(self, 'memory', None) is not None:
+                memory[:len(self.memory)] = self.memory[:]
+                self.values.release()
+                self.memory.close()
+        else:
+            if getattr(self, 'memory', None) is not None:
+                self.values.release()
+                self.memory.close()
+            self._file.truncate(size)
+            memory = mmap.mmap(self._file.fileno(), size)
+        self.memory = memory
+        self.values = memoryview(memory).cast('d')
+        self.capacity = capacity
+
+    def slot(self, key):
+        """Return the slot of a series key, allocating it on first use."""
+        key = json.dumps(key)
+        slot = self.slots.get(key)
+        if slot is None:
+            with self.lock:
+                slot = self.slots.get(key)
+                if slot is None:
+                    slot = len(self.slots)
+                    if slot >= self.capacity:
+                        self._map(self.capacity * 2)
+                    if self._keys is not None:
+                        self._keys.write(key + '\n')
+                        self._keys.flush()
+                    self.slots[key] = slot
+        return slot
+
+    def items(self):
+        """Return the ``(key, value)`` pair of every slot."""
+        with self.lock:
+            return [
+                (json.loads(key), self.values[slot])
+                for key, slot in self.slots.items()
+            ]
+
+
+def _labels_key(names, values):
+    return [[name, str(value)] for name, value in zip(names, values)]
+
+
+class _Child:
+    def __init__(self, registry, metric, labels):
+        self.registry = registry
+        self.metric = metric
+        self.labels = labels
+        self._store = None
+
+    def _bind(self, store):
+        raise NotImplementedError
+
+    def _slots(self):
+        # Slots are rebound when a forked process starts its own store.
+        store = self.registry.store
+        if store is not self._store:
+            self._bind(store)
+            self._store = store
+        return store
+
+
+class _ValueChild(_Child):
+
+    def _bind(self, store):
+        self._slot = store.slot([self.metric.name, self.labels, ''])
+
+    def inc(self, amount=1.0):
+        """Add amount to the value."""
+        store = self._slots()
+        with store.lock:
+            store.values[self._slot] += amount
+
+    def set(self, value):
+        """Replace the value."""
+        store = self._slots()
+        with store.lock:
+            store.values[self._slot] = value
+
+
+class _HistogramChild(_Child):
+
+    def _bind(self, store):
+        name = self.metric.name
+        self._bounds = self.metric.buckets
+        self._buckets = [
+            store.slot([name, self.labels, index])
+            for index in range(len(self._bounds) + 1)
+        ]
+        self._sum = store.slot([name, self.labels, 'sum'])
+
+    def observe(self, value):
+        """Count value in its bucket and add it to the sum."""
+        store = self.registry.store
+        if store is not self._store:
+            store = self._slots()
+        bucket = self._buckets[bisect_left(self._bounds, value)]
+        with store.lock:
+            values = store.values
+            values[bucket] += 1.0
+            values[self._sum] += value
+
+
+class Metric:
+    """A named family of series distinguished by label values."""
+
+    type = None
+    child_class = _ValueChild
+    # Whether the series of dead processes still count.
+    keep_dead = True
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Return the series of the given label values."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self.child_class(
+                        self.registry, self,
+                        _labels_key(self.labelnames, values),
+                    )
+                    self._children[values] = child
+        return child
+
+
+class Counter(Metric):
+    type = 'counter'
+
+
+class Gauge(Metric):
+    type = 'gauge'
+    keep_dead = False
+
+
+class Histogram(Metric):
+    type = 'histogram'
+    child_class = _HistogramChild
+
+    def __init__(self, registry, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+
+def _after_fork(registry):
+    # A forked process records into a store of its own.
+    registry = registry()
+    if registry is not None:
+        registry.store = _Store(registry.directory)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{_escape(value)}"' for name, value in labels
+    ) + '}'
+
+
+def _format_value(value):
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class MetricsRegistry:
+    """Metrics of this process and, given a directory, its siblings."""
+
+    def __init__(self, directory=None, collect_interval=10):
+        self.directory = directory
+        self.collect_interval = collect_interval
+        self.metrics = {}
+        self.collectors = []
+        self.store = _Store(directory)
+        self._collected = 0.0
+        if hasattr(os, 'register_at_fork'):
+            registry = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: _after_fork(registry))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(
+            self, name, documentation, labelnames, buckets,
+        ))
+
+    def collector(self, func):
+        """Register func to refresh gauges and counters before export."""
+        self.collectors.append(func)
+        return func
+
+    def collect(self):
+        """Run the collectors of this process."""
+        self._collected = time.monotonic()
+        for func in self.collectors:
+            func()
+
+    def maybe_collect(self):
+        """Run the collectors unless they ran in the last interval."""
+        if time.monotonic() - self._collected >= self.collect_interval:
+            self.collect()
+
+    def _read_process(self, pid):
+        """Return the ``(key, value)`` pairs stored by a process."""
+        if pid == self.store.pid:
+            return self.store.items()
+        base = os.path.join(self.directory, str(pid))
+        try:
+            with open(f'{base}.keys', encoding='utf-8') as keys_file:
+                keys = [json.loads(line) for line in keys_file
+                        if line.endswith('\n')]
+            with open(f'{base}.values', 'rb') as values_file:
+                data = values_file.read(len(keys) * SLOT_SIZE)
+        except FileNotFoundError:
+            return []
+        values = memoryview(data).cast('d') if data else []
+        return list(zip(keys, values))
+
+    def _pids(self):
+        if not self.directory:
+            return [self.store.pid]
+        return [
+            int(match.group(1))
+            for match in map(_FILE_NAME.match, os.listdir(self.directory))
+            if match
+        ]
+
+    def aggregate(self):
+        """Return values summed over processes, keyed by series."""
+        totals = {}
+        for pid in self._pids():
+            alive = pid == self.store.pid or _pid_alive(pid)
+            for (name, labels, part), value in self._read_process(pid):
+                metric = self.metrics.get(name)
+                if metric is None or not (alive or metric.keep_dead):
+                    continue
+                key = (name, tuple(map(tuple, labels)), part)
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def export(self):
+        """Return every metric in the Prometheus text format."""
+        self.collect()
+        totals = self.aggregate()
+        series = {}
+        for (name, labels, part), value in totals.items():
+            series.setdefault(name, {}).setdefault(labels, {})[part] = value
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for labels, parts in sorted(series.get(name, {}).items()):
+                if metric.type != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} '
+                                 f'{_format_value(parts.get("", 0.0))}')
+                    continue
+                count = 0.0
+                bounds = [*map(repr, metric.buckets), '+Inf']
+                for index, bound in enumerate(bounds):
+                    count += parts.get(index, 0.0)
+                    lines.append(
+                        f'{name}_bucket'
+                        f'{_format_labels([*labels, ("le", bound)])} '
+                        f'{_format_value(count)}'
+                    )
+                lines.append(f'{name}_sum{_format_labels(labels)} '
+                             f'{_format_value(parts.get("sum", 0.0))}')
+                lines.append(f'{name}_count{_format_labels(labels)} '
+                             f'{_format_value(count)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _create_registry():
+    options = getattr(settings, 'METRICS', {})
+    return MetricsRegistry(
+        directory=options.get('DIRECTORY'),
+        collect_interval=options.get('COLLECT_INTERVAL', 10),
+    )
+
+
+registry = _create_registry()
+
+request_latency = registry.histogram(
+    'http_request_duration_seconds',
+    'Time taken to respond to requests, by view.',
+    ['view'],
+)
+request_queries = registry.histogram(
+    'http_request_queries',
+    'SQL queries run per request, by view.',
+    ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500),
+)
+responses = registry.counter(
+    'http_responses_total',
+    'Responses sent, by view and status code.',
+    ['view', 'status'],
+)
+cache_hits = registry.counter(
+    'cache_hits_total',
+    'Lookups served by an in-process cache, by cache and tier.',
+    ['cache', 'tier'],
+)
+cache_misses = registry.counter(
+    'cache_misses_total',
+    'Lookups missing every tier of an in-process cache.',
+    ['cache'],
+)
+pool_connections = registry.gauge(
+    'db_pool_connections',
+    'Open pooled database connections, by state.',
+    ['database', 'state'],
+)
+pool_max_size = registry.gauge(
+    'db_pool_max_size',
+    'Most connections a pool may open.',
+    ['database'],
+)
+pool_waiting = registry.gauge(
+    'db_pool_waiting',
+    'Threads waiting for a pooled connection.',
+    ['database'],
+)
+pool_events = registry.counter(
+    'db_pool_events_total',
+    'Pool checkouts, connects, discards and timeouts.',
+    ['database', 'event'],
+)
+pool_wait_seconds = registry.counter(
+    'db_pool_wait_seconds_total',
+    'Time spent checking out pooled connections.',
+    ['database'],
+)
+
+
+def record_cache(name, local, shared_hits=0):
+    """Record the lookups of a two tier cache built on LRUCache."""
+    cache_hits.labels(name, 'local').set(local.hits)
+    cache_hits.labels(name, 'shared').set(shared_hits)
+    cache_misses.labels(name).set(local.misses - shared_hits)
+
+
+@registry.collector
+def _collect_pools():
+    totals = {}
+    for stats in pool_stats():
+        # Pools of one database with different parameters, as in tests.
+        label = stats.pop('label')
+        pool = totals.setdefault(label, dict.fromkeys(stats, 0))
+        for key, value in stats.items():
+            pool[key] += value
+    for database, stats in totals.items():
+        pool_connections.labels(database, 'idle').set(stats['idle'])
+        pool_connections.labels(database, 'in_use').set(stats['in_use'])
+        pool_max_size.labels(database).set(stats['max_size'])
+        pool_waiting.labels(database).set(stats['waiting'])
+        for event in ('checkouts', 'connects', 'discards', 'timeouts'):
+            pool_events.labels(database, event).set(stats[event])
+        pool_wait_seconds.labels(database).set(stats['wait_seconds'])
@@ -0,0 +1,475 @@
+"""
+Middleware choosing the database requests read from, timing, measuring
+and profiling them and logging their slow queries.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError
+from django.http import HttpResponse
+
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import memory, metrics, slow_queries, timing
+from core.profiling import PROFILERS, ProfileStore
+from core.routers import read_database
+from user.authentication import CachedTokenAuthentication
+
+
+timing_logger = logging.getLogger('core.timing')
+
+memory_logger = logging.getLogger('core.memory')
+
+slow_query_logger = logging.getLogger('core.slow_queries')
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class AsyncCapableMiddleware:
+    """Base of middleware serving requests under WSGI and ASGI alike.
+
+    Subclasses handle requests in ``handle()`` and ``ahandle()``. When the
+    rest of the chain is async, requests go to ``ahandle()`` and don't hold
+    a thread while they wait for the response.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Marks the instance as a coroutine function for the handler,
+            # as Django's MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.ahandle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def ahandle(self, request):
+        raise NotImplementedError
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """Read from a random replica on safe requests.
+
+    Clients that just wrote read from the primary for
+    ``DATABASE_PRIMARY_PIN_SECONDS`` so they see their own writes. They're
+    pinned in the default cache by their Authorization header or else
+    their address, which every worker sees when CACHES is shared, and by a
+    signed cookie for clients keeping cookies.
+    """
+
+    cookie_name = 'db_pin'
+    cookie_salt = 'core.middleware.ReplicaRoutingMiddleware'
+
+    def _pin_key(self, request):
+        client = request.META.get('HTTP_AUTHORIZATION') or \
+            request.META.get('REMOTE_ADDR', '')
+        digest = hashlib.sha256(client.encode('utf-8')).hexdigest()
+        return f'db-pin:{digest}'
+
+    def _has_pin_cookie(self, request, seconds):
+        return request.get_signed_cookie(
+            self.cookie_name, default=None, salt=self.cookie_salt,
+            max_age=seconds,
+        ) is not None
+
+    def _set_pin_cookie(self, response, seconds):
+        response.set_signed_cookie(
+            self.cookie_name, '1', salt=self.cookie_salt,
+            max_age=seconds, httponly=True, samesite='Lax',
+        )
+
+    def handle(self, request):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            return self.get_response(request)
+        seconds = getattr(settings, 'DATABASE_PRIMARY_PIN_SECONDS', 5)
+        key = self._pin_key(request)
+        safe = request.method in SAFE_METHODS
+        alias = None
+        if safe and not (
+            self._has_pin_cookie(request, seconds) or cache.get(key)
+        ):
+            alias = random.choice(replicas)
+        token = read_database.set(alias)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+            if not safe:
+                cache.set(key, True, seconds)
+        if not safe:
+            self._set_pin_cookie(response, seconds)
+        return response
+
+    async def ahandle(self, request):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            return await self.get_response(request)
+        seconds = getattr(settings, 'DATABASE_PRIMARY_PIN_SECONDS', 5)
+        key = self._pin_key(request)
+        safe = request.method in SAFE_METHODS
+        alias = None
+        if safe and not (
+            self._has_pin_cookie(request, seconds) or await cache.aget(key)
+        ):
+            alias = random.choice(replicas)
+        token = read_database.set(alias)
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+            if not safe:
+                await cache.aset(key, True, seconds)
+        if not safe:
+            self._set_pin_cookie(response, seconds)
+        return response
+
+
+class ServerTimingMiddleware(AsyncCapableMiddleware):
+    """Report where the time of each request went.
+
+    Adds a ``Server-Timing`` header with SQL, serializer, renderer and
+    total time and logs the same as one JSON line. Enabled with
+    ``SERVER_TIMING['ENABLED']``; otherwise the middleware removes itself
+    and serializers and renderers aren't timed.
+    """
+
+    def __init__(self, get_response):
+        options = getattr(settings, 'SERVER_TIMING', {})
+        if not options.get('ENABLED'):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.header = options.get('HEADER', True)
+        self.log = options.get('LOG', True)
+        timing.install()
+
+    def handle(self, request):
+        request_timing = timing.RequestTiming()
+        token = timing.current_timing.set(request_timing)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            total = time.perf_counter() - start
+            timing.current_timing.reset(token)
+        return self._report(request, response, request_timing, total)
+
+    async def ahandle(self, request):
+        request_timing = timing.RequestTiming()
+        token = timing.current_timing.set(request_timing)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            total = time.perf_counter() - start
+            timing.current_timing.reset(token)
+        return self._report(request, response, request_timing, total)
+
+    def _report(self, request, response, request_timing, total):
+        if self.header:
+            response['Server-Timing'] = request_timing.header(total)
+        if self.log:
+            timing_logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                **request_timing.as_dict(total),
+            }))
+        return response
+
+
+def view_label(request):
+    """Return the name requests to a view are recorded under.
+
+    Viewsets are named after their class and action, other views after
+    their URL name.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    cls = getattr(match.func, 'cls', None)
+    if cls is None:
+        return match.view_name or match.func.__name__
+    method = request.method.lower()
+    action = (getattr(match.func, 'actions', None) or {}).get(method, method)
+    return f'{cls.__name__}.{action}'
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Record latency, query count and status of requests per view.
+
+    Queries are counted with the timing of ``ServerTimingMiddleware`` when
+    it runs, or else a timing of this middleware's own. Only the SQL
+    execute wrapper is installed for it, see ``core.timing``.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        timing.install_sql()
+
+    def handle(self, request):
+        request_timing = timing.current_timing.get()
+        token = None
+        if request_timing is None:
+            request_timing = timing.RequestTiming()
+            token = timing.current_timing.set(request_timing)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            if token is not None:
+                timing.current_timing.reset(token)
+        return self._record(request, response, request_timing, elapsed)
+
+    async def ahandle(self, request):
+        request_timing = timing.current_timing.get()
+        token = None
+        if request_timing is None:
+            request_timing = timing.RequestTiming()
+            token = timing.current_timing.set(request_timing)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            if token is not None:
+                timing.current_timing.reset(token)
+        return self._record(request, response, request_timing, elapsed)
+
+    def _record(self, request, response, request_timing, elapsed):
+        view = view_label(request)
+        metrics.request_latency.labels(view).observe(elapsed)
+        metrics.request_queries.labels(view).observe(request_timing.queries)
+        metrics.responses.labels(view, response.status_code).inc()
+        metrics.registry.maybe_collect()
+        return response
+
+
+def is_staff_request(request):
+    """Return whether a request comes from a staff user.
+
+    Checks the session user first, then the API token.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            authenticated = CachedTokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        user = authenticated[0] if authenticated else None
+    return bool(user is not None and user.is_staff)
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """Profile requests asked for by staff or picked at random.
+
+    Staff opt in with the ``PROFILING['HEADER']`` header or the
+    ``PROFILING['QUERY_PARAM']`` parameter, naming a profiler from
+    core.profiling.PROFILERS or using the default one. They get back a
+    text summary instead of the response. A ``SAMPLE_RATE`` share of
+    other requests is profiled silently. Every profile is kept in the
+    ring buffer in ``PROFILING['DIRECTORY']``. Under ASGI profiled requests
+    are served from a thread, which their sync views run on as well.
+    """
+
+    def __init__(self, get_response):
+        options = getattr(settings, 'PROFILING', {})
+        if not options.get('ENABLED'):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        header = options.get('HEADER', 'X-Profile')
+        self.header = 'HTTP_' + header.upper().replace('-', '_')
+        self.param = options.get('QUERY_PARAM', 'profile')
+        self.default = options.get('PROFILER', 'sample')
+        self.interval = options.get('INTERVAL', 0.005)
+        self.sample_rate = options.get('SAMPLE_RATE', 0)
+        self.store = ProfileStore(
+            options['DIRECTORY'], options.get('RING_SIZE', 100),
+        )
+
+    def _asked(self, request):
+        return request.META.get(self.header) or request.GET.get(self.param)
+
+    def _requested(self, request):
+        """Return the profiler staff asked for, or None."""
+        kind = self._asked(request)
+        if not kind or not is_staff_request(request):
+            return None
+        return kind if kind in PROFILERS else self.default
+
+    def _sampled(self):
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    def handle(self, request):
+        return self._serve(request, self.get_response, self._sampled())
+
+    async def ahandle(self, request):
+        sampled = self._sampled()
+        if not (sampled or self._asked(request)):
+            return await self.get_response(request)
+        # The profilers watch one thread, so the request is served from a
+        # thread, which sync views down the chain then run on too.
+        return await sync_to_async(self._serve)(
+            request, async_to_sync(self.get_response), sampled,
+        )
+
+    def _serve(self, request, get_response, sampled):
+        kind = self._requested(request)
+        if kind is None and not sampled:
+            return get_response(request)
+        profiler = PROFILERS[kind or self.default](interval=self.interval)
+        profiler.start()
+        try:
+            response = get_response(request)
+        finally:
+            profiler.stop()
+        path = self.store.save(profiler, request)
+        if kind is None:
+            return response
+        summary = HttpResponse(
+            profiler.summary(), content_type='text/plain; charset=utf-8',
+        )
+        summary['X-Profile-Status'] = response.status_code
+        summary['X-Profile-File'] = os.path.basename(path)
+        return summary
+
+
+class MemoryProfilingMiddleware(AsyncCapableMiddleware):
+    """Log the peak traced allocation of requests with large responses.
+
+    Only runs while tracemalloc traces, started with
+    ``MEMORY_PROFILING['START']`` or through the memory API. The peak is
+    process wide, so requests served at the same time in other threads
+    add to it. Streamed responses have no known size and aren't logged.
+    """
+
+    def __init__(self, get_response):
+        options = getattr(settings, 'MEMORY_PROFILING', {})
+        if not options.get('ENABLED'):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.min_bytes = options.get('LOG_RESPONSE_BYTES', 1024 * 1024)
+        if options.get('START'):
+            memory.start(options.get('FRAMES', 1))
+
+    def handle(self, request):
+        if not tracemalloc.is_tracing():
+            return self.get_response(request)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        response = self.get_response(request)
+        return self._log(request, response, before)
+
+    async def ahandle(self, request):
+        if not tracemalloc.is_tracing():
+            return await self.get_response(request)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        response = await self.get_response(request)
+        return self._log(request, response, before)
+
+    def _log(self, request, response, before):
+        if not tracemalloc.is_tracing() or response.streaming:
+            return response
+        size = len(response.content)
+        if size >= self.min_bytes:
+            current, peak = tracemalloc.get_traced_memory()
+            memory_logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'response_bytes': size,
+                'peak_bytes': peak - before,
+                'retained_bytes': current - before,
+            }))
+        return response
+
+
+class SlowQueryMiddleware(AsyncCapableMiddleware):
+    """Log statements slower than ``SLOW_QUERIES['THRESHOLD_MS']``.
+
+    Each is stored with the view and filter combination of its request,
+    see ``core.slow_queries``. Sampled SELECTs are explained and the
+    statements stored when the response is closed, after it has been
+    sent, so neither delays the response.
+    """
+
+    def __init__(self, get_response):
+        options = getattr(settings, 'SLOW_QUERIES', {})
+        if not options.get('ENABLED'):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.threshold = options.get('THRESHOLD_MS', 100)
+        self.explain_rate = options.get('EXPLAIN_SAMPLE_RATE', 0.1)
+        self.explain_interval = options.get('EXPLAIN_INTERVAL', 300)
+        self.explain_timeout = options.get('EXPLAIN_TIMEOUT_MS', 5000)
+        self.filter_values = options.get('FILTER_VALUES', [])
+        self.max_samples = options.get('MAX_SAMPLES', 50)
+        slow_queries.install()
+
+    def _log(self):
+        return slow_queries.SlowQueryLog(
+            self.threshold, self.explain_rate, self.explain_interval,
+            self.explain_timeout,
+        )
+
+    def handle(self, request):
+        log = self._log()
+        token = slow_queries.current_log.set(log)
+        try:
+            response = self.get_response(request)
+        finally:
+            slow_queries.current_log.reset(token)
+        if log.entries:
+            self._defer(request, response, log)
+        return response
+
+    async def ahandle(self, request):
+        log = self._log()
+        token = slow_queries.current_log.set(log)
+        try:
+            response = await self.get_response(request)
+        finally:
+            slow_queries.current_log.reset(token)
+        if log.entries:
+            self._defer(request, response, log)
+        return response
+
+    def _defer(self, request, response, log):
+        view = view_label(request)
+        filters = slow_queries.describe_filters(
+            request.GET, self.filter_values,
+        )
+        # Django's close() runs these once the server has sent the
+        # response, before request_finished tidies up connections.
+        response._resource_closers.append(
+            lambda: self._save(log, view, filters),
+        )
+
+    def _save(self, log, view, filters):
+        log.explain()
+        try:
+            log.save(view, filters, self.max_samples)
+        except DatabaseError:
+            slow_query_logger.exception('Could not store slow queries')
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.10 on 2026-10-19 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_searchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='list',
+            name='cover_images',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='entry_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='top_genres',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.0.10 on 2026-10-19 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_list_summary'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='entry',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='position',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            sql=(
+                'UPDATE core_entry SET position = ranked.rank * 1048576 '
+                'FROM (SELECT id, ROW_NUMBER() OVER '
+                '(PARTITION BY owner_list_id ORDER BY id) AS rank '
+                'FROM core_entry) AS ranked '
+                'WHERE core_entry.id = ranked.id'
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['owner_list', 'position'], name='entry_list_position_idx'),
+        ),
+    ]
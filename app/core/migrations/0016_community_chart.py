@@ -0,0 +1,31 @@
+# Generated by Django 4.0.10 on 2026-10-19 02:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_entry_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChartEntry',
+            fields=[
+                ('album', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='chart_entry', serialize=False, to='core.album')),
+                ('score', models.BigIntegerField(default=0)),
+                ('appearances', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='list',
+            name='chart_points',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddIndex(
+            model_name='chartentry',
+            index=models.Index(fields=['-score', 'album'], name='chartentry_score_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.0.10 on 2026-10-19 03:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_community_chart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlbumNeighbourQueue',
+            fields=[
+                ('album_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('queued_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AlbumNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('album', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='core.album')),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.album')),
+            ],
+            options={
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='albumneighbour',
+            constraint=models.UniqueConstraint(fields=('album', 'rank'), name='albumneighbour_album_rank_key'),
+        ),
+    ]
@@ -0,0 +1,147 @@
+# Generated by Django 4.0.10 on 2026-10-19 03:36
+
+from django.db import migrations, models
+
+
+# Statement level triggers keep Album.list_count and public_list_count in
+# step with entries however they're written, including bulk inserts and
+# INSERT ... SELECT. An entry only changes the counts when it's the first
+# entry of its album added to a list, or the last one removed from it.
+COUNT_TRIGGERS = """
+CREATE FUNCTION core_entry_count_inserted() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_album SET
+        list_count = core_album.list_count + added.lists,
+        public_list_count = core_album.public_list_count + added.public_lists
+    FROM (
+        SELECT new_entries.album_id,
+            COUNT(DISTINCT new_entries.owner_list_id) AS lists,
+            COUNT(DISTINCT new_entries.owner_list_id)
+                FILTER (WHERE core_list.public) AS public_lists
+        FROM new_entries
+        JOIN core_list ON core_list.id = new_entries.owner_list_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM core_entry
+            WHERE core_entry.album_id = new_entries.album_id
+            AND core_entry.owner_list_id = new_entries.owner_list_id
+            AND core_entry.id NOT IN (SELECT id FROM new_entries)
+        )
+        GROUP BY new_entries.album_id
+    ) AS added
+    WHERE core_album.id = added.album_id;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER core_entry_count_inserted
+AFTER INSERT ON core_entry
+REFERENCING NEW TABLE AS new_entries
+FOR EACH STATEMENT EXECUTE FUNCTION core_entry_count_inserted();
+
+CREATE FUNCTION core_entry_count_deleted() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_album SET
+        list_count = core_album.list_count - removed.lists,
+        public_list_count =
+            core_album.public_list_count - removed.public_lists
+    FROM (
+        SELECT old_entries.album_id,
+            COUNT(DISTINCT old_entries.owner_list_id) AS lists,
+            COUNT(DISTINCT old_entries.owner_list_id)
+                FILTER (WHERE core_list.public) AS public_lists
+        FROM old_entries
+        LEFT JOIN core_list ON core_list.id = old_entries.owner_list_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM core_entry
+            WHERE core_entry.album_id = old_entries.album_id
+            AND core_entry.owner_list_id = old_entries.owner_list_id
+        )
+        GROUP BY old_entries.album_id
+    ) AS removed
+    WHERE core_album.id = removed.album_id;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER core_entry_count_deleted
+AFTER DELETE ON core_entry
+REFERENCING OLD TABLE AS old_entries
+FOR EACH STATEMENT EXECUTE FUNCTION core_entry_count_deleted();
+
+CREATE FUNCTION core_list_count_public() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE core_album SET public_list_count =
+        core_album.public_list_count + CASE WHEN NEW.public THEN 1 ELSE -1 END
+    WHERE core_album.id IN (
+        SELECT album_id FROM core_entry WHERE owner_list_id = NEW.id
+    );
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER core_list_count_public
+AFTER UPDATE OF public ON core_list
+FOR EACH ROW WHEN (OLD.public IS DISTINCT FROM NEW.public)
+EXECUTE FUNCTION core_list_count_public();
+"""
+
+DROP_COUNT_TRIGGERS = """
+DROP TRIGGER core_list_count_public ON core_list;
+DROP FUNCTION core_list_count_public();
+DROP TRIGGER core_entry_count_deleted ON core_entry;
+DROP FUNCTION core_entry_count_deleted();
+DROP TRIGGER core_entry_count_inserted ON core_entry;
+DROP FUNCTION core_entry_count_inserted();
+"""
+
+COUNT_LISTS = """
+UPDATE core_album SET
+    list_count = counted.lists,
+    public_list_count = counted.public_lists
+FROM (
+    SELECT core_album.id,
+        COUNT(DISTINCT core_entry.owner_list_id) AS lists,
+        COUNT(DISTINCT core_entry.owner_list_id)
+            FILTER (WHERE core_list.public) AS public_lists
+    FROM core_album
+    LEFT JOIN core_entry ON core_entry.album_id = core_album.id
+    LEFT JOIN core_list ON core_list.id = core_entry.owner_list_id
+    GROUP BY core_album.id
+) AS counted
+WHERE core_album.id = counted.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_album_neighbours'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='album',
+            name='list_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='album',
+            name='public_list_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='album',
+            index=models.Index(fields=['-public_list_count', 'id'], name='album_public_list_count_idx'),
+        ),
+        migrations.RunSQL(
+            sql=COUNT_TRIGGERS,
+            reverse_sql=DROP_COUNT_TRIGGERS,
+        ),
+        migrations.RunSQL(
+            sql=COUNT_LISTS,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
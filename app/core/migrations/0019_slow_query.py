@@ -0,0 +1,56 @@
+# Generated by Django 4.0.10 on 2026-10-19 03:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_album_list_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True)),
+                ('statement', models.TextField()),
+                ('calls', models.BigIntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'slow queries',
+            },
+        ),
+        migrations.CreateModel(
+            name='SlowQuerySample',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField()),
+                ('duration_ms', models.FloatField()),
+                ('database', models.CharField(max_length=100)),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('filters', models.CharField(blank=True, max_length=500)),
+                ('sql', models.TextField()),
+                ('params', models.JSONField(blank=True, null=True)),
+                ('plan', models.TextField(blank=True)),
+                ('query', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='samples', to='core.slowquery')),
+            ],
+            options={
+                'ordering': ['-recorded_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='slowquery',
+            index=models.Index(fields=['-total_ms'], name='slowquery_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slowquerysample',
+            index=models.Index(fields=['query', '-recorded_at'], name='slowquerysample_query_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.0.10 on 2026-10-19 05:10
+
+from django.db import migrations
+
+
+# Keeps Album.list_count and public_list_count right when entries are moved
+# to another album or list. Triggers with transition tables can't name
+# columns, so this one runs after every UPDATE of entries and only counts
+# the rows whose album or list changed. A list starts counting for an
+# album when no entry had the pair before the statement, and stops when
+# none has it afterwards.
+MOVE_TRIGGER = """
+CREATE FUNCTION core_entry_count_updated() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    WITH moved AS (
+        SELECT old_entries.id,
+            old_entries.album_id AS old_album_id,
+            old_entries.owner_list_id AS old_list_id,
+            new_entries.album_id AS new_album_id,
+            new_entries.owner_list_id AS new_list_id
+        FROM old_entries
+        JOIN new_entries ON new_entries.id = old_entries.id
+        WHERE old_entries.album_id <> new_entries.album_id
+        OR old_entries.owner_list_id <> new_entries.owner_list_id
+    ), changes AS (
+        SELECT moved.old_album_id AS album_id,
+            moved.old_list_id AS list_id,
+            -1 AS change
+        FROM moved
+        WHERE NOT EXISTS (
+            SELECT 1 FROM core_entry
+            WHERE core_entry.album_id = moved.old_album_id
+            AND core_entry.owner_list_id = moved.old_list_id
+        )
+        UNION
+        SELECT moved.new_album_id, moved.new_list_id, 1
+        FROM moved
+        WHERE NOT EXISTS (
+            SELECT 1 FROM core_entry
+            WHERE core_entry.album_id = moved.new_album_id
+            AND core_entry.owner_list_id = moved.new_list_id
+            AND core_entry.id NOT IN (SELECT id FROM moved)
+        )
+        AND NOT EXISTS (
+            SELECT 1 FROM moved AS earlier
+            WHERE earlier.old_album_id = moved.new_album_id
+            AND earlier.old_list_id = moved.new_list_id
+        )
+    )
+    UPDATE core_album SET
+        list_count = core_album.list_count + counted.lists,
+        public_list_count =
+            core_album.public_list_count + counted.public_lists
+    FROM (
+        SELECT changes.album_id,
+            SUM(changes.change) AS lists,
+            COALESCE(
+                SUM(changes.change) FILTER (WHERE core_list.public), 0
+            ) AS public_lists
+        FROM changes
+        LEFT JOIN core_list ON core_list.id = changes.list_id
+        GROUP BY changes.album_id
+    ) AS counted
+    WHERE core_album.id = counted.album_id;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER core_entry_count_updated
+AFTER UPDATE ON core_entry
+REFERENCING OLD TABLE AS old_entries NEW TABLE AS new_entries
+FOR EACH STATEMENT EXECUTE FUNCTION core_entry_count_updated();
+"""
+
+DROP_MOVE_TRIGGER = """
+DROP TRIGGER core_entry_count_updated ON core_entry;
+DROP FUNCTION core_entry_count_updated();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_slow_query'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=MOVE_TRIGGER,
+            reverse_sql=DROP_MOVE_TRIGGER,
+        ),
+    ]
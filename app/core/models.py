@@ -5,8 +5,9 @@ import uuid
 import os
 
 from django.conf import settings
-from django.db import models
+from django.db import connection, models, transaction
 from django.db.models import Q, F
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -89,10 +90,58 @@ class Album(models.Model):
     secondary_genres = models.ManyToManyField('Genre', related_name='secondary_albums', blank=True)
     tags = models.ManyToManyField('Tag', related_name='tag_albums', blank=True)
     image = models.ImageField(null=True, upload_to=album_image_file_path)
+    # Number of lists, and of public lists, with the album on them. Both
+    # are kept up to date by database triggers on entries and lists.
+    list_count = models.PositiveIntegerField(default=0)
+    public_list_count = models.PositiveIntegerField(default=0)
+
+    COUNTER_FIELDS = {'list_count', 'public_list_count'}
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        """Save the album without overwriting its list counters."""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def reconcile_list_counts(cls):
+        """Recount the lists of every album, returning how many were off."""
+        albums = connection.ops.quote_name(cls._meta.db_table)
+        entries = connection.ops.quote_name(Entry._meta.db_table)
+        lists = connection.ops.quote_name(List._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {albums} SET list_count = counted.lists, '
+                f'public_list_count = counted.public_lists FROM ('
+                f'SELECT {albums}.id, '
+                f'COUNT(DISTINCT {entries}.owner_list_id) AS lists, '
+                f'COUNT(DISTINCT {entries}.owner_list_id) '
+                f'FILTER (WHERE {lists}.public) AS public_lists '
+                f'FROM {albums} '
+                f'LEFT JOIN {entries} ON {entries}.album_id = {albums}.id '
+                f'LEFT JOIN {lists} ON {lists}.id = {entries}.owner_list_id '
+                f'GROUP BY {albums}.id) AS counted '
+                f'WHERE {albums}.id = counted.id '
+                f'AND ({albums}.list_count, {albums}.public_list_count) '
+                f'IS DISTINCT FROM (counted.lists, counted.public_lists)'
+            )
+            return cursor.rowcount
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-public_list_count', 'id'],
+                name='album_public_list_count_idx',
+            ),
+        ]
+
 
 class Genre(models.Model):
     """Genres for albums."""
@@ -116,6 +165,20 @@ class Entry(models.Model):
     album = models.ForeignKey('Album', on_delete=models.CASCADE)
     owner_list = models.ForeignKey('List', related_name='entries', on_delete=models.CASCADE)
     description = models.CharField(max_length=4096, blank=True)
+    position = models.BigIntegerField(default=0)
+
+    # Spacing between consecutive positions, leaving room for about twenty
+    # moves into the same spot before the list has to be respread.
+    POSITION_GAP = 1 << 20
+
+    class Meta:
+        ordering = ['position', 'id']
+        indexes = [
+            models.Index(
+                fields=['owner_list', 'position'],
+                name='entry_list_position_idx',
+            ),
+        ]
 
 
 class List(models.Model):
@@ -123,4 +186,305 @@ class List(models.Model):
     label = models.CharField(max_length=255)
     user = models.ForeignKey('User', related_name='user_lists', on_delete=models.CASCADE)
     albums = models.ManyToManyField(Album, through='Entry')
-    public = models.BooleanField(default=False)
\ No newline at end of file
+    public = models.BooleanField(default=False)
+    entry_count = models.PositiveIntegerField(default=0)
+    cover_images = models.JSONField(default=list, blank=True)
+    top_genres = models.JSONField(default=list, blank=True)
+    chart_points = models.JSONField(default=dict, blank=True)
+
+    SUMMARY_COVERS = 4
+    SUMMARY_GENRES = 3
+
+    def refresh_summary(self):
+        """Recompute the denormalized summary of the list's entries."""
+        entries = Entry.objects.filter(owner_list=self)
+        self.entry_count = entries.count()
+        self.cover_images = list(
+            entries.exclude(album__image__isnull=True).exclude(
+                album__image=''
+            ).order_by('position', 'id').values_list(
+                'album__image', flat=True
+            )[:self.SUMMARY_COVERS]
+        )
+        self.top_genres = [
+            [genre.id, genre.name]
+            for genre in Genre.objects.filter(
+                primary_albums__entry__owner_list=self
+            ).annotate(
+                entries=models.Count('primary_albums__entry')
+            ).order_by('-entries', 'id')[:self.SUMMARY_GENRES]
+        ]
+        self.save(update_fields=['entry_count', 'cover_images', 'top_genres'])
+        self.refresh_chart()
+
+    def chart_scores(self):
+        """Return the Borda points the list gives each of its albums.
+
+        Only public lists score. An album listed twice counts at its best
+        rank.
+        """
+        if not self.public:
+            return {}
+        album_ids = Entry.objects.filter(owner_list=self).order_by(
+            'position', 'id'
+        ).values_list('album_id', flat=True)[:ChartEntry.LIST_DEPTH]
+        points = {}
+        for rank, album_id in enumerate(album_ids):
+            points.setdefault(str(album_id), ChartEntry.LIST_DEPTH - rank)
+        return points
+
+    @transaction.atomic
+    def refresh_chart(self, withdraw=False):
+        """Apply the change in the list's chart points to the chart.
+
+        The points stored on the list are diffed against its current ones
+        and only the difference is added to the affected chart rows, with
+        an upsert for gains and an update for losses. With withdraw the
+        list's points are removed, as when it is deleted.
+        """
+        stored = List.objects.select_for_update().values_list(
+            'chart_points', flat=True,
+        ).get(pk=self.pk)
+        points = {} if withdraw else self.chart_scores()
+        deltas = []
+        # Chart rows are always locked in album order so that concurrent
+        # refreshes can't deadlock.
+        for album_id in sorted(stored.keys() | points.keys(), key=int):
+            old, new = stored.get(album_id, 0), points.get(album_id, 0)
+            if old != new:
+                deltas.append((
+                    int(album_id), new - old, bool(new) - bool(old),
+                ))
+        self.chart_points = points
+        if not deltas:
+            return
+        chart = connection.ops.quote_name(ChartEntry._meta.db_table)
+        albums = connection.ops.quote_name(Album._meta.db_table)
+        # The CHECK on appearances applies to the row an upsert proposes,
+        # before its conflict is resolved, so rows losing points are
+        # updated instead. Existing rows are locked first, in album order.
+        gains = [delta for delta in deltas if delta[1] >= 0]
+        losses = [delta for delta in deltas if delta[1] < 0]
+        with connection.cursor() as cursor:
+            if losses:
+                cursor.execute(
+                    f'SELECT 1 FROM {chart} WHERE album_id = ANY(%s) '
+                    f'ORDER BY album_id FOR UPDATE',
+                    [[delta[0] for delta in deltas]],
+                )
+                values = ', '.join(['(%s, %s, %s)'] * len(losses))
+                cursor.execute(
+                    f'UPDATE {chart} SET '
+                    f'score = {chart}.score + delta.score, '
+                    f'appearances = {chart}.appearances + delta.appearances '
+                    f'FROM (VALUES {values}) '
+                    f'AS delta (album_id, score, appearances) '
+                    f'WHERE {chart}.album_id = delta.album_id',
+                    [value for delta in losses for value in delta],
+                )
+            if gains:
+                values = ', '.join(['(%s, %s, %s)'] * len(gains))
+                # Albums deleted since the list last scored are skipped.
+                cursor.execute(
+                    f'INSERT INTO {chart} (album_id, score, appearances) '
+                    f'SELECT delta.album_id, delta.score, delta.appearances '
+                    f'FROM (VALUES {values}) '
+                    f'AS delta (album_id, score, appearances) '
+                    f'WHERE EXISTS (SELECT 1 FROM {albums} '
+                    f'WHERE {albums}.id = delta.album_id) '
+                    f'ON CONFLICT (album_id) DO UPDATE SET '
+                    f'score = {chart}.score + EXCLUDED.score, '
+                    f'appearances = '
+                    f'{chart}.appearances + EXCLUDED.appearances',
+                    [value for delta in gains for value in delta],
+                )
+        ChartEntry.objects.filter(
+            album_id__in=[delta[0] for delta in deltas], appearances=0,
+        ).delete()
+        List.objects.filter(pk=self.pk).update(chart_points=points)
+        if any(delta[2] for delta in deltas):
+            # The list's membership changed, so every album on it now
+            # co-occurs with a different set of albums.
+            AlbumNeighbourQueue.enqueue(stored.keys() | points.keys())
+
+    @transaction.atomic
+    def clone(self, user, label=None):
+        """Copy the list and its entries into a new private list of user.
+
+        Entries are copied with a single INSERT ... SELECT, keeping their
+        positions and descriptions, and the summary is copied as is.
+        """
+        copy = List.objects.create(
+            user=user,
+            label=self.label if label is None else label,
+            entry_count=self.entry_count,
+            cover_images=self.cover_images,
+            top_genres=self.top_genres,
+        )
+        table = connection.ops.quote_name(Entry._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} '
+                f'(album_id, owner_list_id, description, position) '
+                f'SELECT album_id, %s, description, position FROM {table} '
+                f'WHERE owner_list_id = %s',
+                [copy.id, self.id],
+            )
+        return copy
+
+    def respread_positions(self):
+        """Renumber entry positions evenly, keeping their current order."""
+        table = connection.ops.quote_name(Entry._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET position = ranked.rank * %s '
+                f'FROM (SELECT id, ROW_NUMBER() OVER '
+                f'(ORDER BY position, id) AS rank FROM {table} '
+                f'WHERE owner_list_id = %s) AS ranked '
+                f'WHERE {table}.id = ranked.id',
+                [Entry.POSITION_GAP, self.id],
+            )
+
+
+class ChartEntry(models.Model):
+    """Community chart score of an album across public lists."""
+    # Only the top entries of a public list score, the entry at rank r
+    # (from 0) earning LIST_DEPTH - r points.
+    LIST_DEPTH = 100
+
+    album = models.OneToOneField(
+        'Album',
+        primary_key=True,
+        related_name='chart_entry',
+        on_delete=models.CASCADE,
+    )
+    score = models.BigIntegerField(default=0)
+    appearances = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.album_id}: {self.score}'
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-score', 'album'],
+                name='chartentry_score_idx',
+            ),
+        ]
+
+
+class AlbumNeighbour(models.Model):
+    """Album often listed together with another album."""
+    album = models.ForeignKey(
+        'Album',
+        related_name='neighbours',
+        on_delete=models.CASCADE,
+    )
+    neighbour = models.ForeignKey(
+        'Album',
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['rank']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['album', 'rank'],
+                name='albumneighbour_album_rank_key',
+            ),
+        ]
+
+
+class AlbumNeighbourQueue(models.Model):
+    """Album whose neighbours have to be recomputed."""
+    album_id = models.BigIntegerField(primary_key=True)
+    queued_at = models.DateTimeField()
+
+    @classmethod
+    def enqueue(cls, album_ids):
+        """Queue albums in one upsert, bumping ones already queued."""
+        album_ids = sorted({int(album_id) for album_id in album_ids})
+        if not album_ids:
+            return
+        table = connection.ops.quote_name(cls._meta.db_table)
+        now = timezone.now()
+        values = ', '.join(['(%s, %s)'] * len(album_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (album_id, queued_at) '
+                f'VALUES {values} '
+                f'ON CONFLICT (album_id) DO UPDATE SET '
+                f'queued_at = EXCLUDED.queued_at',
+                [value for pk in album_ids for value in (pk, now)],
+            )
+
+
+class SearchTerm(models.Model):
+    """Normalized search term with how often it was searched."""
+    term = models.CharField(max_length=255, unique=True)
+    count = models.BigIntegerField(default=0)
+    last_searched = models.DateTimeField()
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-count'], name='searchterm_count_idx'),
+        ]
+
+
+class SlowQuery(models.Model):
+    """Statements slower than the slow query threshold, per fingerprint."""
+    fingerprint = models.CharField(max_length=40, unique=True)
+    statement = models.TextField()
+    calls = models.BigIntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    def __str__(self):
+        return self.statement[:100]
+
+    @property
+    def mean_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
+
+    class Meta:
+        verbose_name_plural = 'slow queries'
+        indexes = [
+            models.Index(fields=['-total_ms'], name='slowquery_total_idx'),
+        ]
+
+
+class SlowQuerySample(models.Model):
+    """One slow execution of a statement and the request it came from."""
+    query = models.ForeignKey(
+        'SlowQuery',
+        related_name='samples',
+        on_delete=models.CASCADE,
+    )
+    recorded_at = models.DateTimeField()
+    duration_ms = models.FloatField()
+    database = models.CharField(max_length=100)
+    view = models.CharField(max_length=255, blank=True)
+    filters = models.CharField(max_length=500, blank=True)
+    sql = models.TextField()
+    params = models.JSONField(null=True, blank=True)
+    plan = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.view or "-"} {self.filters} {self.duration_ms:.0f}ms'
+
+    class Meta:
+        ordering = ['-recorded_at']
+        indexes = [
+            models.Index(
+                fields=['query', '-recorded_at'],
+                name='slowquerysample_query_idx',
+            ),
+        ]
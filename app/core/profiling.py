@@ -0,0 +1,156 @@
+"""
+Profilers for single requests and an on-disk ring buffer of profiles.
+
+``SamplingProfiler`` records the stack of the request thread at a fixed
+interval from a background thread, which keeps overhead low and the
+timing of the request realistic. ``DeterministicProfiler`` wraps cProfile
+for exact call counts at a higher cost. Both only see the thread handling
+the request, not worker threads queries are sent to by async views.
+"""
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+
+
+class SamplingProfiler:
+    """Sample the stack of one thread at a fixed interval."""
+
+    extension = 'collapsed'
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(
+            target=self._run, name='sampling-profiler', daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} ({code.co_filename}:'
+                    f'{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def summary(self, limit=30):
+        """Return the functions seen most often, as text."""
+        if not self.samples:
+            return 'No samples taken, the request was too fast.\n'
+        own = Counter()
+        total = Counter()
+        for stack, samples in self.stacks.items():
+            functions = stack.split(';')
+            own[functions[-1]] += samples
+            for function in set(functions):
+                total[function] += samples
+        lines = [
+            f'{self.samples} samples every {self.interval * 1000:g}ms',
+            '',
+            f'{"own%":>7} {"total%":>7}  function',
+        ]
+        for function, samples in total.most_common(limit):
+            lines.append(
+                f'{own[function] * 100 / self.samples:7.1f} '
+                f'{samples * 100 / self.samples:7.1f}  {function}'
+            )
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """Write the stacks in the collapsed format flame graphs read."""
+        with open(path, 'w', encoding='utf-8') as dump_file:
+            for stack, samples in self.stacks.most_common():
+                dump_file.write(f'{stack} {samples}\n')
+
+
+class DeterministicProfiler:
+    """Trace every call of the request thread with cProfile."""
+
+    extension = 'prof'
+
+    def __init__(self, **options):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def summary(self, limit=30):
+        """Return the functions with the most cumulative time, as text."""
+        stream = io.StringIO()
+        pstats.Stats(self.profile, stream=stream).sort_stats(
+            'cumulative',
+        ).print_stats(limit)
+        return stream.getvalue()
+
+    def dump(self, path):
+        """Write the stats in the format pstats and snakeviz read."""
+        self.profile.dump_stats(path)
+
+
+PROFILERS = {
+    'sample': SamplingProfiler,
+    'cprofile': DeterministicProfiler,
+}
+
+
+_UNSAFE = re.compile(r'[^A-Za-z0-9]+')
+
+
+class ProfileStore:
+    """Directory keeping the most recent ``size`` profiles."""
+
+    def __init__(self, directory, size=100):
+        self.directory = directory
+        self.size = size
+        self._counter = count()
+
+    def save(self, profiler, request):
+        """Write a profile of request and drop the oldest ones."""
+        os.makedirs(self.directory, exist_ok=True)
+        slug = _UNSAFE.sub('-', request.path).strip('-')[:60] or 'root'
+        name = (
+            f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-'
+            f'{next(self._counter):06d}-{request.method}-{slug}.'
+            f'{profiler.extension}'
+        )
+        path = os.path.join(self.directory, name)
+        profiler.dump(path)
+        self._trim()
+        return path
+
+    def _trim(self):
+        # Names start with the time they were written at, then the padded
+        # counter so profiles of the same second sort in order too.
+        names = sorted(os.listdir(self.directory))
+        for name in names[:max(len(names) - self.size, 0)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
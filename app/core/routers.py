@@ -0,0 +1,30 @@
+"""
+Database routing between the primary and read replicas.
+
+Reads go to the replica chosen for the current request, if any, and
+everything else goes to the primary. ``ReplicaRoutingMiddleware`` picks the
+replica for safe requests.
+"""
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS
+
+
+read_database = ContextVar('read_database', default=None)
+
+
+class ReplicaRouter:
+    """Send reads to the request's replica and writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,28 @@
+"""
+Serializers for the operations APIs.
+"""
+from rest_framework import serializers
+
+from core.memory import GROUPINGS
+
+
+class MemoryStartSerializer(serializers.Serializer):
+    """Options for starting allocation tracing."""
+    frames = serializers.IntegerField(min_value=1, max_value=100, default=1)
+
+
+class MemoryStatsSerializer(serializers.Serializer):
+    """Options for listing allocation sites."""
+    group_by = serializers.ChoiceField(choices=GROUPINGS, default='lineno')
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=25)
+
+
+class MemoryTopSerializer(MemoryStatsSerializer):
+    """Snapshot to list the largest allocation sites of."""
+    snapshot = serializers.IntegerField()
+
+
+class MemoryDiffSerializer(MemoryStatsSerializer):
+    """Snapshots to compare, the later one second."""
+    first = serializers.IntegerField()
+    second = serializers.IntegerField()
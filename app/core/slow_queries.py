@@ -0,0 +1,258 @@
+"""
+Log of SQL statements slower than a threshold, with sampled plans.
+
+``install()`` adds an execute wrapper to every database connection. While
+``SlowQueryMiddleware`` handles a request, statements taking at least
+``SLOW_QUERIES['THRESHOLD_MS']`` are collected with their parameters.
+Once the response has been sent, a sample of the SELECTs among them is run
+again under ``EXPLAIN (ANALYZE, BUFFERS)`` and they're stored with the
+view and filters of the request, aggregated per fingerprint: the
+statement with its literals, placeholders and lists of them replaced.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections
+from django.db.backends.signals import connection_created
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.models import SlowQuery, SlowQuerySample
+
+
+logger = logging.getLogger('core.slow_queries')
+
+current_log = ContextVar('current_slow_query_log', default=None)
+
+
+_STRING = re.compile(r"'(?:''|[^'])*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?(?![\w"])')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_IN = re.compile(r'\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Return the normalized statement and its hash.
+
+    Statements differing only in values, or in how many values a list
+    holds, share a fingerprint.
+    """
+    statement = _STRING.sub('?', sql)
+    statement = _PLACEHOLDER.sub('?', statement)
+    statement = _NUMBER.sub('?', statement)
+    statement = _IN.sub('IN (...)', statement)
+    statement = _LIST.sub('(...)', statement)
+    statement = _ROWS.sub('(...), ...', statement)
+    statement = _SPACE.sub(' ', statement).strip()
+    return statement, hashlib.sha1(statement.encode('utf-8')).hexdigest()
+
+
+def _year_span(value):
+    years = value.split(',')
+    try:
+        if len(years) == 1:
+            if years[0][-1:] in ('+', '-'):
+                int(years[0][:-1])
+                return 'open'
+            int(years[0])
+            return '1'
+        return str(int(years[1]) - int(years[0]) + 1)
+    except ValueError:
+        return 'invalid'
+
+
+def describe_filters(params, values=()):
+    """Return the filter combination of query parameters as a string.
+
+    Parameters named in values keep their value, ``year`` is reduced to
+    the number of years it spans and other parameters to their names, so
+    requests needing the same plan are described alike.
+    """
+    filters = []
+    for name in sorted(params):
+        if name == 'year':
+            filters.append(f'year={_year_span(params[name])}')
+        elif name in values:
+            filters.append(f'{name}={params[name][:50]}')
+        else:
+            filters.append(name)
+    return '&'.join(filters)[:500]
+
+
+class _ParamsEncoder(DjangoJSONEncoder):
+
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return repr(o)
+
+
+def _json_params(params):
+    if params is None:
+        return None
+    return json.loads(json.dumps(params, cls=_ParamsEncoder))
+
+
+class SlowQueryLog:
+    """Slow statements of one request."""
+
+    def __init__(self, threshold, explain_rate, explain_interval,
+                 explain_timeout):
+        self.threshold = threshold
+        self.explain_rate = explain_rate
+        self.explain_interval = explain_interval
+        self.explain_timeout = explain_timeout
+        self.entries = []
+        # SELECTs that may be explained, with their parameters.
+        self._explainable = []
+
+    def _should_explain(self, connection, digest):
+        if connection.vendor != 'postgresql':
+            return False
+        # A failing EXPLAIN would abort the transaction the connection is in.
+        if connection.in_atomic_block or not connection.get_autocommit():
+            return False
+        if random.random() >= self.explain_rate:
+            return False
+        # At most one plan per fingerprint and interval, in every worker
+        # sharing the cache, so in all of them with REDIS_URL set.
+        return cache.add(
+            f'slow-query-explain:{digest}', True, self.explain_interval,
+        )
+
+    def _explain(self, connection, sql, params):
+        # The raw cursor skips execute wrappers and the query log, and the
+        # transaction is rolled back so nothing ANALYZE ran is kept.
+        with connection.wrap_database_errors:
+            connection.ensure_connection()
+            with connection.connection.cursor() as cursor:
+                cursor.execute('BEGIN')
+                try:
+                    cursor.execute(
+                        'SET LOCAL statement_timeout = %s',
+                        [self.explain_timeout],
+                    )
+                    cursor.execute(
+                        f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params,
+                    )
+                    return '\n'.join(row[0] for row in cursor.fetchall())
+                finally:
+                    cursor.execute('ROLLBACK')
+
+    def add(self, sql, params, many, connection, duration):
+        statement, digest = fingerprint(sql)
+        entry = {
+            'fingerprint': digest,
+            'statement': statement,
+            'sql': sql,
+            'params': _json_params(params),
+            'database': connection.alias,
+            'duration_ms': duration * 1000,
+            'plan': '',
+        }
+        self.entries.append(entry)
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            self._explainable.append((entry, params))
+
+    def explain(self):
+        """Add plans to a sample of the SELECTs.
+
+        Runs them again, so it's called once the response has been sent
+        rather than while the client waits.
+        """
+        for entry, params in self._explainable:
+            connection = connections[entry['database']]
+            if not self._should_explain(connection, entry['fingerprint']):
+                continue
+            try:
+                entry['plan'] = self._explain(connection, entry['sql'], params)
+            except DatabaseError as exc:
+                logger.warning('Could not explain slow query: %s', exc)
+        self._explainable = []
+
+    def save(self, view, filters, max_samples):
+        """Store the slow statements, keeping max_samples per fingerprint."""
+        now = timezone.now()
+        for entry in self.entries:
+            query, _ = SlowQuery.objects.get_or_create(
+                fingerprint=entry['fingerprint'],
+                defaults={
+                    'statement': entry['statement'],
+                    'first_seen': now,
+                    'last_seen': now,
+                },
+            )
+            SlowQuery.objects.filter(pk=query.pk).update(
+                calls=F('calls') + 1,
+                total_ms=F('total_ms') + entry['duration_ms'],
+                max_ms=Greatest('max_ms', entry['duration_ms']),
+                last_seen=now,
+            )
+            SlowQuerySample.objects.create(
+                query=query,
+                recorded_at=now,
+                duration_ms=entry['duration_ms'],
+                database=entry['database'],
+                view=view[:255],
+                filters=filters,
+                sql=entry['sql'],
+                params=entry['params'],
+                plan=entry['plan'],
+            )
+            # Samples with plans are kept longer than the others.
+            stale = SlowQuerySample.objects.filter(query=query).annotate(
+                unexplained=ExpressionWrapper(
+                    Q(plan=''), output_field=BooleanField(),
+                ),
+            ).order_by('unexplained', '-recorded_at').values_list(
+                'pk', flat=True,
+            )[max_samples:]
+            SlowQuerySample.objects.filter(pk__in=list(stale)).delete()
+
+
+def log_slow(execute, sql, params, many, context):
+    """Execute wrapper adding slow statements to the request's log."""
+    log = current_log.get()
+    if log is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - start
+    if duration * 1000 >= log.threshold:
+        log.add(sql, params, many, context['connection'], duration)
+    return result
+
+
+def _add_slow_query_log(sender, connection, **kwargs):
+    # Outermost, so wrappers timing the request's SQL don't count EXPLAIN.
+    if log_slow not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, log_slow)
+
+
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install():
+    """Start logging slow statements of requests, once per process."""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+        connection_created.connect(_add_slow_query_log)
+        for connection in connections.all():
+            _add_slow_query_log(None, connection)
@@ -0,0 +1,155 @@
+"""
+Tests for async view helpers.
+"""
+from asgiref.sync import async_to_sync
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from rest_framework import viewsets
+from rest_framework.permissions import BasePermission
+from rest_framework.throttling import BaseThrottle
+
+from core.async_views import (
+    InvalidPage,
+    page_bounds,
+    paginated_data,
+    serve,
+    split_by_method,
+)
+
+
+class DenyThrottle(BaseThrottle):
+
+    def allow_request(self, request, view):
+        return False
+
+
+class DenyPermission(BasePermission):
+
+    def has_permission(self, request, view):
+        return False
+
+
+class ExampleViewSet(viewsets.ViewSet):
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = []
+
+
+async def example_handler(view):
+    if view.request.query_params.get('page') == '9':
+        raise InvalidPage()
+    return {'action': view.action}
+
+
+class AsyncViewHelperTests(SimpleTestCase):
+    """Test the helpers shared by async views."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_page_bounds(self):
+        """Test the page parameter is turned into slice bounds."""
+        request = self.factory.get('/api/album/', {'page': 3})
+
+        self.assertEqual(page_bounds(request, page_size=25), (3, 50, 75))
+
+    def test_page_bounds_invalid(self):
+        """Test invalid page numbers are rejected."""
+        for page in ['0', '-1', 'last', 'x']:
+            request = self.factory.get('/api/album/', {'page': page})
+            with self.assertRaises(InvalidPage):
+                page_bounds(request)
+
+    def test_paginated_links(self):
+        """Test next and previous links match DRF pagination."""
+        request = self.factory.get('/api/album/?year=2000&page=2')
+
+        data = paginated_data(request, 2, 60, [], page_size=25)
+
+        self.assertEqual(data['count'], 60)
+        self.assertEqual(
+            data['next'], 'http://testserver/api/album/?page=3&year=2000',
+        )
+        self.assertEqual(
+            data['previous'], 'http://testserver/api/album/?year=2000',
+        )
+
+    def test_paginated_last_page(self):
+        """Test the last page has no next link."""
+        request = self.factory.get('/api/album/?page=3')
+
+        data = paginated_data(request, 3, 60, [], page_size=25)
+
+        self.assertIsNone(data['next'])
+        self.assertEqual(
+            data['previous'], 'http://testserver/api/album/?page=2',
+        )
+
+    def test_split_by_method(self):
+        """Test reads go to the async view and writes to the sync view."""
+        async def read(request):
+            return HttpResponse('async')
+
+        def write(request):
+            return HttpResponse('sync')
+
+        view = split_by_method(read, write)
+
+        get = async_to_sync(view)(self.factory.get('/'))
+        post = async_to_sync(view)(self.factory.post('/'))
+        self.assertEqual(get.content, b'async')
+        self.assertEqual(post.content, b'sync')
+        self.assertTrue(view.csrf_exempt)
+
+
+class ServeTests(SimpleTestCase):
+    """Test serving async handlers behind DRF viewsets."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def _serve(self, request, view_class=ExampleViewSet):
+        return async_to_sync(serve)(
+            view_class, request, 'list', example_handler,
+        )
+
+    def test_handler_data_rendered(self):
+        """Test handler data is rendered by the negotiated renderer."""
+        res = self._serve(self.factory.get('/'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertEqual(res.content, b'{"action":"list"}')
+
+    def test_exceptions_handled(self):
+        """Test API exceptions go through the exception handler."""
+        res = self._serve(self.factory.get('/', {'page': 9}))
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.content, b'{"detail":"Invalid page."}')
+
+    def test_throttles_apply(self):
+        """Test the viewset's throttles run before the handler."""
+        class ThrottledViewSet(ExampleViewSet):
+            throttle_classes = [DenyThrottle]
+
+        res = self._serve(self.factory.get('/'), ThrottledViewSet)
+
+        self.assertEqual(res.status_code, 429)
+
+    def test_permissions_apply(self):
+        """Test the viewset's permissions run before the handler."""
+        class ClosedViewSet(ExampleViewSet):
+            permission_classes = [DenyPermission]
+
+        res = self._serve(self.factory.get('/'), ClosedViewSet)
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_unsafe_method_not_allowed(self):
+        """Test only reads are served."""
+        res = self._serve(self.factory.post('/'))
+
+        self.assertEqual(res.status_code, 405)
@@ -0,0 +1,169 @@
+"""
+Tests for tracing allocations of worker processes.
+"""
+import json
+import tracemalloc
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core import memory
+from core.middleware import MemoryProfilingMiddleware
+from core.views import MemoryViewSet
+
+
+STAFF = SimpleNamespace(is_authenticated=True, is_staff=True)
+USER = SimpleNamespace(is_authenticated=True, is_staff=False)
+
+_retained = []
+
+# A global, so the payload is built on each request rather than folded
+# into a constant when the module is compiled.
+RESPONSE_BYTES = 2048
+
+
+def allocate():
+    _retained.append([object() for _ in range(10000)])
+
+
+def large_view(request):
+    return HttpResponse(b'x' * RESPONSE_BYTES)
+
+
+class MemoryTests(SimpleTestCase):
+    """Test tracing allocations and comparing snapshots."""
+
+    def setUp(self):
+        self.addCleanup(memory.stop)
+        self.addCleanup(_retained.clear)
+
+    def test_snapshot_needs_tracing(self):
+        """Test snapshots can't be taken while tracing is off."""
+        memory.stop()
+
+        with self.assertRaises(memory.NotTracing):
+            memory.take_snapshot()
+
+    def test_top_and_diff(self):
+        """Test new allocations show up in the top sites and the diff."""
+        memory.start()
+        first = memory.take_snapshot()
+        allocate()
+        second = memory.take_snapshot()
+
+        top = memory.top(second, limit=5)
+        grown = memory.diff(first, second, limit=1)[0]
+
+        self.assertTrue(any('test_memory.py' in stat['location'][0]
+                            for stat in top))
+        self.assertIn('test_memory.py', grown['location'][0])
+        self.assertGreater(grown['size_diff'], 0)
+        self.assertEqual(
+            [item['id'] for item in memory.status()['snapshots']],
+            [first, second],
+        )
+
+    @override_settings(MEMORY_PROFILING={'MAX_SNAPSHOTS': 2})
+    def test_oldest_snapshots_dropped(self):
+        """Test only the newest snapshots are kept."""
+        memory.start()
+        first = memory.take_snapshot()
+        memory.take_snapshot()
+        memory.take_snapshot()
+
+        self.assertEqual(len(memory.status()['snapshots']), 2)
+        with self.assertRaises(KeyError):
+            memory.top(first)
+
+
+class MemoryViewTests(SimpleTestCase):
+    """Test the memory API."""
+
+    def setUp(self):
+        self.addCleanup(memory.stop)
+        self.factory = APIRequestFactory()
+
+    def _call(self, method, action, user, data=None):
+        view = MemoryViewSet.as_view({method: action})
+        request = getattr(self.factory, method)('/api/debug/memory/', data)
+        force_authenticate(request, user=user)
+        return view(request)
+
+    def test_staff_only(self):
+        """Test users who aren't staff can't trace allocations."""
+        res = self._call('post', 'start', USER)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_start_snapshot_top(self):
+        """Test staff can start tracing and read a snapshot."""
+        res = self._call('post', 'start', STAFF, {'frames': 2})
+        self.assertTrue(res.data['tracing'])
+        self.assertEqual(res.data['frames'], 2)
+
+        res = self._call('post', 'snapshot', STAFF)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+        res = self._call('get', 'top', STAFF,
+                         {'snapshot': res.data['id'], 'limit': 3})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(res.data['stats']), 3)
+
+    def test_snapshot_not_tracing(self):
+        """Test snapshots conflict while tracing is off."""
+        res = self._call('post', 'snapshot', STAFF)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+
+    def test_unknown_snapshot(self):
+        """Test asking for a missing snapshot is not found."""
+        res = self._call('get', 'top', STAFF, {'snapshot': 999})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class MemoryProfilingMiddlewareTests(SimpleTestCase):
+    """Test logging allocations of requests with large responses."""
+
+    def setUp(self):
+        self.addCleanup(memory.stop)
+
+    def _middleware(self, **options):
+        options = {'ENABLED': True, 'LOG_RESPONSE_BYTES': 1024, **options}
+        with override_settings(MEMORY_PROFILING=options):
+            return MemoryProfilingMiddleware(large_view)
+
+    def test_disabled_not_used(self):
+        """Test the middleware removes itself when disabled."""
+        with self.assertRaises(MiddlewareNotUsed):
+            self._middleware(ENABLED=False)
+
+    def test_large_response_logged(self):
+        """Test large responses log their peak allocation."""
+        middleware = self._middleware(START=True)
+        request = RequestFactory().get('/api/album/')
+
+        with self.assertLogs('core.memory', 'INFO') as logs:
+            middleware(request)
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['path'], '/api/album/')
+        self.assertEqual(entry['response_bytes'], RESPONSE_BYTES)
+        self.assertGreaterEqual(entry['peak_bytes'], RESPONSE_BYTES)
+
+    def test_not_tracing_not_logged(self):
+        """Test nothing is logged while tracing is off."""
+        middleware = self._middleware(LOG_RESPONSE_BYTES=1)
+        request = RequestFactory().get('/api/album/')
+
+        with mock.patch('core.middleware.memory_logger') as logger:
+            middleware(request)
+
+        logger.info.assert_not_called()
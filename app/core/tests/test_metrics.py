@@ -0,0 +1,172 @@
+"""
+Tests for process-shared metrics.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve, reverse
+
+from core import timing
+from core.metrics import MetricsRegistry
+from core.middleware import MetricsMiddleware, view_label
+
+
+class MetricsRegistryTests(SimpleTestCase):
+    """Test recording and exporting metrics."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_counter_and_gauge(self):
+        """Test counters add up and gauges hold their last value."""
+        registry = MetricsRegistry()
+        counter = registry.counter('requests_total', 'Requests.', ['view'])
+        gauge = registry.gauge('idle', 'Idle connections.')
+
+        counter.labels('Search.list').inc()
+        counter.labels('Search.list').inc(2)
+        gauge.labels().set(4)
+        gauge.labels().set(3)
+
+        text = registry.export()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{view="Search.list"} 3\n', text)
+        self.assertIn('idle 3\n', text)
+
+    def test_histogram_buckets(self):
+        """Test histogram buckets are exported cumulatively."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram(
+            'latency', 'Latency.', ['view'], buckets=(0.1, 1),
+        )
+        child = histogram.labels('AlbumViewSet.list')
+
+        for value in [0.05, 0.1, 0.5, 3]:
+            child.observe(value)
+
+        text = registry.export()
+        labels = 'view="AlbumViewSet.list"'
+        self.assertIn(f'latency_bucket{{{labels},le="0.1"}} 2\n', text)
+        self.assertIn(f'latency_bucket{{{labels},le="1"}} 3\n', text)
+        self.assertIn(f'latency_bucket{{{labels},le="+Inf"}} 4\n', text)
+        self.assertIn(f'latency_sum{{{labels}}} 3.65\n', text)
+        self.assertIn(f'latency_count{{{labels}}} 4\n', text)
+
+    def test_label_values_escaped(self):
+        """Test quotes in label values are escaped."""
+        registry = MetricsRegistry()
+        registry.counter('hits_total', 'Hits.', ['name']).labels(
+            'say "hi"',
+        ).inc()
+
+        self.assertIn(r'hits_total{name="say \"hi\""} 1', registry.export())
+
+    def test_collectors_run_on_export(self):
+        """Test collectors refresh their metrics before export."""
+        registry = MetricsRegistry()
+        gauge = registry.gauge('size', 'Size.')
+        registry.collector(lambda: gauge.labels().set(7))
+
+        self.assertIn('size 7\n', registry.export())
+
+    def test_many_series(self):
+        """Test the store grows past its initial capacity."""
+        registry = MetricsRegistry(self.directory)
+        counter = registry.counter('items_total', 'Items.', ['item'])
+
+        for item in range(5000):
+            counter.labels(item).inc()
+
+        text = registry.export()
+        self.assertIn('items_total{item="4999"} 1\n', text)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork()')
+    def test_processes_aggregated(self):
+        """Test counters sum over processes and dead gauges are dropped."""
+        registry = MetricsRegistry(self.directory)
+        counter = registry.counter('requests_total', 'Requests.')
+        gauge = registry.gauge('in_use', 'Connections in use.')
+        counter.labels().inc()
+        gauge.labels().set(1)
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                counter.labels().inc(5)
+                gauge.labels().set(10)
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        text = registry.export()
+        self.assertIn('requests_total 6\n', text)
+        self.assertIn('in_use 1\n', text)
+
+
+class MetricsViewTests(SimpleTestCase):
+    """Test labelling requests and serving metrics."""
+
+    def test_view_label(self):
+        """Test viewset requests are named after class and action."""
+        request = RequestFactory().get('/api/chart/')
+        request.resolver_match = None
+        self.assertEqual(view_label(request), 'unmatched')
+
+        request.resolver_match = resolve(reverse('album:album-list'))
+        self.assertEqual(view_label(request), 'AlbumViewSet.list')
+
+        request = RequestFactory().post('/api/album/')
+        request.resolver_match = resolve(reverse('album:album-list'))
+        self.assertEqual(view_label(request), 'AlbumViewSet.create')
+
+    def test_only_sql_timed(self):
+        """Test metrics count queries without timing serializers."""
+        with mock.patch.object(timing, 'install') as install, \
+                mock.patch.object(timing, 'install_sql') as install_sql:
+            MetricsMiddleware(lambda request: HttpResponse())
+
+        install.assert_not_called()
+        install_sql.assert_called_once_with()
+
+    @override_settings(METRICS={'TOKEN': 'secret'})
+    def test_metrics_token(self):
+        """Test scrapers sending the token can read metrics."""
+        res = self.client.get(
+            reverse('metrics'),
+            HTTP_HOST='localhost',
+            HTTP_AUTHORIZATION='Bearer secret',
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn(b'# TYPE http_request_duration_seconds histogram',
+                      res.content)
+
+    @override_settings(METRICS={'TOKEN': 'secret'})
+    def test_metrics_forbidden(self):
+        """Test local clients without the token can't read metrics."""
+        for headers in [{}, {'HTTP_AUTHORIZATION': 'Bearer wrong'}]:
+            res = self.client.get(
+                reverse('metrics'),
+                HTTP_HOST='localhost',
+                REMOTE_ADDR='127.0.0.1',
+                **headers,
+            )
+
+            self.assertEqual(res.status_code, 403)
+
+    @override_settings(METRICS={'TOKEN': None})
+    def test_metrics_without_token_forbidden(self):
+        """Test no bearer token is accepted when none is configured."""
+        res = self.client.get(
+            reverse('metrics'),
+            HTTP_HOST='localhost',
+            HTTP_AUTHORIZATION='Bearer None',
+        )
+
+        self.assertEqual(res.status_code, 403)
@@ -77,4 +77,125 @@ class ModelTests(TestCase):
         models.Artist.objects.create(name=name)
 
         with self.assertRaises(IntegrityError):
-            models.Artist.objects.create(name=name)
\ No newline at end of file
+            models.Artist.objects.create(name=name)
+
+class AlbumListCountTests(TestCase):
+    """Test the list counters maintained on albums."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'test123',
+        )
+        self.album = models.Album.objects.create(
+            title='Sample Album Name',
+            release_date=date.fromisoformat('2000-01-01'),
+            avg_rating=Decimal('1.00'),
+            rating_count=1_000,
+        )
+
+    def _counts(self):
+        self.album.refresh_from_db()
+        return self.album.list_count, self.album.public_list_count
+
+    def _list(self, public=False):
+        return models.List.objects.create(
+            user=self.user, label='Sample', public=public,
+        )
+
+    def test_counts_distinct_lists(self):
+        """Test each list counts once however often the album is on it."""
+        private, public = self._list(), self._list(public=True)
+        models.Entry.objects.bulk_create([
+            models.Entry(album=self.album, owner_list=private),
+            models.Entry(album=self.album, owner_list=private),
+            models.Entry(album=self.album, owner_list=public),
+        ])
+        models.Entry.objects.create(album=self.album, owner_list=public)
+
+        self.assertEqual(self._counts(), (2, 1))
+
+    def test_removing_last_entry_of_list(self):
+        """Test a list only stops counting once its last entry goes."""
+        list_obj = self._list(public=True)
+        first, second = [
+            models.Entry.objects.create(album=self.album, owner_list=list_obj)
+            for _ in range(2)
+        ]
+
+        first.delete()
+        self.assertEqual(self._counts(), (1, 1))
+
+        second.delete()
+        self.assertEqual(self._counts(), (0, 0))
+
+    def test_visibility_change(self):
+        """Test publishing and unpublishing a list updates public counts."""
+        list_obj = self._list()
+        models.Entry.objects.create(album=self.album, owner_list=list_obj)
+
+        list_obj.public = True
+        list_obj.save()
+        self.assertEqual(self._counts(), (1, 1))
+
+        list_obj.public = False
+        list_obj.save()
+        self.assertEqual(self._counts(), (1, 0))
+
+    def test_moving_entries(self):
+        """Test entries moved to another album or list update the counts."""
+        other = models.Album.objects.create(
+            title='Other Album Name',
+            release_date=date.fromisoformat('2000-01-01'),
+            avg_rating=Decimal('1.00'),
+            rating_count=1_000,
+        )
+        private, public = self._list(), self._list(public=True)
+        first, second = [
+            models.Entry.objects.create(album=self.album, owner_list=private)
+            for _ in range(2)
+        ]
+
+        models.Entry.objects.filter(id=first.id).update(owner_list=public)
+        self.assertEqual(self._counts(), (2, 1))
+
+        models.Entry.objects.filter(
+            id__in=[first.id, second.id],
+        ).update(album=other)
+        self.assertEqual(self._counts(), (0, 0))
+        other.refresh_from_db()
+        self.assertEqual((other.list_count, other.public_list_count), (2, 1))
+
+        models.Entry.objects.filter(id=first.id).update(position=5)
+        self.assertEqual(self._counts(), (0, 0))
+
+    def test_deleting_list(self):
+        """Test deleting a list removes it from the counts."""
+        list_obj = self._list(public=True)
+        models.Entry.objects.create(album=self.album, owner_list=list_obj)
+
+        list_obj.delete()
+
+        self.assertEqual(self._counts(), (0, 0))
+
+    def test_album_save_keeps_counts(self):
+        """Test saving a stale album doesn't overwrite its counts."""
+        stale = models.Album.objects.get(id=self.album.id)
+        models.Entry.objects.create(album=self.album, owner_list=self._list())
+
+        stale.title = 'New title'
+        stale.save()
+
+        self.assertEqual(self._counts(), (1, 0))
+        self.assertEqual(self.album.title, 'New title')
+
+    def test_reconcile_list_counts(self):
+        """Test reconciling fixes drifted counts only."""
+        models.Entry.objects.create(album=self.album, owner_list=self._list())
+        models.Album.objects.filter(id=self.album.id).update(
+            list_count=5, public_list_count=3,
+        )
+
+        self.assertEqual(models.Album.reconcile_list_counts(), 1)
+        self.assertEqual(self._counts(), (1, 0))
+        self.assertEqual(models.Album.reconcile_list_counts(), 0)
@@ -0,0 +1,178 @@
+"""
+Tests for pooled database connections.
+"""
+from types import SimpleNamespace
+from unittest import mock
+
+import psycopg2
+from psycopg2 import extensions
+
+from django.test import SimpleTestCase
+
+from core.backends.postgresql.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    """Stand-in for a psycopg2 connection."""
+
+    def __init__(self):
+        self.closed = 0
+        self.info = SimpleNamespace(
+            transaction_status=extensions.TRANSACTION_STATUS_IDLE,
+        )
+        self.broken = False
+        self.pings = 0
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql):
+        self.pings += 1
+        if self.broken:
+            raise psycopg2.OperationalError('server closed the connection')
+
+    def rollback(self):
+        self.info.transaction_status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test checking connections out of and back into a pool."""
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+    def _pool(self, **options):
+        options = {'min_size': 0, 'timeout': 0, 'check_idle': 60,
+                   **options}
+        return ConnectionPool('default', **options)
+
+    def test_connection_reused(self):
+        """Test a handed back connection is checked out again."""
+        pool = self._pool()
+
+        conn = pool.getconn(self.connect)
+        pool.putconn(conn)
+
+        self.assertIs(pool.getconn(self.connect), conn)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_max_size_times_out(self):
+        """Test checkout fails once every connection is in use."""
+        pool = self._pool(max_size=2)
+        pool.getconn(self.connect)
+        pool.getconn(self.connect)
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(self.connect)
+
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_old_connection_replaced(self):
+        """Test connections past their maximum age aren't reused."""
+        pool = self._pool(max_age=30)
+        with mock.patch('time.monotonic', return_value=100):
+            conn = pool.getconn(self.connect)
+            pool.putconn(conn)
+        with mock.patch('time.monotonic', return_value=131):
+            new = pool.getconn(self.connect)
+
+        self.assertIsNot(new, conn)
+        self.assertTrue(conn.closed)
+
+    def test_broken_connection_replaced(self):
+        """Test connections failing the health check are replaced."""
+        pool = self._pool(check_idle=0)
+        conn = pool.getconn(self.connect)
+        pool.putconn(conn)
+        conn.broken = True
+
+        new = pool.getconn(self.connect)
+
+        self.assertIsNot(new, conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['discards'], 1)
+
+    def test_recently_used_connection_not_pinged(self):
+        """Test connections handed back moments ago skip the ping."""
+        pool = self._pool(check_idle=60)
+        conn = pool.getconn(self.connect)
+        pool.putconn(conn)
+
+        pool.getconn(self.connect)
+
+        self.assertEqual(conn.pings, 0)
+
+    def test_open_transaction_rolled_back(self):
+        """Test connections are handed back outside of a transaction."""
+        pool = self._pool()
+        conn = pool.getconn(self.connect)
+        conn.info.transaction_status = extensions.TRANSACTION_STATUS_INERROR
+
+        pool.putconn(conn)
+
+        self.assertEqual(conn.info.transaction_status,
+                         extensions.TRANSACTION_STATUS_IDLE)
+        self.assertIs(pool.getconn(self.connect), conn)
+
+    def test_idle_connections_above_minimum_closed(self):
+        """Test long idle connections above the minimum are closed."""
+        pool = self._pool(min_size=1, max_idle=30)
+        with mock.patch('time.monotonic', return_value=100):
+            first = pool.getconn(self.connect)
+            second = pool.getconn(self.connect)
+            pool.putconn(first)
+        with mock.patch('time.monotonic', return_value=200):
+            pool.putconn(second)
+
+        self.assertTrue(first.closed)
+        self.assertFalse(second.closed)
+        self.assertEqual(len(pool), 1)
+
+    def test_warm_opens_minimum(self):
+        """Test warming opens the minimum number of connections."""
+        pool = self._pool(min_size=3)
+
+        pool.warm(self.connect)
+
+        stats = pool.stats()
+        self.assertEqual(len(self.opened), 3)
+        self.assertEqual(stats['idle'], 3)
+        self.assertEqual(stats['in_use'], 0)
+
+    def test_failed_connect_frees_slot(self):
+        """Test a failed connect doesn't use up the pool."""
+        pool = self._pool(max_size=1)
+
+        def fail():
+            raise psycopg2.OperationalError('could not connect')
+
+        with self.assertRaises(psycopg2.OperationalError):
+            pool.getconn(fail)
+
+        self.assertIsNotNone(pool.getconn(self.connect))
+
+    def test_connections_forgotten_after_fork(self):
+        """Test a forked process doesn't reuse its parent's connections."""
+        pool = self._pool()
+        conn = pool.getconn(self.connect)
+        pool.putconn(conn)
+
+        with mock.patch('os.getpid', return_value=-1):
+            new = pool.getconn(self.connect)
+
+        self.assertIsNot(new, conn)
+        self.assertFalse(conn.closed)
@@ -0,0 +1,174 @@
+"""
+Tests for profiling requests.
+"""
+import os
+import pstats
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import ProfilingMiddleware
+from core.profiling import (
+    DeterministicProfiler,
+    ProfileStore,
+    SamplingProfiler,
+)
+
+
+def busy_view(request):
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    return HttpResponse('done', status=201)
+
+
+STAFF = SimpleNamespace(is_authenticated=True, is_staff=True)
+
+
+class ProfilerTests(SimpleTestCase):
+    """Test profiling code and keeping profiles."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_sampling_profiler(self):
+        """Test the sampler sees the function running."""
+        profiler = SamplingProfiler(interval=0.001)
+
+        profiler.start()
+        busy_view(None)
+        profiler.stop()
+
+        self.assertGreater(profiler.samples, 0)
+        self.assertIn('busy_view', profiler.summary())
+        path = os.path.join(self.directory, 'stacks.collapsed')
+        profiler.dump(path)
+        with open(path, encoding='utf-8') as dump_file:
+            stack, samples = dump_file.readline().rsplit(' ', 1)
+        self.assertIn('busy_view', stack)
+        self.assertGreater(int(samples), 0)
+
+    def test_deterministic_profiler(self):
+        """Test cProfile stats can be summarized and reloaded."""
+        profiler = DeterministicProfiler()
+
+        profiler.start()
+        busy_view(None)
+        profiler.stop()
+
+        self.assertIn('busy_view', profiler.summary())
+        path = os.path.join(self.directory, 'stats.prof')
+        profiler.dump(path)
+        self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_ring_buffer(self):
+        """Test only the most recent profiles are kept."""
+        store = ProfileStore(self.directory, size=3)
+        request = RequestFactory().get('/api/chart/')
+        paths = []
+
+        for _ in range(5):
+            profiler = SamplingProfiler()
+            paths.append(store.save(profiler, request))
+
+        kept = sorted(os.listdir(self.directory))
+        self.assertEqual(len(kept), 3)
+        self.assertIn(os.path.basename(paths[-1]), kept)
+
+    @patch('core.profiling.time.strftime', return_value='20240101T000000')
+    def test_ring_buffer_same_second(self, patched_strftime):
+        """Test the newest profiles are kept when written in one second."""
+        store = ProfileStore(self.directory, size=3)
+        request = RequestFactory().get('/api/chart/')
+        paths = []
+
+        for _ in range(12):
+            profiler = SamplingProfiler()
+            paths.append(store.save(profiler, request))
+
+        kept = sorted(os.listdir(self.directory))
+        self.assertEqual(kept, [os.path.basename(p) for p in paths[-3:]])
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+    """Test choosing which requests are profiled."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.factory = RequestFactory()
+
+    def _middleware(self, view=busy_view, **options):
+        options = {'ENABLED': True, 'DIRECTORY': self.directory,
+                   'INTERVAL': 0.001, **options}
+        with override_settings(PROFILING=options):
+            return ProfilingMiddleware(view)
+
+    def test_disabled_not_used(self):
+        """Test the middleware removes itself when disabled."""
+        with self.assertRaises(MiddlewareNotUsed):
+            self._middleware(ENABLED=False)
+
+    def test_staff_gets_summary(self):
+        """Test staff asking for a profile get its summary."""
+        request = self.factory.get('/api/chart/', {'profile': 'cprofile'})
+        request.user = STAFF
+
+        response = self._middleware()(request)
+
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; charset=utf-8')
+        self.assertEqual(response['X-Profile-Status'], '201')
+        self.assertIn(b'busy_view', response.content)
+        self.assertEqual(os.listdir(self.directory),
+                         [response['X-Profile-File']])
+
+    def test_async_chain_profiled(self):
+        """Test sync views behind an async chain show up in profiles."""
+        request = self.factory.get('/api/chart/', {'profile': 'cprofile'})
+        request.user = STAFF
+        middleware = self._middleware(sync_to_async(busy_view))
+
+        response = async_to_sync(middleware)(request)
+
+        self.assertEqual(response['X-Profile-Status'], '201')
+        self.assertIn(b'busy_view', response.content)
+
+    def test_header_uses_default_profiler(self):
+        """Test the header turns on the default profiler."""
+        request = self.factory.get('/api/chart/', HTTP_X_PROFILE='1')
+        request.user = STAFF
+
+        response = self._middleware()(request)
+
+        self.assertTrue(response['X-Profile-File'].endswith('.collapsed'))
+
+    def test_anonymous_not_profiled(self):
+        """Test other users can't profile requests."""
+        request = self.factory.get('/api/chart/', {'profile': 'sample'})
+        request.user = AnonymousUser()
+
+        response = self._middleware()(request)
+
+        self.assertEqual(response.content, b'done')
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_random_sample_saved(self):
+        """Test sampled requests are profiled to disk unchanged."""
+        request = self.factory.get('/api/chart/')
+        request.user = AnonymousUser()
+
+        response = self._middleware(SAMPLE_RATE=1)(request)
+
+        self.assertEqual(response.content, b'done')
+        self.assertEqual(len(os.listdir(self.directory)), 1)
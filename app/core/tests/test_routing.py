@@ -0,0 +1,106 @@
+"""
+Tests for read replica routing.
+"""
+from asgiref.sync import async_to_sync
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Album
+from core.routers import ReplicaRouter, read_database
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_0', 'replica_1'],
+    DATABASE_PRIMARY_PIN_SECONDS=5,
+)
+class ReplicaRoutingTests(SimpleTestCase):
+    """Test choosing the database requests read from."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+        self.middleware = ReplicaRoutingMiddleware(self._view)
+
+    def _view(self, request):
+        self.read_alias = self.router.db_for_read(Album)
+        self.write_alias = self.router.db_for_write(Album)
+        return HttpResponse()
+
+    def _request(self, method, cookies=None, **headers):
+        request = getattr(self.factory, method)('/', **headers)
+        request.COOKIES.update(cookies or {})
+        self.response = self.middleware(request)
+        return self.read_alias, self.write_alias
+
+    def test_safe_requests_read_from_replica(self):
+        """Test safe requests read from a replica and write to primary."""
+        read, write = self._request('get')
+
+        self.assertIn(read, ['replica_0', 'replica_1'])
+        self.assertEqual(write, 'default')
+
+    def test_writes_use_primary(self):
+        """Test unsafe requests read from the primary."""
+        read, _write = self._request('post')
+
+        self.assertIsNone(read)
+
+    def test_client_pinned_after_write(self):
+        """Test a client reads from the primary right after writing."""
+        self._request('post', HTTP_AUTHORIZATION='Token one')
+
+        read, _write = self._request('get', HTTP_AUTHORIZATION='Token one')
+        self.assertIsNone(read)
+
+        read, _write = self._request('get', HTTP_AUTHORIZATION='Token two')
+        self.assertIsNotNone(read)
+
+    def test_client_pinned_by_cookie(self):
+        """Test the pin cookie keeps a client on the primary anywhere."""
+        self._request('post')
+        cookie = self.response.cookies['db_pin']
+        cache.clear()
+
+        read, _write = self._request('get', cookies={'db_pin': cookie.value})
+        self.assertIsNone(read)
+        self.assertEqual(cookie['max-age'], 5)
+
+        read, _write = self._request('get', cookies={'db_pin': 'forged'})
+        self.assertIsNotNone(read)
+
+    def test_async_requests_routed(self):
+        """Test requests through an async chain are routed and pinned."""
+        async def view(request):
+            return self._view(request)
+
+        middleware = async_to_sync(ReplicaRoutingMiddleware(view))
+
+        middleware(self.factory.post('/', HTTP_AUTHORIZATION='Token one'))
+        middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token one'))
+        self.assertIsNone(self.read_alias)
+
+        middleware(self.factory.get('/', HTTP_AUTHORIZATION='Token two'))
+        self.assertIsNotNone(self.read_alias)
+
+    def test_routing_reset_after_request(self):
+        """Test code outside requests reads from the primary."""
+        self._request('get')
+
+        self.assertIsNone(read_database.get())
+        self.assertIsNone(self.router.db_for_read(Album))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test every request uses the primary without replicas."""
+        read, _write = self._request('get')
+
+        self.assertIsNone(read)
+
+    def test_migrations_only_on_primary(self):
+        """Test replicas are never migrated."""
+        self.assertTrue(self.router.allow_migrate('default', 'core'))
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
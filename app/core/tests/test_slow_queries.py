@@ -0,0 +1,276 @@
+"""
+Tests for logging slow queries.
+"""
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import resolve, reverse
+
+from core import slow_queries
+from core.middleware import SlowQueryMiddleware
+from core.models import SlowQuery, SlowQuerySample
+
+
+def fake_connection(**attributes):
+    attributes = {
+        'alias': 'default',
+        'vendor': 'postgresql',
+        'in_atomic_block': False,
+        'get_autocommit': lambda: True,
+        **attributes,
+    }
+    return SimpleNamespace(**attributes)
+
+
+def slow_execute(sql, params, many, context):
+    return 'rows'
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test normalizing statements and describing filters."""
+
+    def test_values_replaced(self):
+        """Test statements differing in values share a fingerprint."""
+        first = slow_queries.fingerprint(
+            "SELECT * FROM core_album WHERE title = 'It''s' AND id IN "
+            "(%s, %s, %s) LIMIT 10"
+        )
+        second = slow_queries.fingerprint(
+            "SELECT  *\nFROM core_album WHERE title = 'x' AND id IN (%s) "
+            "LIMIT 25"
+        )
+
+        self.assertEqual(
+            first[0],
+            'SELECT * FROM core_album WHERE title = ? AND id IN (...) '
+            'LIMIT ?',
+        )
+        self.assertEqual(first, second)
+
+    def test_identifiers_kept(self):
+        """Test numbers in identifiers aren't replaced."""
+        statement, _ = slow_queries.fingerprint(
+            'SELECT "T3"."id" FROM core_album T3 WHERE "T3"."col1" > -2.5'
+        )
+
+        self.assertEqual(
+            statement, 'SELECT "T3"."id" FROM core_album T3 WHERE '
+            '"T3"."col1" > ?',
+        )
+
+    def test_rows_collapsed(self):
+        """Test inserts of any number of rows share a fingerprint."""
+        statement, _ = slow_queries.fingerprint(
+            'INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)'
+        )
+
+        self.assertEqual(statement,
+                         'INSERT INTO t (a, b) VALUES (...), ...')
+
+    def test_describe_filters(self):
+        """Test filters keep sortby values and year spans only."""
+        describe = slow_queries.describe_filters
+
+        self.assertEqual(
+            describe({'sortby': '-rating', 'ingenres': '1,2',
+                      'year': '1990,1999'}, ['sortby']),
+            'ingenres&sortby=-rating&year=10',
+        )
+        self.assertEqual(describe({'year': '1990+'}), 'year=open')
+        self.assertEqual(describe({'year': '1990'}), 'year=1')
+        self.assertEqual(describe({'year': 'soon'}), 'year=invalid')
+        self.assertEqual(describe({}), '')
+
+
+class SlowQueryLogTests(SimpleTestCase):
+    """Test collecting slow statements of a request."""
+
+    def _log(self, threshold=0, explain_rate=0):
+        log = slow_queries.SlowQueryLog(threshold, explain_rate, 300, 5000)
+        token = slow_queries.current_log.set(log)
+        self.addCleanup(slow_queries.current_log.reset, token)
+        return log
+
+    def _execute(self, sql, params=None, connection=None):
+        context = {'connection': connection or fake_connection()}
+        return slow_queries.log_slow(slow_execute, sql, params, False,
+                                     context)
+
+    def test_slow_statement_collected(self):
+        """Test statements over the threshold are collected."""
+        log = self._log()
+
+        result = self._execute('SELECT 1 WHERE %s', [True])
+
+        self.assertEqual(result, 'rows')
+        entry, = log.entries
+        self.assertEqual(entry['statement'], 'SELECT ? WHERE ?')
+        self.assertEqual(entry['params'], [True])
+        self.assertEqual(entry['plan'], '')
+
+    def test_fast_statement_ignored(self):
+        """Test statements under the threshold aren't collected."""
+        log = self._log(threshold=10000)
+
+        self._execute('SELECT 1')
+
+        self.assertEqual(log.entries, [])
+
+    def test_outside_request_ignored(self):
+        """Test nothing is collected outside requests."""
+        self.assertIsNone(slow_queries.current_log.get())
+
+        self.assertEqual(self._execute('SELECT 1'), 'rows')
+
+    @mock.patch('core.slow_queries.cache')
+    def test_sampled_select_explained(self, cache):
+        """Test sampled SELECTs are explained once per interval."""
+        cache.add.return_value = True
+        log = self._log(explain_rate=1)
+        atomic = fake_connection(alias='atomic', in_atomic_block=True)
+        self._execute('SELECT * FROM core_album')
+        self._execute('UPDATE core_album SET title = %s', ['x'])
+        self._execute('SELECT 1', connection=atomic)
+
+        with mock.patch.object(log, '_explain', return_value='Seq Scan'), \
+                mock.patch('core.slow_queries.connections', {
+                    'default': fake_connection(), 'atomic': atomic,
+                }):
+            self.assertEqual([entry['plan'] for entry in log.entries],
+                             ['', '', ''])
+            log.explain()
+
+        self.assertEqual([entry['plan'] for entry in log.entries],
+                         ['Seq Scan', '', ''])
+        cache.add.assert_called_once()
+
+    @mock.patch('core.slow_queries.cache')
+    def test_explain_limited_per_interval(self, cache):
+        """Test fingerprints explained recently aren't explained again."""
+        cache.add.return_value = False
+        log = self._log(explain_rate=1)
+        self._execute('SELECT * FROM core_album')
+
+        with mock.patch.object(log, '_explain') as explain, \
+                mock.patch('core.slow_queries.connections',
+                           {'default': fake_connection()}):
+            log.explain()
+
+        explain.assert_not_called()
+
+    def test_explained_after_response(self):
+        """Test plans are run and stored once the response is closed."""
+        def view(request):
+            self._execute('SELECT 1')
+            return HttpResponse()
+
+        options = {'ENABLED': True, 'THRESHOLD_MS': 0}
+        with override_settings(SLOW_QUERIES=options):
+            middleware = SlowQueryMiddleware(view)
+
+        log_class = slow_queries.SlowQueryLog
+
+        with mock.patch.object(log_class, 'explain') as explain, \
+                mock.patch.object(log_class, 'save') as save:
+            response = middleware(RequestFactory().get('/'))
+            explain.assert_not_called()
+            save.assert_not_called()
+
+            response.close()
+
+        explain.assert_called_once_with()
+        save.assert_called_once_with('unmatched', '', 50)
+
+    def test_disabled_not_used(self):
+        """Test the middleware removes itself when disabled."""
+        with override_settings(SLOW_QUERIES={'ENABLED': False}):
+            with self.assertRaises(MiddlewareNotUsed):
+                SlowQueryMiddleware(lambda request: HttpResponse())
+
+
+class SlowQueryStorageTests(TestCase):
+    """Test storing slow statements and showing them in the admin."""
+
+    def _record(self, log, sql, duration, plan=''):
+        log.entries.append({
+            **dict(zip(('statement', 'fingerprint'),
+                       slow_queries.fingerprint(sql))),
+            'sql': sql,
+            'params': [1],
+            'database': 'default',
+            'duration_ms': duration,
+            'plan': plan,
+        })
+
+    def test_aggregated_per_fingerprint(self):
+        """Test executions add up on their fingerprint."""
+        log = slow_queries.SlowQueryLog(0, 0, 300, 5000)
+        self._record(log, 'SELECT * FROM core_album LIMIT 10', 300)
+        self._record(log, 'SELECT * FROM core_album LIMIT 20', 500, 'Sort')
+
+        log.save('AlbumViewSet.list', 'sortby=-rating', max_samples=1)
+
+        query = SlowQuery.objects.get()
+        self.assertEqual(query.calls, 2)
+        self.assertEqual(query.total_ms, 800)
+        self.assertEqual(query.max_ms, 500)
+        sample = SlowQuerySample.objects.get()
+        self.assertEqual(sample.plan, 'Sort')
+        self.assertEqual(sample.filters, 'sortby=-rating')
+
+    def test_request_logged(self):
+        """Test slow statements of a request are stored with its view."""
+        def view(request):
+            request.resolver_match = resolve(reverse('album:album-list'))
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return HttpResponse()
+
+        options = {'ENABLED': True, 'THRESHOLD_MS': 0,
+                   'EXPLAIN_SAMPLE_RATE': 0, 'FILTER_VALUES': ['sortby']}
+        with override_settings(SLOW_QUERIES=options):
+            middleware = SlowQueryMiddleware(view)
+        request = RequestFactory().get(
+            '/api/album/', {'sortby': 'year', 'year': '2000,2009'},
+        )
+
+        response = middleware(request)
+        # As the test client does, so the test's transaction stays open.
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        response.close()
+
+        sample = SlowQuerySample.objects.get(query__statement='SELECT ?')
+        self.assertEqual(sample.view, 'AlbumViewSet.list')
+        self.assertEqual(sample.filters, 'sortby=year&year=10')
+
+    def test_admin_pages(self):
+        """Test slow queries can be browsed in the admin."""
+        admin_user = get_user_model().objects.create_superuser(
+            email='admin@example.com',
+            password='testpass123',
+        )
+        self.client.force_login(admin_user)
+        log = slow_queries.SlowQueryLog(0, 0, 300, 5000)
+        self._record(log, 'SELECT * FROM core_artist', 250)
+        log.save('ArtistViewSet.list', 'year=30', max_samples=10)
+        query = SlowQuery.objects.get()
+
+        res = self.client.get(reverse('admin:core_slowquery_changelist'))
+        self.assertContains(res, 'SELECT * FROM core_artist')
+
+        res = self.client.get(
+            reverse('admin:core_slowquery_change', args=[query.id]),
+        )
+        self.assertContains(res, 'ArtistViewSet.list year=30: 1 samples')
@@ -0,0 +1,108 @@
+"""
+Tests for per-request timing.
+"""
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core import timing
+from core.middleware import ServerTimingMiddleware
+
+
+class ItemSerializer(serializers.Serializer):
+    name = serializers.CharField()
+
+
+class ItemView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        items = [{'name': 'one'}, {'name': 'two'}]
+        return Response(ItemSerializer(items, many=True).data)
+
+
+def render_view(request):
+    response = ItemView.as_view()(request)
+    return response.render()
+
+
+class ServerTimingMiddlewareTests(SimpleTestCase):
+    """Test reporting the time requests spend in each phase."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    @override_settings(SERVER_TIMING={'ENABLED': False})
+    def test_disabled_not_used(self):
+        """Test the middleware removes itself when disabled."""
+        with self.assertRaises(MiddlewareNotUsed):
+            ServerTimingMiddleware(render_view)
+
+    @override_settings(SERVER_TIMING={'ENABLED': True, 'LOG': True})
+    def test_header_and_log(self):
+        """Test timings are sent in a header and logged."""
+        middleware = ServerTimingMiddleware(render_view)
+
+        with self.assertLogs('core.timing', level='INFO') as logs:
+            response = middleware(self.factory.get('/items/'))
+
+        header = response['Server-Timing']
+        for metric in ['db;dur=', 'serialize;dur=', 'render;dur=',
+                       'total;dur=']:
+            self.assertIn(metric, header)
+        self.assertIn('"path": "/items/"', logs.output[0])
+        self.assertIn('"serialize_ms"', logs.output[0])
+
+    @override_settings(SERVER_TIMING={'ENABLED': True, 'LOG': False})
+    def test_async_chain(self):
+        """Test requests through an async chain are timed."""
+        middleware = ServerTimingMiddleware(sync_to_async(render_view))
+
+        response = async_to_sync(middleware)(self.factory.get('/items/'))
+
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+
+    @override_settings(SERVER_TIMING={'ENABLED': True, 'LOG': False})
+    def test_phases_timed(self):
+        """Test serializer and renderer time is added to the request."""
+        seen = []
+
+        def get_response(request):
+            response = render_view(request)
+            seen.append(timing.current_timing.get())
+            return response
+
+        ServerTimingMiddleware(get_response)(self.factory.get('/items/'))
+
+        self.assertGreater(seen[0].serialize, 0)
+        self.assertGreater(seen[0].render, 0)
+        self.assertIsNone(timing.current_timing.get())
+
+    def test_sql_timed(self):
+        """Test queries are counted by the execute wrapper."""
+        request_timing = timing.RequestTiming()
+        token = timing.current_timing.set(request_timing)
+        try:
+            for _ in range(3):
+                timing.time_sql(
+                    lambda *args: 'rows', 'SELECT 1', None, False, {},
+                )
+        finally:
+            timing.current_timing.reset(token)
+
+        self.assertEqual(request_timing.queries, 3)
+        self.assertGreaterEqual(request_timing.sql, 0)
+
+    def test_sql_untimed_outside_requests(self):
+        """Test queries outside timed requests pass straight through."""
+        result = timing.time_sql(
+            lambda *args: 'rows', 'SELECT 1', None, False, {},
+        )
+
+        self.assertEqual(result, 'rows')
@@ -0,0 +1,125 @@
+"""
+Per-request timing of SQL, serialization and rendering.
+
+``install_sql()`` adds an execute wrapper to every database connection
+and ``install()`` also wraps ``BaseSerializer.data`` and
+``Response.rendered_content``, so their time is added to the timing of
+the current request, if one is being timed. ``MetricsMiddleware`` only
+installs the execute wrapper, to count queries; serializers and renderers
+are left alone unless ``ServerTimingMiddleware`` installs everything.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+
+
+current_timing = ContextVar('current_timing', default=None)
+
+
+class RequestTiming:
+    """Time spent by one request in each of its phases, in seconds."""
+
+    __slots__ = ('queries', 'sql', 'serialize', 'render', 'running')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        # Phase being timed, so nested calls aren't counted twice.
+        self.running = None
+
+    def header(self, total):
+        """Return the value of a ``Server-Timing`` header."""
+        return ', '.join([
+            f'db;dur={self.sql * 1000:.2f};desc="{self.queries} queries"',
+            f'serialize;dur={self.serialize * 1000:.2f}',
+            f'render;dur={self.render * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+    def as_dict(self, total):
+        """Return the timings in milliseconds."""
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql * 1000, 2),
+            'serialize_ms': round(self.serialize * 1000, 2),
+            'render_ms': round(self.render * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }
+
+
+def time_sql(execute, sql, params, many, context):
+    """Execute wrapper counting queries and their time."""
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.sql += time.perf_counter() - start
+        timing.queries += 1
+
+
+def _timed_property(prop, phase):
+    getter = prop.fget
+
+    def timed(self):
+        timing = current_timing.get()
+        if timing is None or timing.running is not None:
+            return getter(self)
+        timing.running = phase
+        start = time.perf_counter()
+        try:
+            return getter(self)
+        finally:
+            setattr(timing, phase, getattr(timing, phase)
+                    + time.perf_counter() - start)
+            timing.running = None
+
+    return property(timed, prop.fset, prop.fdel, prop.__doc__)
+
+
+def _add_sql_timer(sender, connection, **kwargs):
+    if time_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_sql)
+
+
+_sql_installed = False
+_installed = False
+_install_lock = threading.Lock()
+
+
+def install_sql():
+    """Start counting and timing SQL, once per process."""
+    global _sql_installed
+    with _install_lock:
+        if _sql_installed:
+            return
+        _sql_installed = True
+        connection_created.connect(_add_sql_timer)
+        for connection in connections.all():
+            _add_sql_timer(None, connection)
+
+
+def install():
+    """Start timing SQL, serializers and renderers, once per process."""
+    global _installed
+    install_sql()
+    with _install_lock:
+        if _installed:
+            return
+        _installed = True
+        BaseSerializer.data = _timed_property(
+            BaseSerializer.data, 'serialize',
+        )
+        Response.rendered_content = _timed_property(
+            Response.rendered_content, 'render',
+        )
@@ -0,0 +1,20 @@
+"""
+URLs for operating the service.
+"""
+from django.urls import (
+    path,
+    include
+)
+
+from rest_framework.routers import DefaultRouter
+
+from core import views
+
+router = DefaultRouter()
+router.register('memory', views.MemoryViewSet, basename='memory')
+
+app_name = 'core'
+
+urlpatterns = [
+    path('', include(router.urls))
+]
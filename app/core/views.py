@@ -0,0 +1,128 @@
+"""
+Views for operating the service.
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_GET
+
+from rest_framework import status, viewsets
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from drf_spectacular.utils import extend_schema, OpenApiTypes
+
+from core import memory, serializers
+from core.metrics import registry
+from user.authentication import CachedTokenAuthentication
+
+
+def _has_metrics_token(request):
+    token = getattr(settings, 'METRICS', {}).get('TOKEN')
+    if not token:
+        return False
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return hmac.compare_digest(
+        header.encode('utf-8'), f'Bearer {token}'.encode('utf-8'),
+    )
+
+
+@require_GET
+def metrics(request):
+    """Export metrics in the Prometheus text format.
+
+    Readable by staff users and by scrapers sending the
+    ``METRICS['TOKEN']`` bearer token. Client addresses aren't trusted, as
+    behind a proxy every request comes from the proxy's.
+    """
+    if not (_has_metrics_token(request) or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.export(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@extend_schema(responses=OpenApiTypes.OBJECT)
+class MemoryViewSet(viewsets.ViewSet):
+    """Trace allocations of the worker serving the request.
+
+    Snapshots stay in the worker that took them, so calls meant for one
+    worker have to reach it; every response includes its pid.
+    """
+    authentication_classes = [CachedTokenAuthentication,
+                              SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def _validated(self, serializer_class, data):
+        serializer = serializer_class(data=data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def list(self, request):
+        """Return whether tracing runs, memory use and snapshots."""
+        return Response(memory.status())
+
+    @extend_schema(request=serializers.MemoryStartSerializer)
+    @action(methods=['POST'], detail=False)
+    def start(self, request):
+        """Start tracing allocations."""
+        options = self._validated(
+            serializers.MemoryStartSerializer, request.data,
+        )
+        memory.start(options['frames'])
+        return Response(memory.status())
+
+    @action(methods=['POST'], detail=False)
+    def stop(self, request):
+        """Stop tracing and drop the snapshots."""
+        memory.stop()
+        return Response(memory.status())
+
+    @action(methods=['POST'], detail=False)
+    def snapshot(self, request):
+        """Snapshot the traced allocations."""
+        try:
+            snapshot_id = memory.take_snapshot()
+        except memory.NotTracing:
+            return Response(
+                {'detail': 'Tracing is not running in this worker.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(
+            {'id': snapshot_id, **memory.status()},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(parameters=[serializers.MemoryTopSerializer])
+    @action(methods=['GET'], detail=False)
+    def top(self, request):
+        """List the largest allocation sites of a snapshot."""
+        options = self._validated(
+            serializers.MemoryTopSerializer, request.query_params,
+        )
+        try:
+            stats = memory.top(options['snapshot'], options['group_by'],
+                               options['limit'])
+        except KeyError:
+            raise NotFound('No such snapshot in this worker.')
+        return Response({'pid': os.getpid(), 'stats': stats})
+
+    @extend_schema(parameters=[serializers.MemoryDiffSerializer])
+    @action(methods=['GET'], detail=False)
+    def diff(self, request):
+        """List the allocation sites that grew most between snapshots."""
+        options = self._validated(
+            serializers.MemoryDiffSerializer, request.query_params,
+        )
+        try:
+            stats = memory.diff(options['first'], options['second'],
+                                options['group_by'], options['limit'])
+        except KeyError:
+            raise NotFound('No such snapshot in this worker.')
+        return Response({'pid': os.getpid(), 'stats': stats})
@@ -0,0 +1,101 @@
+"""
+Gap based ordering keys for list entries.
+
+Entries are ordered by an integer ``position``. Consecutive entries start
+``Entry.POSITION_GAP`` apart, so an entry can be moved between two others
+by writing the midpoint of their positions to that single row. Only when
+two neighbours end up adjacent is the list respread.
+"""
+from django.db.models import Max
+
+from core.models import Entry
+
+
+GAP = Entry.POSITION_GAP
+
+
+def last_position(list_obj):
+    """Return the position of the last entry of a list, or 0 if empty."""
+    return Entry.objects.filter(owner_list=list_obj).aggregate(
+        last=Max('position'),
+    )['last'] or 0
+
+
+def between(before, after):
+    """Return a position strictly between two positions, or None if full.
+
+    Either bound may be None for the start or end of the list.
+    """
+    if before is None and after is None:
+        return GAP
+    if before is None:
+        return after - GAP
+    if after is None:
+        return before + GAP
+    if after - before > 1:
+        return before + (after - before) // 2
+    return None
+
+
+def _longest_increasing(values):
+    """Return indexes of a longest strictly increasing subsequence."""
+    tails, tail_indexes, parents = [], [], {}
+    for index, value in enumerate(values):
+        low, high = 0, len(tails)
+        while low < high:
+            middle = (low + high) // 2
+            if tails[middle] < value:
+                low = middle + 1
+            else:
+                high = middle
+        parents[index] = tail_indexes[low - 1] if low else None
+        if low == len(tails):
+            tails.append(value)
+            tail_indexes.append(index)
+        else:
+            tails[low] = value
+            tail_indexes[low] = index
+    chain = []
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        chain.append(index)
+        index = parents[index]
+    return chain[::-1]
+
+
+def plan_positions(current):
+    """Return new positions for entries given in their new order.
+
+    ``current`` holds each entry's stored position, or None for new
+    entries. The longest run of entries already in order keeps its
+    positions and every other entry is slotted between them, so only the
+    entries that really moved are written. Falls back to respreading the
+    whole list when there's no room between two kept entries.
+    """
+    known = [i for i, position in enumerate(current) if position is not None]
+    anchors = [
+        known[i] for i in _longest_increasing([current[i] for i in known])
+    ]
+    planned = list(current)
+    bounds = [None] + anchors + [None]
+    for lower, upper in zip(bounds, bounds[1:]):
+        start = 0 if lower is None else lower + 1
+        stop = len(current) if upper is None else upper
+        count = stop - start
+        if not count:
+            continue
+        low = None if lower is None else current[lower]
+        high = None if upper is None else current[upper]
+        if low is None and high is None:
+            low, step = 0, GAP
+        elif high is None:
+            step = GAP
+        elif low is None:
+            low, step = high - GAP * (count + 1), GAP
+        else:
+            step = (high - low) // (count + 1)
+            if step < 1:
+                return [GAP * (i + 1) for i in range(len(current))]
+        for offset in range(count):
+            planned[start + offset] = low + step * (offset + 1)
+    return planned
@@ -1,6 +1,11 @@
 """
 Serializers for List APIs
 """
+from collections import deque
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models, transaction
 
 from rest_framework import serializers
 
@@ -12,6 +17,32 @@ from core.models import (
 )
 
 from album.serializers import AlbumSerializer as AlbumDetailSerializer
+from list.positions import GAP, between, last_position, plan_positions
+
+
+def parse_entry_fields(value):
+    """Parse a ``fields=`` projection such as ``id,album.title``.
+
+    Returns a dict mapping entry fields to the set of album fields to keep,
+    or None to keep every album field.
+    """
+    entry_fields = EntryDetailSerializer.Meta.fields
+    album_fields = AlbumDetailSerializer.Meta.fields
+    projection = {}
+    for name in filter(None, (name.strip() for name in value.split(','))):
+        field, _, subfield = name.partition('.')
+        if field not in entry_fields or (
+                subfield and (field != 'album' or subfield not in album_fields)):
+            raise serializers.ValidationError(
+                {'fields': f'Unknown field: {name}.'}
+            )
+        if subfield:
+            if field in projection and projection[field] is None:
+                continue
+            projection.setdefault(field, set()).add(subfield)
+        else:
+            projection[field] = None
+    return projection
 
 
 class EntryDetailSerializer(serializers.ModelSerializer):
@@ -20,17 +51,69 @@ class EntryDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Entry
-        fields = ['album', 'description']
+        fields = ['id', 'album', 'description']
+
+    def __init__(self, *args, **kwargs):
+        projection = kwargs.pop('projection', None)
+        super().__init__(*args, **kwargs)
+        if projection:
+            for name in list(self.fields):
+                if name not in projection:
+                    self.fields.pop(name)
+            album_fields = projection.get('album')
+            if album_fields:
+                album = self.fields['album']
+                for name in list(album.fields):
+                    if name not in album_fields:
+                        album.fields.pop(name)
+
+
+class CappedEntryListSerializer(serializers.ListSerializer):
+    """Render at most LIST_DETAIL_MAX_ENTRIES entries of a list."""
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        if isinstance(data, models.QuerySet) and not data.ordered:
+            data = data.order_by('position', 'id')
+        return super().to_representation(
+            data[:settings.LIST_DETAIL_MAX_ENTRIES]
+        )
 
 
 class ListDetailSerializer(serializers.ModelSerializer):
     """Serializer Creating or updating lists."""
-    albums = EntryDetailSerializer(many=True, source='entries')
+    albums = CappedEntryListSerializer(
+        child=EntryDetailSerializer(),
+        source='entries',
+    )
 
     class Meta:
         model = List
-        fields = ['id', 'label', 'user', 'albums']
-        read_only_fields = ['id', 'user']
+        fields = ['id', 'label', 'user', 'entry_count', 'albums']
+        read_only_fields = ['id', 'user', 'entry_count']
+
+
+class ListSummarySerializer(serializers.ModelSerializer):
+    """Compact list representation built from denormalized fields."""
+    user_name = serializers.CharField(source='user.name', read_only=True)
+    cover_images = serializers.SerializerMethodField()
+
+    class Meta:
+        model = List
+        fields = [
+            'id',
+            'label',
+            'user',
+            'user_name',
+            'entry_count',
+            'cover_images',
+            'top_genres',
+        ]
+        read_only_fields = fields
+
+    def get_cover_images(self, obj):
+        return [default_storage.url(name) for name in obj.cover_images]
 
 
 class AlbumHelperSerializer(serializers.ModelSerializer):
@@ -41,9 +124,22 @@ class AlbumHelperSerializer(serializers.ModelSerializer):
         fields = ['id']
 
 
+def validate_album_ids(album_ids):
+    """Check every album id exists with a single query."""
+    album_ids = set(album_ids)
+    found = set(
+        Album.objects.filter(id__in=album_ids).values_list('id', flat=True)
+    )
+    missing = sorted(album_ids - found)
+    if missing:
+        raise serializers.ValidationError(
+            f'Invalid album ids: {", ".join(map(str, missing))}.'
+        )
+
+
 class EntrySerializer(serializers.ModelSerializer):
     """Serializer for Entries getting"""
-    album = serializers.PrimaryKeyRelatedField(queryset=Album.objects.all())
+    album = serializers.IntegerField(source='album_id')
 
     class Meta:
         model = Entry
@@ -52,29 +148,226 @@ class EntrySerializer(serializers.ModelSerializer):
 
 class ListSerializer(serializers.ModelSerializer):
     """Serializer for lists with basic info."""
-    albums = EntrySerializer(many=True, source='entries')
+    albums = EntrySerializer(many=True, source='entries', required=False)
 
     class Meta:
         model = List
         fields = ['id', 'label', 'user', 'albums']
         read_only_fields = ['id', 'user']
 
+    def validate_albums(self, value):
+        validate_album_ids(entry['album_id'] for entry in value)
+        return value
+
+    def _sync_entries(self, instance, albums_data):
+        """Turn the list's entries into albums_data with minimal writes.
+
+        Submitted entries are matched to stored entries of the same album.
+        Matched entries keep their row and only get their description or
+        position updated if those changed, unmatched stored entries are
+        deleted and the rest are inserted, each in one statement. Returns
+        whether the membership or order of the list changed.
+        """
+        by_album = {}
+        for entry in Entry.objects.filter(owner_list=instance).only(
+                'id', 'album_id', 'description', 'position'):
+            by_album.setdefault(entry.album_id, deque()).append(entry)
+        matched = [
+            by_album[data['album_id']].popleft()
+            if by_album.get(data['album_id']) else None
+            for data in albums_data
+        ]
+        positions = plan_positions([
+            entry.position if entry else None for entry in matched
+        ])
+
+        to_delete = [
+            entry.id for entries in by_album.values() for entry in entries
+        ]
+        to_update, to_create, moved = [], [], False
+        for entry, data, position in zip(matched, albums_data, positions):
+            description = data.get('description', '')
+            if entry is None:
+                to_create.append(Entry(
+                    owner_list=instance, position=position, **data,
+                ))
+            elif (entry.description, entry.position) != (description, position):
+                moved = moved or entry.position != position
+                entry.description = description
+                entry.position = position
+                to_update.append(entry)
+
+        if to_delete:
+            Entry.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            Entry.objects.bulk_update(to_update, ['description', 'position'])
+        Entry.objects.bulk_create(to_create)
+        return bool(to_delete or to_create) or moved
+
+    @transaction.atomic
     def create(self, validated_data):
         albums_data = validated_data.pop('entries', [])
         list = List.objects.create(**validated_data)
-        for entry_data in albums_data:
-            album_data = entry_data.pop('album')
-            Entry.objects.create(owner_list=list, album=album_data, **entry_data)
+        Entry.objects.bulk_create([
+            Entry(owner_list=list, position=GAP * (index + 1), **entry_data)
+            for index, entry_data in enumerate(albums_data)
+        ])
+        list.refresh_summary()
         return list
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        albums_data = validated_data.pop('entries', [])
-        Entry.objects.filter(owner_list=instance).delete()
-        for entry_data in albums_data:
-            album_data = entry_data.pop('album')
-            Entry.objects.create(owner_list=instance, album=album_data, **entry_data)
+        albums_data = validated_data.pop('entries', None)
+        changed = False
+        if albums_data is not None:
+            changed = self._sync_entries(instance, albums_data)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        # Only the edited fields, so the summary and chart points loaded
+        # with the list can't overwrite newer ones, and the chart is only
+        # rescored when something it scores changed.
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        if changed:
+            instance.refresh_summary()
         return instance
+
+
+class EntryOperationSerializer(serializers.Serializer):
+    """Serializer for a single add, remove, move or edit of a list entry."""
+    OPERATIONS = ['add', 'remove', 'move', 'edit']
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    entry = serializers.IntegerField(required=False)
+    after = serializers.IntegerField(required=False, allow_null=True)
+    album = serializers.IntegerField(required=False)
+    description = serializers.CharField(
+        max_length=4096,
+        allow_blank=True,
+        required=False,
+    )
+
+    def validate(self, attrs):
+        required = {
+            'add': ['album'],
+            'remove': ['entry'],
+            'move': ['entry'],
+            'edit': ['entry', 'description'],
+        }[attrs['op']]
+        missing = {
+            name: 'This field is required.'
+            for name in required if name not in attrs
+        }
+        if missing:
+            raise serializers.ValidationError(missing)
+        if attrs['op'] == 'move' and attrs.get('after') == attrs['entry']:
+            raise serializers.ValidationError(
+                {'after': "An entry can't be moved behind itself."}
+            )
+        return attrs
+
+
+def move_entry(list_obj, entry_id, after_id=None):
+    """Move an entry behind another one, or to the top without after_id.
+
+    Only the moved row is written unless its new neighbours are adjacent,
+    in which case the list's positions are respread first.
+    """
+    others = Entry.objects.filter(owner_list=list_obj).exclude(id=entry_id)
+    before = None
+    if after_id is not None:
+        before = others.filter(id=after_id).values_list(
+            'position', flat=True,
+        ).get()
+    following = others.order_by('position', 'id')
+    if before is not None:
+        following = following.filter(position__gt=before)
+    after = following.values_list('position', flat=True).first()
+    position = between(before, after)
+    if position is None:
+        list_obj.respread_positions()
+        return move_entry(list_obj, entry_id, after_id)
+    Entry.objects.filter(id=entry_id).update(position=position)
+
+
+@transaction.atomic
+def apply_entry_operations(list_obj, operations):
+    """Apply validated entry operations to a list in one transaction.
+
+    Removes and edits are collapsed before touching the database, so a
+    batch takes at most one DELETE, one UPDATE and one INSERT besides a
+    single row UPDATE per move. Added entries are appended to the end of
+    the list. Returns the ids of the added entries.
+    """
+    entry_ids = {
+        op[name] for op in operations for name in ('entry', 'after')
+        if op.get(name) is not None
+    }
+    known = set(
+        Entry.objects.filter(
+            owner_list=list_obj, id__in=entry_ids,
+        ).values_list('id', flat=True)
+    )
+    unknown = sorted(entry_ids - known)
+    if unknown:
+        raise serializers.ValidationError(
+            f'Invalid entry ids: {", ".join(map(str, unknown))}.'
+        )
+    validate_album_ids(op['album'] for op in operations if op['op'] == 'add')
+
+    removed, edits, moves, added = set(), {}, [], []
+    for op in operations:
+        if op['op'] == 'add':
+            added.append(Entry(
+                owner_list=list_obj,
+                album_id=op['album'],
+                description=op.get('description', ''),
+            ))
+            continue
+        for name in ('entry', 'after'):
+            if op.get(name) in removed:
+                raise serializers.ValidationError(
+                    f'Entry {op[name]} was already removed.'
+                )
+        if op['op'] == 'remove':
+            removed.add(op['entry'])
+            edits.pop(op['entry'], None)
+        elif op['op'] == 'move':
+            moves.append((op['entry'], op.get('after')))
+        else:
+            edits[op['entry']] = op['description']
+
+    if edits:
+        Entry.objects.bulk_update(
+            [Entry(id=pk, description=text) for pk, text in edits.items()],
+            ['description'],
+        )
+    if added:
+        start = last_position(list_obj)
+        for index, entry in enumerate(added):
+            entry.position = start + GAP * (index + 1)
+        added = Entry.objects.bulk_create(added)
+    # Moves run before removals so they may still refer to entries that a
+    # later operation removes.
+    for entry_id, after_id in moves:
+        if entry_id not in removed:
+            move_entry(list_obj, entry_id, after_id)
+    if removed:
+        Entry.objects.filter(id__in=removed).delete()
+    if removed or moves or added:
+        list_obj.refresh_summary()
+    return [entry.id for entry in added]
+
+
+class ListCloneSerializer(serializers.Serializer):
+    """Serializer for the label of a cloned list."""
+    label = serializers.CharField(max_length=255, required=False)
+
+
+class ListImportSerializer(serializers.Serializer):
+    """Serializer for a file of entries to append to a list."""
+    FORMATS = ['json', 'csv']
+
+    file = serializers.FileField()
+    type = serializers.ChoiceField(choices=FORMATS, default='json')
@@ -1,17 +1,25 @@
 """
 Tests for List APIs.
 """
+from io import StringIO
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import List, Album, Artist, Entry
+from core.models import List, Album, Artist, Entry, Genre
 
-from list.serializers import ListDetailSerializer, ListSerializer
+from list.serializers import (
+    ListDetailSerializer,
+    ListSerializer,
+    ListSummarySerializer,
+)
 
 from decimal import Decimal
 
@@ -24,6 +32,14 @@ def specific_list_url(list_id):
     """Create and return a specific list URL."""
     return reverse('list:list-detail', args=[list_id])
 
+def list_entries_url(list_id):
+    """Create and return the entries URL of a list."""
+    return reverse('list:list-entries', args=[list_id])
+
+def list_operations_url(list_id):
+    """Create and return the entry operations URL of a list."""
+    return reverse('list:list-operations', args=[list_id])
+
 def create_list(user, **params):
     """Create and return a sample list"""
     defaults = {
@@ -70,6 +86,15 @@ def create_entry(album, list, **params):
     return entry
 
 
+def create_detailed_album(index):
+    """Create and return an album with artists and genres."""
+    album = create_album(title=f'Album {index}')
+    album.artist.add(create_artist(name=f'Artist {index}'))
+    album.primary_genres.add(Genre.objects.create(name=f'Primary {index}'))
+    album.secondary_genres.add(Genre.objects.create(name=f'Secondary {index}'))
+    return album
+
+
 class PublicListAPITests(TestCase):
     """Test unauthenticated API requests."""
 
@@ -152,7 +177,7 @@ class PrivateListAPITests(TestCase):
         res = self.client.get(LISTS_URL, query_params)
 
         lists = List.objects.filter(public=True).order_by('-id')
-        serializer = ListDetailSerializer(lists, many=True)
+        serializer = ListSummarySerializer(lists, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data['results'], serializer.data)
 
@@ -164,7 +189,7 @@ class PrivateListAPITests(TestCase):
         res = self.client.get(LISTS_URL)
 
         lists = List.objects.filter(user=self.user)
-        serializer = ListSerializer(lists, many=True)
+        serializer = ListSummarySerializer(lists, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data['results'], serializer.data)
 
@@ -188,6 +213,49 @@ class PrivateListAPITests(TestCase):
         list = lists[0]
         self.assertEqual(list.entries.count(), 1)
 
+    def test_create_list_refreshes_summary(self):
+        """Test creating a list fills in its summary fields."""
+        album1 = create_detailed_album(1)
+        album2 = create_detailed_album(2)
+        album2.primary_genres.add(album1.primary_genres.get())
+        payload = {
+            'label': 'Test List',
+            'albums': [
+                {'album': album1.id, 'description': ''},
+                {'album': album2.id, 'description': ''},
+            ]
+        }
+        res = self.client.post(LISTS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        list1 = List.objects.get(user=self.user)
+        genre1 = album1.primary_genres.get()
+        genre2 = Genre.objects.get(name='Primary 2')
+        self.assertEqual(list1.entry_count, 2)
+        self.assertEqual(
+            list1.top_genres,
+            [[genre1.id, genre1.name], [genre2.id, genre2.name]],
+        )
+
+    def test_list_summary_fields(self):
+        """Test the list feed returns summaries instead of entries."""
+        list1 = create_list(user=self.user2, public=True)
+        album1 = create_album(image='uploads/albums/1.jpg')
+        create_entry(album1, list1)
+        list1.refresh_summary()
+
+        res = self.client.get(LISTS_URL, {'public': True})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        summary = res.data['results'][0]
+        self.assertNotIn('albums', summary)
+        self.assertEqual(summary['entry_count'], 1)
+        self.assertEqual(summary['user_name'], self.user2.name)
+        self.assertEqual(
+            summary['cover_images'],
+            ['/static/media/uploads/albums/1.jpg'],
+        )
+
     def test_delete_list(self):
         """Test deleting a list"""
         list1 = create_list(user=self.user)
@@ -262,4 +330,511 @@ class PrivateListAPITests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Entry.objects.filter(id=entry1.id).exists())
         self.assertTrue(Album.objects.filter(id=album1.id).exists())
-        self.assertFalse(List.objects.filter(id=list1.id).exists())
\ No newline at end of file
+        self.assertFalse(List.objects.filter(id=list1.id).exists())
+
+class ListQueryCountTests(TestCase):
+    """Test list rendering doesn't issue queries per entry."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user1@example.com',
+            'testpass1234',
+        )
+        self.albums = [create_detailed_album(i) for i in range(10)]
+
+    def _count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return len(queries)
+
+    def test_retrieve_query_count_constant(self):
+        """Test retrieving a list takes the same queries at any length."""
+        short_list = create_list(user=self.user, public=True)
+        long_list = create_list(user=self.user, public=True)
+        for album in self.albums[:2]:
+            create_entry(album, short_list)
+        for album in self.albums:
+            create_entry(album, long_list)
+
+        params = {'public': True}
+        self.assertEqual(
+            self._count_queries(specific_list_url(short_list.id), params),
+            self._count_queries(specific_list_url(long_list.id), params),
+        )
+
+    def test_public_lists_query_count_constant(self):
+        """Test the public feed takes the same queries at any length."""
+        list1 = create_list(user=self.user, public=True)
+        for album in self.albums[:2]:
+            create_entry(album, list1)
+        short_count = self._count_queries(LISTS_URL, {'public': True})
+
+        list2 = create_list(user=self.user, public=True)
+        for album in self.albums:
+            create_entry(album, list1)
+            create_entry(album, list2)
+
+        self.assertEqual(
+            short_count,
+            self._count_queries(LISTS_URL, {'public': True}),
+        )
+
+
+class ListEntriesAPITests(TestCase):
+    """Test the paginated entries sub-resource."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user1@example.com',
+            'testpass1234',
+        )
+        self.client.force_authenticate(self.user)
+        self.list = create_list(user=self.user)
+        self.entries = [
+            create_entry(create_detailed_album(i), self.list, description=f'{i}')
+            for i in range(5)
+        ]
+
+    def test_entries_cursor_pagination(self):
+        """Test entries are returned in pages linked by cursors."""
+        url = list_entries_url(self.list.id)
+
+        res = self.client.get(url, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [entry['id'] for entry in res.data['results']],
+            [entry.id for entry in self.entries[:2]],
+        )
+
+        res = self.client.get(res.data['next'])
+        self.assertEqual(
+            [entry['id'] for entry in res.data['results']],
+            [entry.id for entry in self.entries[2:4]],
+        )
+
+    def test_entries_fields_projection(self):
+        """Test fields= limits the rendered entry and album fields."""
+        url = list_entries_url(self.list.id)
+
+        res = self.client.get(url, {'fields': 'id,album.title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'][0], {
+            'id': self.entries[0].id,
+            'album': {'title': 'Album 0'},
+        })
+
+    def test_entries_projection_skips_relations(self):
+        """Test relations left out of the projection are not queried."""
+        url = list_entries_url(self.list.id)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(url, {'fields': 'description'})
+
+        self.assertEqual(res.data['results'][0], {'description': '0'})
+
+    def test_entries_unknown_field(self):
+        """Test unknown projection fields are rejected."""
+        url = list_entries_url(self.list.id)
+
+        res = self.client.get(url, {'fields': 'album.nope'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(LIST_DETAIL_MAX_ENTRIES=3)
+    def test_detail_entries_capped(self):
+        """Test the detail route renders a capped number of entries."""
+        res = self.client.get(specific_list_url(self.list.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [entry['id'] for entry in res.data['albums']],
+            [entry.id for entry in self.entries[:3]],
+        )
+
+
+class EntryOperationsAPITests(TestCase):
+    """Test incremental entry operations."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user1@example.com',
+            'testpass1234',
+        )
+        self.client.force_authenticate(self.user)
+        self.list = create_list(user=self.user)
+        self.albums = [create_album(title=f'Album {i}') for i in range(3)]
+        self.entries = [
+            create_entry(album, self.list, description='old')
+            for album in self.albums[:2]
+        ]
+
+    def _queries(self, method, url, payload):
+        with CaptureQueriesContext(connection) as queries:
+            res = getattr(self.client, method)(url, payload, format='json')
+        writes = [
+            q['sql'].split()[0] for q in queries
+            if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+        ]
+        return res, writes
+
+    def test_add_entry(self):
+        """Test adding a single entry."""
+        url = list_operations_url(self.list.id)
+        payload = {'op': 'add', 'album': self.albums[2].id, 'description': 'new'}
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        entry = Entry.objects.get(id=res.data['added'][0])
+        self.assertEqual(entry.album, self.albums[2])
+        self.assertEqual(entry.description, 'new')
+        self.list.refresh_from_db()
+        self.assertEqual(self.list.entry_count, 3)
+
+    def test_edit_description_single_update(self):
+        """Test editing a description only updates that entry."""
+        url = list_operations_url(self.list.id)
+        payload = {
+            'op': 'edit',
+            'entry': self.entries[0].id,
+            'description': 'edited',
+        }
+
+        res, writes = self._queries('post', url, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(writes, ['UPDATE'])
+        self.entries[0].refresh_from_db()
+        self.assertEqual(self.entries[0].description, 'edited')
+
+    def test_batch_operations(self):
+        """Test a batch of operations is applied together."""
+        url = list_operations_url(self.list.id)
+        payload = [
+            {'op': 'remove', 'entry': self.entries[0].id},
+            {'op': 'edit', 'entry': self.entries[1].id, 'description': 'x'},
+            {'op': 'add', 'album': self.albums[2].id},
+            {'op': 'add', 'album': self.albums[0].id},
+        ]
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['added']), 2)
+        entries = Entry.objects.filter(owner_list=self.list).order_by('id')
+        self.assertEqual(
+            [(e.album_id, e.description) for e in entries],
+            [
+                (self.albums[1].id, 'x'),
+                (self.albums[2].id, ''),
+                (self.albums[0].id, ''),
+            ],
+        )
+
+    def test_batch_is_atomic(self):
+        """Test an invalid operation rolls back the whole batch."""
+        other_list = create_list(user=self.user)
+        other_entry = create_entry(self.albums[0], other_list)
+        url = list_operations_url(self.list.id)
+        payload = [
+            {'op': 'remove', 'entry': self.entries[0].id},
+            {'op': 'remove', 'entry': other_entry.id},
+        ]
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Entry.objects.filter(id=self.entries[0].id).exists())
+
+    def test_operation_missing_fields(self):
+        """Test operations must carry the fields they need."""
+        url = list_operations_url(self.list.id)
+
+        res = self.client.post(url, {'op': 'edit', 'entry': 1}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_operations_on_other_user_list(self):
+        """Test users can't change other users' lists."""
+        other_user = get_user_model().objects.create_user(
+            'user2@example.com',
+            'testpass1234',
+        )
+        other_list = create_list(user=other_user, public=True)
+        url = list_operations_url(other_list.id)
+
+        res = self.client.post(
+            url, {'op': 'add', 'album': self.albums[0].id}, format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_put_diffs_entries(self):
+        """Test a full update only writes what changed."""
+        url = specific_list_url(self.list.id)
+        payload = {
+            'label': self.list.label,
+            'albums': [
+                {'album': self.albums[0].id, 'description': 'old'},
+                {'album': self.albums[1].id, 'description': 'changed'},
+                {'album': self.albums[2].id, 'description': 'new'},
+            ],
+        }
+
+        res, writes = self._queries('put', url, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('DELETE', writes)
+        self.assertEqual(writes.count('INSERT'), 1)
+        entries = Entry.objects.filter(owner_list=self.list).order_by('id')
+        self.assertEqual(entries[0].id, self.entries[0].id)
+        self.assertEqual(
+            [(e.album_id, e.description) for e in entries],
+            [(a.id, d) for a, d in zip(self.albums, ['old', 'changed', 'new'])],
+        )
+
+    def test_put_reorders_entries(self):
+        """Test a full update can reorder entries without recreating them."""
+        url = specific_list_url(self.list.id)
+        payload = {
+            'label': self.list.label,
+            'albums': [
+                {'album': self.albums[1].id, 'description': 'old'},
+                {'album': self.albums[0].id, 'description': 'old'},
+            ],
+        }
+
+        res, writes = self._queries('put', url, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(writes), {'UPDATE'})
+        entries = Entry.objects.filter(owner_list=self.list)
+        self.assertEqual(
+            [e.id for e in entries],
+            [self.entries[1].id, self.entries[0].id],
+        )
+
+    def test_patch_without_albums_keeps_entries(self):
+        """Test patching only the label leaves entries alone."""
+        url = specific_list_url(self.list.id)
+
+        res = self.client.patch(url, {'label': 'New'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(Entry.objects.filter(owner_list=self.list).count(), 2)
+
+    def test_label_edit_keeps_newer_summary(self):
+        """Test editing the label doesn't write back a stale summary."""
+        stale = List.objects.get(pk=self.list.pk)
+        List.objects.filter(pk=self.list.pk).update(
+            entry_count=5, chart_points={'1': 100},
+        )
+        serializer = ListSerializer(stale, data={'label': 'New'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+
+        self.list.refresh_from_db()
+        self.assertEqual(self.list.label, 'New')
+        self.assertEqual(self.list.entry_count, 5)
+        self.assertEqual(self.list.chart_points, {'1': 100})
+        self.assertFalse(
+            any('core_chartentry' in query['sql'] for query in queries)
+        )
+
+    def test_put_invalid_album(self):
+        """Test unknown albums are rejected."""
+        url = specific_list_url(self.list.id)
+        payload = {'label': 'x', 'albums': [{'album': 0, 'description': ''}]}
+
+        res = self.client.put(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _ordered_ids(self):
+        return list(
+            Entry.objects.filter(owner_list=self.list).values_list(
+                'id', flat=True,
+            )
+        )
+
+    def test_move_entry_updates_single_row(self):
+        """Test moving an entry only writes the moved row."""
+        self.list.respread_positions()
+        third = create_entry(
+            self.albums[2], self.list, position=3 * Entry.POSITION_GAP,
+        )
+        url = list_operations_url(self.list.id)
+        payload = {
+            'op': 'move', 'entry': third.id, 'after': self.entries[0].id,
+        }
+
+        res, writes = self._queries('post', url, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(writes.count('UPDATE'), 2)
+        self.assertEqual(
+            self._ordered_ids(),
+            [self.entries[0].id, third.id, self.entries[1].id],
+        )
+
+    def test_move_entry_to_top(self):
+        """Test moving an entry without after puts it first."""
+        self.list.respread_positions()
+        url = list_operations_url(self.list.id)
+        payload = {'op': 'move', 'entry': self.entries[1].id, 'after': None}
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self._ordered_ids(),
+            [self.entries[1].id, self.entries[0].id],
+        )
+
+    def test_move_respreads_when_out_of_gaps(self):
+        """Test adjacent positions are respread before moving between them."""
+        Entry.objects.filter(id=self.entries[0].id).update(position=1)
+        Entry.objects.filter(id=self.entries[1].id).update(position=2)
+        third = create_entry(self.albums[2], self.list, position=3)
+        url = list_operations_url(self.list.id)
+        payload = {
+            'op': 'move', 'entry': third.id, 'after': self.entries[0].id,
+        }
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self._ordered_ids(),
+            [self.entries[0].id, third.id, self.entries[1].id],
+        )
+
+    def test_move_entry_after_itself(self):
+        """Test moving an entry behind itself is rejected."""
+        url = list_operations_url(self.list.id)
+        payload = {
+            'op': 'move',
+            'entry': self.entries[0].id,
+            'after': self.entries[0].id,
+        }
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('after', str(res.data))
+
+    def test_added_entries_appended(self):
+        """Test added entries go after existing ones."""
+        self.list.respread_positions()
+        url = list_operations_url(self.list.id)
+        payload = [
+            {'op': 'add', 'album': self.albums[2].id},
+            {'op': 'move', 'entry': self.entries[1].id},
+        ]
+
+        res = self.client.post(url, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self._ordered_ids(),
+            [self.entries[1].id, self.entries[0].id, res.data['added'][0]],
+        )
+
+    def test_respread_command(self):
+        """Test the command only respreads lists without room to move."""
+        Entry.objects.filter(id=self.entries[0].id).update(position=1)
+        Entry.objects.filter(id=self.entries[1].id).update(position=2)
+
+        call_command('respread_list_positions', stdout=StringIO())
+
+        positions = Entry.objects.filter(
+            owner_list=self.list,
+        ).values_list('position', flat=True)
+        self.assertEqual(
+            list(positions), [Entry.POSITION_GAP, 2 * Entry.POSITION_GAP],
+        )
+
+
+def list_clone_url(list_id):
+    """Create and return the clone URL of a list."""
+    return reverse('list:list-clone', args=[list_id])
+
+
+class ListCloneAPITests(TestCase):
+    """Test cloning lists."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = get_user_model().objects.create_user(
+            'owner@example.com',
+            'testpass1234',
+        )
+        self.user = get_user_model().objects.create_user(
+            'user1@example.com',
+            'testpass1234',
+        )
+        self.client.force_authenticate(self.user)
+        self.list = create_list(user=self.owner, public=True, label='Best')
+        for index in range(3):
+            create_entry(
+                create_album(title=f'Album {index}'),
+                self.list,
+                description=f'Note {index}',
+                position=Entry.POSITION_GAP * (3 - index),
+            )
+        self.list.refresh_summary()
+
+    def test_clone_public_list(self):
+        """Test cloning copies entries, positions and summary."""
+        res = self.client.post(list_clone_url(self.list.id))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        copy = List.objects.get(id=res.data['id'])
+        self.assertEqual(copy.user, self.user)
+        self.assertEqual(copy.label, 'Best')
+        self.assertFalse(copy.public)
+        self.assertEqual(copy.entry_count, 3)
+        columns = ('album_id', 'description', 'position')
+        self.assertEqual(
+            list(copy.entries.values_list(*columns)),
+            list(self.list.entries.values_list(*columns)),
+        )
+
+    def test_clone_with_label(self):
+        """Test the clone can be given a new label."""
+        res = self.client.post(list_clone_url(self.list.id), {'label': 'Mine'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['label'], 'Mine')
+
+    def test_clone_query_count_constant(self):
+        """Test cloning takes the same queries at any list length."""
+        url = list_clone_url(self.list.id)
+        with CaptureQueriesContext(connection) as short:
+            self.client.post(url)
+        for index in range(10):
+            create_entry(create_album(title=f'More {index}'), self.list)
+
+        with CaptureQueriesContext(connection) as long:
+            self.client.post(url)
+
+        self.assertEqual(len(short), len(long))
+        inserts = [q for q in long if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_clone_private_list_of_other_user(self):
+        """Test another user's private list can't be cloned."""
+        self.list.public = False
+        self.list.save()
+
+        res = self.client.post(list_clone_url(self.list.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(List.objects.filter(user=self.user).count(), 0)
@@ -0,0 +1,217 @@
+"""
+Tests for streaming list export and import.
+"""
+import io
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Entry
+
+from list import transfer
+from list.tests.test_list_api import (
+    create_album,
+    create_artist,
+    create_entry,
+    create_list,
+)
+
+
+def list_export_url(list_id):
+    """Create and return the export URL of a list."""
+    return reverse('list:list-export', args=[list_id])
+
+
+def list_import_url(list_id):
+    """Create and return the import URL of a list."""
+    return reverse('list:list-import-entries', args=[list_id])
+
+
+def read_stream(res):
+    """Return the body of a streaming response as text."""
+    return b''.join(res.streaming_content).decode()
+
+
+class ParseJSONTests(SimpleTestCase):
+    """Test incremental parsing of exported JSON."""
+
+    def test_entries_across_reads(self):
+        """Test entries split over several reads are decoded whole."""
+        rows = [{'album': i, 'description': 'x' * i} for i in range(50)]
+        document = json.dumps({'label': 'a [list]', 'entries': rows})
+        stream = io.TextIOWrapper(io.BytesIO(document.encode()))
+        reader = transfer._JSONReader(stream, read_size=7)
+
+        reader.expect('{')
+        self.assertEqual(reader.value(), 'label')
+
+        parsed = list(transfer.parse_json(io.BytesIO(document.encode())))
+        self.assertEqual(parsed, rows)
+
+    def test_truncated_document(self):
+        """Test a document cut off mid entry raises ValueError."""
+        stream = io.BytesIO(b'{"entries": [{"album": 1}, {"alb')
+
+        with self.assertRaises(ValueError):
+            list(transfer.parse_json(stream))
+
+
+class ListTransferAPITests(TestCase):
+    """Test exporting and importing list entries."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user1@example.com',
+            'testpass1234',
+        )
+        self.client.force_authenticate(self.user)
+        self.list = create_list(user=self.user, label='Best, ever')
+        self.albums = [create_album(title=f'Album {i}') for i in range(3)]
+        for index, album in enumerate(self.albums):
+            create_entry(
+                album, self.list,
+                description=f'Note {index}, "quoted"',
+                position=Entry.POSITION_GAP * (3 - index),
+            )
+
+    def _import(self, list_obj, content, file_type='json'):
+        upload = SimpleUploadedFile(f'list.{file_type}', content.encode())
+        return self.client.post(
+            list_import_url(list_obj.id),
+            {'file': upload, 'type': file_type},
+            format='multipart',
+        )
+
+    def test_export_json_in_order(self):
+        """Test exporting a list streams its entries in order."""
+        res = self.client.get(list_export_url(self.list.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        data = json.loads(read_stream(res))
+        self.assertEqual(data['label'], 'Best, ever')
+        self.assertEqual(
+            [row['album'] for row in data['entries']],
+            [album.id for album in self.albums[::-1]],
+        )
+        self.assertEqual(
+            data['entries'][0]['artists'], ['Sample Artist Name'],
+        )
+
+    def test_export_query_count_constant(self):
+        """Test exporting queries per chunk rather than per entry."""
+        with self.assertNumQueries(3):
+            read_stream(self.client.get(list_export_url(self.list.id)))
+
+    def test_export_unknown_type(self):
+        """Test exporting to an unknown format fails."""
+        res = self.client.get(list_export_url(self.list.id), {'type': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_round_trip(self):
+        """Test an exported list imports into an identical list."""
+        for file_type in ['json', 'csv']:
+            exported = read_stream(self.client.get(
+                list_export_url(self.list.id), {'type': file_type},
+            ))
+            copy = create_list(user=self.user)
+
+            res = self._import(copy, exported, file_type)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data['added'], 3)
+            self.assertEqual(
+                list(copy.entries.values_list('album_id', 'description')),
+                list(self.list.entries.values_list(
+                    'album_id', 'description',
+                )),
+            )
+            copy.refresh_from_db()
+            self.assertEqual(copy.entry_count, 3)
+
+    def test_import_by_title_and_artist(self):
+        """Test albums without a known id are matched by title."""
+        other = create_album(title='Album 1')
+        other.artist.set([create_artist(name='Someone Else')])
+        content = (
+            'album,title,artists,description\r\n'
+            ',album 1,Sample Artist Name,by title\r\n'
+            '999999,Album 2,,stale id\r\n'
+        )
+
+        res = self._import(self.list, content, 'csv')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(self.list.entries.values_list('album_id', flat=True))[3:],
+            [self.albums[1].id, self.albums[2].id],
+        )
+
+    def test_import_unmatched_keeps_nothing(self):
+        """Test a file with an unknown album adds no entries."""
+        content = json.dumps({'entries': [
+            {'album': self.albums[0].id},
+            {'title': 'Nope'},
+        ]})
+
+        res = self._import(self.list, content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            res.data['file'], ['Entry 2: No album matches "Nope".'],
+        )
+        self.assertEqual(self.list.entries.count(), 3)
+
+    def test_import_malformed_album(self):
+        """Test album ids that aren't numbers are reported per entry."""
+        content = json.dumps({'entries': [
+            {'album': [1]},
+            {'album': 'one'},
+        ]})
+
+        res = self._import(self.list, content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['file'], [
+            'Entry 1: Album must be an id.',
+            'Entry 2: Album must be an id.',
+        ])
+        self.assertEqual(self.list.entries.count(), 3)
+
+    def test_import_ambiguous_title(self):
+        """Test a title shared by albums of other artists is rejected."""
+        twin = create_album(title='Album 0')
+        twin.artist.set([create_artist(name='Other Artist')])
+        content = json.dumps({'entries': [{'title': 'Album 0'}]})
+
+        res = self._import(self.list, content)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_invalid_json(self):
+        """Test an unreadable file is rejected."""
+        res = self._import(self.list, '{"entries": [{"album": ')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.list.entries.count(), 3)
+
+    def test_import_into_other_users_list(self):
+        """Test importing into another user's list is not allowed."""
+        other_user = get_user_model().objects.create_user(
+            'user2@example.com',
+            'testpass1234',
+        )
+        other_list = create_list(user=other_user)
+
+        res = self._import(other_list, json.dumps({'entries': []}))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(other_list.entries.count(), 0)
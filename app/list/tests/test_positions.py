@@ -0,0 +1,51 @@
+"""
+Tests for entry position planning.
+"""
+from django.test import SimpleTestCase
+
+from list.positions import GAP, between, plan_positions
+
+
+class BetweenTests(SimpleTestCase):
+    """Test picking a position between two others."""
+
+    def test_between(self):
+        """Test midpoints and open ends."""
+        self.assertEqual(between(None, None), GAP)
+        self.assertEqual(between(None, GAP), 0)
+        self.assertEqual(between(GAP, None), 2 * GAP)
+        self.assertEqual(between(0, 10), 5)
+
+    def test_between_without_gap(self):
+        """Test adjacent positions have no room left."""
+        self.assertIsNone(between(4, 5))
+
+
+class PlanPositionsTests(SimpleTestCase):
+    """Test planning positions for a reordered list."""
+
+    def test_new_list(self):
+        """Test new entries are spread out."""
+        self.assertEqual(plan_positions([None, None]), [GAP, 2 * GAP])
+
+    def test_unchanged_order_keeps_positions(self):
+        """Test entries already in order are left alone."""
+        self.assertEqual(plan_positions([10, 20, 30]), [10, 20, 30])
+
+    def test_only_moved_entry_changes(self):
+        """Test a moved entry is slotted between its new neighbours."""
+        self.assertEqual(plan_positions([10, 30, 20, 40]), [10, 15, 20, 40])
+
+    def test_insertions(self):
+        """Test new entries are slotted around kept ones."""
+        self.assertEqual(
+            plan_positions([None, 10, None, 20, None]),
+            [10 - GAP, 10, 15, 20, 20 + GAP],
+        )
+
+    def test_respread_without_room(self):
+        """Test the whole list is respread when there's no room."""
+        self.assertEqual(
+            plan_positions([1, None, 2]),
+            [GAP, 2 * GAP, 3 * GAP],
+        )
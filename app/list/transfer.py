@@ -0,0 +1,307 @@
+"""
+Streaming export and import of list entries as JSON or CSV.
+
+Exports are generated a chunk of entries at a time, so a list is never
+held in memory whole. Imports are parsed as they are read and inserted a
+batch at a time, resolving the albums of each batch in a few queries.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from rest_framework import serializers
+
+from core.models import Album, Entry
+from list.positions import GAP, last_position
+
+
+CHUNK_SIZE = 1000
+
+CSV_FIELDS = ['album', 'title', 'artists', 'description']
+
+ARTIST_SEPARATOR = '; '
+
+MAX_REPORTED_ERRORS = 20
+
+
+def _artist_names(album_ids):
+    """Return the artist names of albums keyed by album id."""
+    names = {}
+    if album_ids:
+        for album_id, name in Album.artist.through.objects.filter(
+                album_id__in=album_ids).order_by(
+                'artist__name').values_list('album_id', 'artist__name'):
+            names.setdefault(album_id, []).append(name)
+    return names
+
+
+def export_rows(list_obj, chunk_size=CHUNK_SIZE):
+    """Yield the entries of a list in order as plain dicts."""
+    entries = Entry.objects.filter(owner_list=list_obj).order_by(
+        'position', 'id',
+    ).values_list('album_id', 'album__title', 'description').iterator(
+        chunk_size=chunk_size,
+    )
+    while True:
+        chunk = list(islice(entries, chunk_size))
+        if not chunk:
+            return
+        names = _artist_names({row[0] for row in chunk})
+        for album_id, title, description in chunk:
+            yield {
+                'album': album_id,
+                'title': title,
+                'artists': names.get(album_id, []),
+                'description': description,
+            }
+
+
+def stream_json(list_obj, rows):
+    """Yield a JSON document of the list label and its entries."""
+    yield f'{{"label": {json.dumps(list_obj.label)}, "entries": ['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(row)
+        separator = ', '
+    yield ']}'
+
+
+class _Echo:
+    """File-like object handing written values straight back."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    """Yield CSV lines of entries, starting with a header."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for row in rows:
+        yield writer.writerow([
+            row['album'],
+            row['title'],
+            ARTIST_SEPARATOR.join(row['artists']),
+            row['description'],
+        ])
+
+
+class _JSONReader:
+    """Decode a JSON document one value at a time from a text stream."""
+
+    def __init__(self, stream, read_size=64 * 1024):
+        self.stream = stream
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.stream.read(self.read_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self):
+        """Return the next non-space character, or '' at the end."""
+        while True:
+            while (self.pos < len(self.buffer)
+                   and self.buffer[self.pos].isspace()):
+                self.pos += 1
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char):
+        """Consume char, which has to come next."""
+        if self.peek() != char:
+            raise ValueError(f'Expected {char!r} at offset {self.pos}.')
+        self.pos += 1
+
+    def skip(self, char):
+        """Consume char if it comes next."""
+        if self.peek() == char:
+            self.pos += 1
+
+    def value(self):
+        """Decode the next value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # A number cut off by the end of the buffer decodes too early.
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def parse_json(stream):
+    """Yield the entries of an exported JSON document as they're read."""
+    reader = _JSONReader(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+    reader.expect('{')
+    while reader.peek() != '}':
+        key = reader.value()
+        reader.expect(':')
+        if key == 'entries':
+            reader.expect('[')
+            while reader.peek() != ']':
+                yield reader.value()
+                reader.skip(',')
+            reader.expect(']')
+        else:
+            reader.value()
+        reader.skip(',')
+    reader.expect('}')
+
+
+def parse_csv(stream):
+    """Yield the entries of an exported CSV file as they're read."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    for row in csv.DictReader(text):
+        artists = row.get('artists') or ''
+        yield {
+            'album': row.get('album') or None,
+            'title': row.get('title') or '',
+            'artists': [
+                name.strip() for name in artists.split(ARTIST_SEPARATOR)
+                if name.strip()
+            ],
+            'description': row.get('description') or '',
+        }
+
+
+def _clean_row(row):
+    """Return a parsed entry in a known shape, or raise ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError('Entries must be objects.')
+    album = row.get('album')
+    if album in (None, ''):
+        album = None
+    elif isinstance(album, bool) or not isinstance(album, (int, str)):
+        raise ValueError('Album must be an id.')
+    else:
+        try:
+            album = int(album)
+        except ValueError:
+            raise ValueError('Album must be an id.') from None
+    artists = row.get('artists') or []
+    if isinstance(artists, str):
+        artists = [artists]
+    if not isinstance(artists, list):
+        raise ValueError('Artists must be a list of names.')
+    description = row.get('description') or ''
+    if not isinstance(description, str) or len(description) > 4096:
+        raise ValueError('Description must be a string of at most 4096 '
+                         'characters.')
+    return {
+        'album': album,
+        'title': str(row.get('title') or ''),
+        'artists': {str(name).lower() for name in artists},
+        'description': description,
+    }
+
+
+def _resolve_albums(rows):
+    """Return the album id of each row, or an error message.
+
+    Albums are looked up by id first and then by title and artists, with
+    one query for the ids and two for the titles of the whole batch.
+    """
+    ids = {row['album'] for row in rows if row['album'] is not None}
+    found = set(
+        Album.objects.filter(id__in=ids).values_list('id', flat=True)
+    )
+    titles = {
+        row['title'].lower() for row in rows
+        if row['album'] not in found and row['title']
+    }
+    candidates = {}
+    if titles:
+        albums = dict(Album.objects.annotate(
+            lower_title=Lower('title'),
+        ).filter(lower_title__in=titles).values_list('id', 'lower_title'))
+        names = _artist_names(set(albums))
+        for album_id, title in sorted(albums.items()):
+            candidates.setdefault(title, []).append((album_id, {
+                name.lower() for name in names.get(album_id, [])
+            }))
+
+    resolved = []
+    for row in rows:
+        if row['album'] in found:
+            resolved.append(row['album'])
+            continue
+        matches = [
+            album_id for album_id, artists in candidates.get(
+                row['title'].lower(), [],
+            )
+            if not row['artists'] or artists == row['artists']
+        ]
+        if len(matches) == 1:
+            resolved.append(matches[0])
+        elif matches:
+            resolved.append(f'"{row["title"]}" matches several albums.')
+        else:
+            resolved.append(f'No album matches "{row["title"]}".')
+    return resolved
+
+
+@transaction.atomic
+def import_entries(list_obj, rows, batch_size=CHUNK_SIZE):
+    """Append parsed entries to the end of a list.
+
+    Rows are cleaned, resolved and inserted a batch at a time. Nothing is
+    kept if any row can't be read or matched to an album. Returns the
+    number of entries added.
+    """
+    rows = enumerate(rows, start=1)
+    position = last_position(list_obj)
+    errors = []
+    read = 0
+    while len(errors) < MAX_REPORTED_ERRORS:
+        batch = []
+        try:
+            for read, row in islice(rows, batch_size):
+                try:
+                    batch.append((read, _clean_row(row)))
+                except ValueError as exc:
+                    errors.append(f'Entry {read}: {exc}')
+        except (ValueError, csv.Error) as exc:
+            errors.append(f'Entry {read + 1} could not be read: {exc}')
+            break
+        if not batch:
+            break
+        entries = []
+        albums = _resolve_albums([row for _index, row in batch])
+        for (index, row), album in zip(batch, albums):
+            if isinstance(album, str):
+                errors.append(f'Entry {index}: {album}')
+                continue
+            position += GAP
+            entries.append(Entry(
+                owner_list=list_obj,
+                album_id=album,
+                description=row['description'],
+                position=position,
+            ))
+        if not errors:
+            Entry.objects.bulk_create(entries)
+    if errors:
+        raise serializers.ValidationError(
+            {'file': errors[:MAX_REPORTED_ERRORS]}
+        )
+    if read:
+        list_obj.refresh_summary()
+    return read
@@ -14,25 +14,109 @@ from rest_framework import (
 )
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.pagination import CursorPagination
+from rest_framework.parsers import MultiPartParser
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 
+from django.conf import settings
+from django.db.models import Prefetch, Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
 from core.models import (
     Artist,
     Album,
+    Genre,
     List,
     Entry
 )
-from list import serializers
+from list import serializers, transfer
+from user.authentication import CachedTokenAuthentication
+
+
+ALBUM_COLUMNS = [
+    'id',
+    'title',
+    'release_date',
+    'avg_rating',
+    'rating_count',
+    'image',
+    'list_count',
+    'public_list_count',
+]
+
+
+class EntryCursorPagination(CursorPagination):
+    """Cursor pagination over the entries of one list."""
+    ordering = ('position', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
 
 class ListViewSet(viewsets.ModelViewSet):
     serializer_class = serializers.ListSerializer
     queryset = List.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
+
+    def _entries_queryset(self, projection=None):
+        """Return entries with the album data needed to render them.
+
+        Only the columns and relations rendered by EntryDetailSerializer,
+        optionally narrowed by a ``fields=`` projection, are loaded, so
+        rendering takes the same number of queries however many entries
+        there are.
+        """
+        album_fields = set(ALBUM_COLUMNS) | {
+            'artist', 'primary_genres', 'secondary_genres',
+        }
+        if projection:
+            if 'album' not in projection:
+                album_fields = set()
+            elif projection['album'] is not None:
+                album_fields = projection['album']
+        columns = ['id', 'description', 'owner_list']
+        if not album_fields:
+            return Entry.objects.only(*columns).order_by('position', 'id')
+        columns += [
+            f'album__{name}' for name in ALBUM_COLUMNS
+            if name == 'id' or name in album_fields
+        ]
+        entries = Entry.objects.select_related('album').only(*columns)
+        genres = Genre.objects.only('id', 'name')
+        relations = {
+            'artist': Artist.objects.only('id', 'name'),
+            'primary_genres': genres,
+            'secondary_genres': genres,
+        }
+        for name, related in relations.items():
+            if name in album_fields:
+                entries = entries.prefetch_related(
+                    Prefetch(f'album__{name}', queryset=related)
+                )
+        return entries.order_by('position', 'id')
+
+    def _prefetch_entries(self, queryset):
+        """Prefetch the entries rendered on the detail route."""
+        entries = self._entries_queryset()
+        pk = str(self.kwargs.get(self.lookup_field, ''))
+        if pk.isdigit():
+            # Only fetch the capped number of entries the detail renders.
+            entries = entries.filter(id__in=Entry.objects.filter(
+                owner_list_id=pk,
+            ).order_by('position', 'id').values('id')[
+                :settings.LIST_DETAIL_MAX_ENTRIES
+            ])
+        return queryset.prefetch_related(Prefetch('entries', queryset=entries))
 
     def get_queryset(self):
         queryset = self.queryset
         if self.request.method in SAFE_METHODS:
+            if self.action == 'list':
+                queryset = queryset.select_related('user')
+            elif self.action == 'retrieve':
+                queryset = self._prefetch_entries(queryset)
             public = self.request.query_params.get('public')
             if public:
                 return queryset.filter(public=True).order_by('-id')
@@ -44,7 +128,144 @@ class ListViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         """Return the serializer class for request."""
         if self.action == 'list':
-            return serializers.ListDetailSerializer
+            return serializers.ListSummarySerializer
         if self.request.method in SAFE_METHODS:
             return serializers.ListDetailSerializer
-        return self.serializer_class
\ No newline at end of file
+        return self.serializer_class
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'fields',
+                OpenApiTypes.STR,
+                description='Comma separated entry fields to return, '
+                            'e.g. id,description,album.title',
+            ),
+        ]
+    )
+    @action(
+        methods=['GET'],
+        detail=True,
+        url_path='entries',
+        pagination_class=EntryCursorPagination,
+    )
+    def entries(self, request, pk=None):
+        """List the entries of a list with cursor pagination."""
+        list_obj = self.get_object()
+        projection = None
+        fields = request.query_params.get('fields')
+        if fields:
+            projection = serializers.parse_entry_fields(fields)
+        queryset = self._entries_queryset(projection).filter(
+            owner_list=list_obj,
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = serializers.EntryDetailSerializer(
+            page,
+            many=True,
+            projection=projection,
+            context=self.get_serializer_context(),
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        request=serializers.EntryOperationSerializer(many=True),
+    )
+    @action(
+        methods=['POST'],
+        detail=True,
+        url_path='operations',
+        permission_classes=[IsAuthenticated],
+    )
+    def operations(self, request, pk=None):
+        """Add, remove, move or edit entries, singly or as a batch."""
+        list_obj = self.get_object()
+        many = isinstance(request.data, list)
+        serializer = serializers.EntryOperationSerializer(
+            data=request.data,
+            many=many,
+        )
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data if many else [
+            serializer.validated_data
+        ]
+        added = serializers.apply_entry_operations(list_obj, operations)
+        return Response({'added': added}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        request=serializers.ListCloneSerializer,
+        responses=serializers.ListSummarySerializer,
+    )
+    @action(
+        methods=['POST'],
+        detail=True,
+        url_path='clone',
+        permission_classes=[IsAuthenticated],
+    )
+    def clone(self, request, pk=None):
+        """Copy a public or own list into a new list of the user."""
+        source = get_object_or_404(
+            List.objects.filter(Q(public=True) | Q(user=request.user)),
+            pk=pk,
+        )
+        serializer = serializers.ListCloneSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        copy = source.clone(request.user, **serializer.validated_data)
+        return Response(
+            serializers.ListSummarySerializer(
+                copy, context=self.get_serializer_context(),
+            ).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'type',
+                OpenApiTypes.STR,
+                enum=serializers.ListImportSerializer.FORMATS,
+                description='File format, json (default) or csv',
+            ),
+        ],
+        responses={(200, 'application/octet-stream'): OpenApiTypes.BINARY},
+    )
+    @action(methods=['GET'], detail=True, url_path='export')
+    def export(self, request, pk=None):
+        """Stream the entries of a list as a JSON or CSV file."""
+        list_obj = self.get_object()
+        file_type = request.query_params.get('type', 'json')
+        rows = transfer.export_rows(list_obj)
+        if file_type == 'json':
+            content, content_type = (
+                transfer.stream_json(list_obj, rows), 'application/json',
+            )
+        elif file_type == 'csv':
+            content, content_type = transfer.stream_csv(rows), 'text/csv'
+        else:
+            raise ValidationError({'type': 'Must be json or csv.'})
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename="list-{list_obj.id}.{file_type}"'
+        )
+        return response
+
+    @extend_schema(request=serializers.ListImportSerializer)
+    @action(
+        methods=['POST'],
+        detail=True,
+        url_path='import',
+        parser_classes=[MultiPartParser],
+        permission_classes=[IsAuthenticated],
+    )
+    def import_entries(self, request, pk=None):
+        """Append the entries of a JSON or CSV file to a list."""
+        list_obj = self.get_object()
+        serializer = serializers.ListImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        if serializer.validated_data['type'] == 'csv':
+            rows = transfer.parse_csv(upload.file)
+        else:
+            rows = transfer.parse_json(upload.file)
+        added = transfer.import_entries(list_obj, rows)
+        return Response({'added': added}, status=status.HTTP_200_OK)
@@ -0,0 +1,88 @@
+"""
+Buffered recording of search term frequencies.
+
+Searches are counted in memory and written to ``SearchTerm`` in a single
+upsert once enough searches were buffered or enough time has passed, so
+recording a search never costs a database write of its own.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction, DatabaseError
+from django.utils import timezone
+
+from core.models import SearchTerm
+
+
+logger = logging.getLogger(__name__)
+
+
+class TermRecorder:
+    """Count search terms in memory and flush them in batches."""
+
+    def __init__(self, flush_size=100, flush_interval=30):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._counts = Counter()
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, term):
+        """Count one search for a normalized term."""
+        term = term[:255]
+        with self._lock:
+            self._counts[term] += 1
+            self._buffered += 1
+            due = (
+                self._buffered >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered counts to the database in one statement."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._buffered = 0
+            self._last_flush = time.monotonic()
+        if not counts:
+            return
+        table = connection.ops.quote_name(SearchTerm._meta.db_table)
+        now = timezone.now()
+        # In term order, so workers flushing the same terms lock their rows
+        # in the same order and can't deadlock.
+        rows = [(term, counts[term], now) for term in sorted(counts)]
+        values = ', '.join(['(%s, %s, %s)'] * len(rows))
+        sql = (
+            f'INSERT INTO {table} (term, count, last_searched) '
+            f'VALUES {values} '
+            f'ON CONFLICT (term) DO UPDATE SET '
+            f'count = {table}.count + EXCLUDED.count, '
+            f'last_searched = EXCLUDED.last_searched'
+        )
+        params = [value for row in rows for value in row]
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+        except DatabaseError as exc:
+            # Kept for the next flush, which is due once the buffer fills
+            # or the interval passes again.
+            with self._lock:
+                self._counts.update(counts)
+            logger.warning(
+                'Could not flush %d search terms, kept for the next flush: '
+                '%s', len(rows), exc,
+            )
+
+
+term_recorder = TermRecorder(**{
+    key.lower(): value
+    for key, value in getattr(settings, 'SEARCH_ANALYTICS', {}).items()
+})
+atexit.register(term_recorder.flush)
@@ -0,0 +1,264 @@
+"""
+Search backends ranking searchable models by trigram similarity.
+
+The backend is selected with the ``SEARCH_BACKEND`` setting, a dotted path
+to one of the classes below. Every backend returns ``(type, id, score)``
+tuples ordered the same way: by similarity descending, then by type order
+and id.
+"""
+import asyncio
+import copy
+import logging
+import re
+import threading
+from functools import lru_cache
+from operator import itemgetter
+
+import numpy as np
+
+from django.conf import settings
+from django.db import DatabaseError, router
+from django.utils.module_loading import import_string
+
+from core.async_views import run_sync
+from search.cache import search_cache
+from search.results import SEARCH_MODELS, SEARCH_FIELDS
+
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_THRESHOLD = 0.3
+
+_WORD_SPLIT = re.compile(r'[\W_]+')
+
+
+def trigrams(text):
+    """Return the set of trigrams pg_trgm extracts from text.
+
+    Words are runs of alphanumeric characters, lower cased and padded with
+    two spaces in front and one behind.
+    """
+    grams = set()
+    for word in _WORD_SPLIT.split(text.lower()):
+        if word:
+            padded = f'  {word} '
+            grams.update(
+                padded[i:i + 3] for i in range(len(padded) - 2)
+            )
+    return grams
+
+
+class BaseSearchBackend:
+    """Interface implemented by search backends."""
+
+    def rank(self, type_name, term, limit=None):
+        """Return ``(id, score)`` pairs of one type, best first."""
+        raise NotImplementedError(
+            'subclasses of BaseSearchBackend must provide a rank() method'
+        )
+
+    def _merge(self, type_names, rankings):
+        ranked = []
+        for type_name, ranking in zip(type_names, rankings):
+            ranked.extend((type_name, pk, score) for pk, score in ranking)
+        return sorted(ranked, key=itemgetter(2), reverse=True)
+
+    def search(self, term, type_limits):
+        """Rank every requested type and merge them into one list."""
+        return self._merge(type_limits, [
+            self.rank(type_name, term, limit)
+            for type_name, limit in type_limits.items()
+        ])
+
+    def warm(self):
+        """Prepare for the first searches, if the backend needs to."""
+
+    async def asearch(self, term, type_limits):
+        """Rank every requested type concurrently, merged like search()."""
+        rankings = await asyncio.gather(*(
+            run_sync(self.rank, type_name, term, limit)
+            for type_name, limit in type_limits.items()
+        ))
+        return self._merge(type_limits, rankings)
+
+
+class PostgresTrigramBackend(BaseSearchBackend):
+    """Rank in the database with pg_trgm's similarity()."""
+
+    def rank(self, type_name, term, limit=None):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        matches = SEARCH_MODELS[type_name].objects.annotate(
+                similarity=TrigramSimilarity(SEARCH_FIELDS[type_name], term)
+            ).filter(
+                similarity__gt=SIMILARITY_THRESHOLD
+            ).order_by('-similarity', 'id').values_list('id', 'similarity')
+        if limit:
+            matches = matches[:limit]
+        return list(matches)
+
+
+class TrigramIndex:
+    """Inverted trigram index over the names of one model."""
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.ids = np.array([pk for pk, _name in rows], dtype=np.int64)
+        self.alive = np.ones(len(rows), dtype=bool)
+        self.sizes, postings = self._postings(rows, 0)
+        self.postings = {
+            gram: np.array(positions, dtype=np.int32)
+            for gram, positions in postings.items()
+        }
+
+    def _postings(self, rows, start):
+        sizes = np.zeros(len(rows), dtype=np.float32)
+        postings = {}
+        for offset, (_pk, name) in enumerate(rows):
+            grams = trigrams(name)
+            sizes[offset] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(start + offset)
+        return sizes, postings
+
+    @property
+    def dead(self):
+        """Return how many entries were replaced or removed."""
+        return len(self.alive) - int(np.count_nonzero(self.alive))
+
+    def patched(self, ids, rows):
+        """Return a copy with the entries of ids replaced by rows.
+
+        Old entries are only marked dead, so the copy shares every posting
+        list no new row adds to.
+        """
+        rows = sorted(rows)
+        index = copy.copy(self)
+        removed = np.isin(self.ids, np.fromiter(ids, dtype=np.int64))
+        sizes, postings = self._postings(rows, len(self.ids))
+        index.ids = np.concatenate([
+            self.ids, np.array([pk for pk, _name in rows], dtype=np.int64),
+        ])
+        index.alive = np.concatenate([
+            self.alive & ~removed, np.ones(len(rows), dtype=bool),
+        ])
+        index.sizes = np.concatenate([self.sizes, sizes])
+        index.postings = dict(self.postings)
+        for gram, positions in postings.items():
+            added = np.array(positions, dtype=np.int32)
+            if gram in index.postings:
+                added = np.concatenate([index.postings[gram], added])
+            index.postings[gram] = added
+        return index
+
+    def rank(self, term, limit=None):
+        """Return ``(id, score)`` pairs matching term, best first."""
+        grams = trigrams(term)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return []
+        # Counted over the hits only, not the whole index.
+        candidates, shared = np.unique(
+            np.concatenate(hits), return_counts=True,
+        )
+        alive = self.alive[candidates]
+        candidates = candidates[alive]
+        common = shared[alive].astype(np.float32)
+        # pg_trgm computes similarity in single precision.
+        size = np.float32(len(grams))
+        scores = common / (size + self.sizes[candidates] - common)
+        keep = scores.astype(np.float64) > SIMILARITY_THRESHOLD
+        candidates, scores = candidates[keep], scores[keep]
+        order = np.lexsort((self.ids[candidates], -scores))[:limit]
+        # Round trip through the shortest repr, as the database driver does.
+        return [
+            (int(pk), float(str(score)))
+            for pk, score in zip(self.ids[candidates[order]], scores[order])
+        ]
+
+
+class InMemoryTrigramBackend(BaseSearchBackend):
+    """Rank with NumPy over per-process inverted trigram indexes.
+
+    Each type is indexed once, by warm() at startup or else on first use.
+    Afterwards only the objects the search cache logged as changed are
+    loaded again and patched into the index of their type. A type is
+    indexed again entirely when the log doesn't reach back to its index,
+    or when half of the index was replaced.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def _queryset(self, type_name):
+        model = SEARCH_MODELS[type_name]
+        # From the primary, so replication lag can't outdate the index.
+        return model._default_manager.db_manager(
+            router.db_for_write(model),
+        ).values_list('id', SEARCH_FIELDS[type_name])
+
+    def _build(self, type_name):
+        generation = search_cache.generation(type_name)
+        return generation, TrigramIndex(self._queryset(type_name))
+
+    def _update(self, type_name, built):
+        generation, changed = search_cache.changes(type_name, built[0])
+        if changed is None:
+            return self._build(type_name)
+        index = built[1]
+        if changed:
+            index = index.patched(
+                changed, self._queryset(type_name).filter(id__in=changed),
+            )
+            if index.dead * 2 > len(index.ids):
+                return self._build(type_name)
+        return generation, index
+
+    def get_index(self, type_name):
+        """Return an up to date index for a result type."""
+        built = self._indexes.get(type_name)
+        if built is not None and \
+                built[0] == search_cache.generation(type_name):
+            return built[1]
+        with self._lock:
+            built = self._indexes.get(type_name)
+            if built is None:
+                built = self._build(type_name)
+            else:
+                built = self._update(type_name, built)
+            self._indexes[type_name] = built
+        return built[1]
+
+    def warm(self):
+        """Index every type."""
+        for type_name in SEARCH_MODELS:
+            self.get_index(type_name)
+
+    def rank(self, type_name, term, limit=None):
+        return self.get_index(type_name).rank(term, limit)
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path):
+    return import_string(path)()
+
+
+def get_backend():
+    """Return the configured search backend instance."""
+    return _load_backend(getattr(
+        settings,
+        'SEARCH_BACKEND',
+        'search.backends.PostgresTrigramBackend',
+    ))
+
+
+def warm_backend():
+    """Prepare the configured backend before taking requests.
+
+    A database that can't be reached is left to be read on first use.
+    """
+    try:
+        get_backend().warm()
+    except DatabaseError as exc:
+        logger.warning('Could not warm the search backend: %s', exc)
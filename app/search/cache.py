@@ -0,0 +1,179 @@
+"""
+Two tier cache for ranked search results.
+
+Results are cached as a list of ``(type, id, score)`` tuples keyed on the
+normalized search term. A small in-process LRU answers repeated terms
+without leaving the worker, and the shared Django cache lets workers reuse
+each other's results. Every key embeds a generation number which is bumped
+whenever a searchable name changes, so stale rankings are never served from
+the shared tier.
+
+Each result type also has a generation of its own, and the ids changed at
+every one of its generations are logged for a while. In-memory indexes
+use the log to update just the objects that changed.
+"""
+import hashlib
+import time
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core import metrics
+from core.cache import LRUCache
+from search.results import SEARCH_FIELDS
+
+
+GENERATION_KEY = 'search:generation'
+
+
+def _generation_key(type_name):
+    if type_name is None:
+        return GENERATION_KEY
+    return f'{GENERATION_KEY}:{type_name}'
+
+
+def _changes_key(type_name, generation):
+    return f'search:changes:{type_name}:{generation}'
+
+
+def normalize_term(term):
+    """Fold case, accents and whitespace so equivalent terms share a key."""
+    decomposed = unicodedata.normalize('NFKD', term)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def search_variant(type_limits):
+    """Return the cache variant for searches of the given types and limits."""
+    return ','.join(
+        f'{type_name}:{limit or ""}'
+        for type_name, limit in type_limits.items()
+    )
+
+
+class SearchCache:
+    """Cache ranked search results per normalized term."""
+
+    def __init__(self, alias='default', timeout=300, local_maxsize=1024,
+                 local_timeout=30, changes_timeout=3600, max_changes=100):
+        self.alias = alias
+        self.timeout = timeout
+        self.changes_timeout = changes_timeout
+        self.max_changes = max_changes
+        self.local = LRUCache(maxsize=local_maxsize, timeout=local_timeout)
+        self.shared_hits = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def generation(self, type_name=None):
+        """Return the current generation, seeding it if it was evicted.
+
+        Without a type_name this is the generation of cached results.
+        """
+        key = _generation_key(type_name)
+        generation = self.shared.get(key)
+        if generation is None:
+            # Seed from the clock so a lost counter never revives old keys.
+            self.shared.add(key, time.time_ns(), timeout=None)
+            generation = self.shared.get(key)
+        return generation
+
+    def _bump(self, type_name=None):
+        try:
+            return self.shared.incr(_generation_key(type_name))
+        except ValueError:
+            return self.generation(type_name)
+
+    def changes(self, type_name, since):
+        """Return the generation of a type and the ids changed after since.
+
+        The ids are None when the log doesn't reach back to since, after
+        a full invalidation, too many changes or an eviction.
+        """
+        generation = self.generation(type_name)
+        if generation == since:
+            return generation, set()
+        if not 0 < generation - since <= self.max_changes:
+            return generation, None
+        keys = [
+            _changes_key(type_name, number)
+            for number in range(since + 1, generation + 1)
+        ]
+        logged = self.shared.get_many(keys)
+        if len(logged) < len(keys):
+            return generation, None
+        return generation, set().union(*logged.values())
+
+    def _key(self, term, variant, generation):
+        raw = f'{term}\0{variant}'.encode('utf-8')
+        return f'search:{generation}:{hashlib.sha1(raw).hexdigest()}'
+
+    def get(self, term, variant=''):
+        """Return cached results for a normalized term or None.
+
+        ``variant`` distinguishes differently shaped searches for the same
+        term, such as searches restricted to some result types.
+        """
+        results = self.local.get((term, variant))
+        if results is not None:
+            return results
+        results = self.shared.get(
+            self._key(term, variant, self.generation())
+        )
+        if results is not None:
+            self.shared_hits += 1
+            self.local.set((term, variant), results)
+        return results
+
+    def set(self, term, results, variant=''):
+        """Store results for a normalized term in both tiers."""
+        self.shared.set(
+            self._key(term, variant, self.generation()),
+            results,
+            timeout=self.timeout,
+        )
+        self.local.set((term, variant), results)
+
+    def get_or_compute(self, term, compute, variant=''):
+        """Return cached results for term, computing them on a miss."""
+        results = self.get(term, variant)
+        if results is None:
+            results = compute(term)
+            self.set(term, results, variant)
+        return results
+
+    def invalidate(self, type_name=None, ids=()):
+        """Drop every cached ranking.
+
+        With a type_name, the ids of the objects of that type which
+        changed are logged. Without one, every type is treated as changed
+        entirely.
+        """
+        self._bump()
+        if type_name is None:
+            self.shared.delete_many([
+                _generation_key(type_name) for type_name in SEARCH_FIELDS
+            ])
+        else:
+            self.shared.set(
+                _changes_key(type_name, self._bump(type_name)),
+                list(ids),
+                timeout=self.changes_timeout,
+            )
+        self.local.clear()
+
+
+search_cache = SearchCache(**{
+    key.lower(): value
+    for key, value in getattr(settings, 'SEARCH_CACHE', {}).items()
+})
+
+
+@metrics.registry.collector
+def _collect_search_cache():
+    metrics.record_cache(
+        'search', search_cache.local, search_cache.shared_hits,
+    )
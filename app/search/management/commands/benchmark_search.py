@@ -0,0 +1,101 @@
+"""
+Django command to compare the latency of the search backends.
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.backends import PostgresTrigramBackend, InMemoryTrigramBackend
+from search.results import SEARCH_MODELS, SEARCH_FIELDS
+
+
+BACKENDS = [
+    ('postgres', PostgresTrigramBackend),
+    ('memory', InMemoryTrigramBackend),
+]
+
+
+class Command(BaseCommand):
+    """Django command to benchmark search backends."""
+
+    help = 'Time every search backend against the same set of terms.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'terms',
+            nargs='*',
+            help='Terms to search for. Sampled from the catalog if omitted.',
+        )
+        parser.add_argument('--sample', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def _sample_terms(self, count, seed):
+        """Pick catalog names and drop a character to mimic typos."""
+        rng = random.Random(seed)
+        names = []
+        for type_name, model in SEARCH_MODELS.items():
+            names.extend(
+                model.objects.values_list(SEARCH_FIELDS[type_name], flat=True)
+            )
+        terms = []
+        for name in rng.sample(names, min(count, len(names))):
+            if len(name) > 3:
+                cut = rng.randrange(len(name))
+                name = name[:cut] + name[cut + 1:]
+            terms.append(name)
+        return terms
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        terms = options['terms'] or self._sample_terms(
+            options['sample'], options['seed'],
+        )
+        if not terms:
+            self.stdout.write('Nothing to search for.')
+            return
+        type_limits = {
+            type_name: options['limit'] for type_name in SEARCH_MODELS
+        }
+
+        rankings = {}
+        for name, backend_class in BACKENDS:
+            backend = backend_class()
+            start = time.perf_counter()
+            backend.search(terms[0], type_limits)
+            warmup = time.perf_counter() - start
+
+            timings = []
+            for _ in range(options['repeat']):
+                for term in terms:
+                    start = time.perf_counter()
+                    backend.search(term, type_limits)
+                    timings.append(time.perf_counter() - start)
+            rankings[name] = [
+                [
+                    (type_name, pk) for type_name, pk, _score
+                    in backend.search(term, type_limits)
+                ]
+                for term in terms
+            ]
+
+            timings.sort()
+            self.stdout.write(
+                f'{name:>8}: warmup {warmup * 1000:.1f}ms, '
+                f'mean {statistics.mean(timings) * 1000:.3f}ms, '
+                f'p95 {timings[int(len(timings) * 0.95)] * 1000:.3f}ms '
+                f'over {len(timings)} searches'
+            )
+
+        agreeing = sum(
+            postgres == memory
+            for postgres, memory in zip(
+                rankings['postgres'], rankings['memory'],
+            )
+        )
+        self.stdout.write(
+            f'Identical rankings for {agreeing} of {len(terms)} terms.'
+        )
@@ -0,0 +1,34 @@
+"""
+Django command to build the search spelling dictionary.
+"""
+from django.core.management.base import BaseCommand
+
+from core.models import Artist, Album, Genre
+from search.spelling import build_dictionary, dictionary_path, save_dictionary
+
+
+class Command(BaseCommand):
+    """Django command to build the spelling dictionary from the catalog."""
+
+    help = 'Precompute "did you mean" corrections from catalog names.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-distance', type=int, default=2)
+        parser.add_argument('--output', default=None)
+
+    def _names(self):
+        yield from Artist.objects.values_list('name', flat=True).iterator()
+        yield from Album.objects.values_list('title', flat=True).iterator()
+        yield from Genre.objects.values_list('name', flat=True).iterator()
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        dictionary = build_dictionary(
+            self._names(),
+            max_distance=options['max_distance'],
+        )
+        path = options['output'] or dictionary_path()
+        save_dictionary(dictionary, path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(dictionary.words)} words to {path}.'
+        ))
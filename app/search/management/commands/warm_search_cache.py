@@ -0,0 +1,46 @@
+"""
+Django command to pre-compute results for the most popular searches.
+"""
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.models import SearchTerm
+from search.analytics import term_recorder
+from search.backends import get_backend
+from search.cache import search_cache, search_variant
+from search.results import SEARCH_MODELS
+
+
+class Command(BaseCommand):
+    """Django command to warm the search cache.
+
+    Run it after deploys and catalog imports so the most common searches
+    don't all miss a cold cache at once. Results reach the web workers
+    through the shared cache, so it needs CACHES to be shared, as it is
+    with REDIS_URL set.
+    """
+
+    help = 'Cache search results for the most searched terms.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=500)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if isinstance(search_cache.shared, LocMemCache):
+            self.stderr.write(self.style.WARNING(
+                'The search cache is local to this process, so no web '
+                'worker will see the warmed results. Set REDIS_URL.'
+            ))
+        term_recorder.flush()
+        type_limits = {type_name: None for type_name in SEARCH_MODELS}
+        variant = search_variant(type_limits)
+        backend = get_backend()
+        terms = SearchTerm.objects.order_by('-count').values_list(
+            'term', flat=True,
+        )[:options['top']]
+        warmed = 0
+        for term in terms:
+            search_cache.set(term, backend.search(term, type_limits), variant)
+            warmed += 1
+        self.stdout.write(self.style.SUCCESS(f'Warmed {warmed} search terms.'))
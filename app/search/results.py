@@ -0,0 +1,86 @@
+"""
+Lazy hydration of ranked search results.
+"""
+import asyncio
+
+from core.async_views import run_sync
+from core.models import Artist, Album, List, Genre
+
+
+SEARCH_MODELS = {
+    'artist': Artist,
+    'album': Album,
+    'list': List,
+    'genre': Genre,
+}
+
+SEARCH_FIELDS = {
+    'artist': 'name',
+    'album': 'title',
+    'list': 'label',
+    'genre': 'name',
+}
+
+
+def _hydration_queryset(type_name):
+    """Return the queryset used to load objects of a result type."""
+    model = SEARCH_MODELS[type_name]
+    if model is Album:
+        return model.objects.prefetch_related('primary_genres')
+    if model is List:
+        return model.objects.select_related('user')
+    return model.objects.all()
+
+
+class SearchResults:
+    """Sequence of ranked ``(type, id, score)`` refs loaded on slicing.
+
+    Only the objects on the requested page are fetched from the database,
+    with one query per result type present on that page.
+    """
+
+    def __init__(self, refs):
+        self.refs = refs
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._hydrate(self.refs[index])
+        return self._hydrate([self.refs[index]])[0]
+
+    def _ids_by_type(self, refs):
+        ids_by_type = {}
+        for type_name, pk, _score in refs:
+            ids_by_type.setdefault(type_name, []).append(pk)
+        return ids_by_type
+
+    def _hydrate(self, refs):
+        objects = {
+            type_name: _hydration_queryset(type_name).in_bulk(ids)
+            for type_name, ids in self._ids_by_type(refs).items()
+        }
+        return self._attach(refs, objects)
+
+    async def aslice(self, start, stop):
+        """Return the objects of a slice, loading each type concurrently."""
+        refs = self.refs[start:stop]
+        ids_by_type = self._ids_by_type(refs)
+        loaded = await asyncio.gather(*(
+            run_sync(_hydration_queryset(type_name).in_bulk, ids)
+            for type_name, ids in ids_by_type.items()
+        ))
+        return self._attach(refs, dict(zip(ids_by_type, loaded)))
+
+    def _attach(self, refs, objects):
+        results = []
+        for type_name, pk, score in refs:
+            obj = objects[type_name].get(pk)
+            if obj is not None:
+                obj.similarity = score
+                results.append(obj)
+        return results
@@ -0,0 +1,49 @@
+"""
+Signal handlers keeping cached search results fresh.
+"""
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from search.cache import search_cache
+from search.results import SEARCH_MODELS, SEARCH_FIELDS
+
+
+SEARCHABLE_FIELDS = {
+    SEARCH_MODELS[type_name]: field
+    for type_name, field in SEARCH_FIELDS.items()
+}
+
+SEARCH_TYPES = {model: type_name for type_name, model in SEARCH_MODELS.items()}
+
+
+@receiver(pre_save)
+def note_name_change(sender, instance, update_fields, using, **kwargs):
+    """Note whether a save changes the searchable name of an object."""
+    field = SEARCHABLE_FIELDS.get(sender)
+    if field is None:
+        return
+    if instance._state.adding:
+        instance._search_name_changed = True
+    elif update_fields is not None and field not in update_fields:
+        instance._search_name_changed = False
+    else:
+        stored = sender._base_manager.using(using).filter(
+            pk=instance.pk,
+        ).values_list(field, flat=True).first()
+        instance._search_name_changed = stored != getattr(instance, field)
+
+
+@receiver(post_save)
+def invalidate_on_save(sender, instance, **kwargs):
+    """Invalidate cached results when a searchable name is new or changed."""
+    if sender not in SEARCHABLE_FIELDS:
+        return
+    if instance.__dict__.pop('_search_name_changed', True):
+        search_cache.invalidate(SEARCH_TYPES[sender], [instance.pk])
+
+
+@receiver(post_delete)
+def invalidate_on_delete(sender, instance, **kwargs):
+    """Invalidate cached results when a searchable object is removed."""
+    if sender in SEARCHABLE_FIELDS:
+        search_cache.invalidate(SEARCH_TYPES[sender], [instance.pk])
@@ -0,0 +1,195 @@
+"""
+Symmetric delete spelling correction for search terms.
+
+Every dictionary word is indexed under all strings obtained by deleting up
+to ``max_distance`` characters from its prefix. A lookup generates the
+deletes of the misspelled term the same way, so candidates are found with a
+handful of dictionary lookups and only those are checked with a real edit
+distance.
+"""
+import json
+import os
+import threading
+from itertools import combinations
+
+from django.conf import settings
+
+from search.cache import normalize_term
+
+
+def edit_distance(source, target, max_distance):
+    """Return the optimal string alignment distance, or None if too far.
+
+    Adjacent transpositions count as a single edit.
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return None
+    previous2 = None
+    previous = list(range(len(target) + 1))
+    for i in range(1, len(source) + 1):
+        current = [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = source[i - 1] != target[j - 1]
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + cost,
+            )
+            if (i > 1 and j > 1 and source[i - 1] == target[j - 2]
+                    and source[i - 2] == target[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return None
+        previous2, previous = previous, current
+    distance = previous[-1]
+    return distance if distance <= max_distance else None
+
+
+class SymSpell:
+    """Dictionary of known terms with symmetric delete lookups."""
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.words = {}
+        self.deletes = {}
+
+    def _deletes(self, word):
+        """Return every string reachable by deleting from word's prefix."""
+        prefix = word[:self.prefix_length]
+        found = {prefix}
+        for count in range(1, min(self.max_distance, len(prefix)) + 1):
+            for positions in combinations(range(len(prefix)), count):
+                found.add(''.join(
+                    char for i, char in enumerate(prefix)
+                    if i not in positions
+                ))
+        return found
+
+    def add(self, word, count=1):
+        """Add a word to the dictionary, accumulating its frequency."""
+        if word in self.words:
+            self.words[word] += count
+            return
+        self.words[word] = count
+        for delete in self._deletes(word):
+            self.deletes.setdefault(delete, []).append(word)
+
+    def lookup(self, term, max_distance=None, limit=5):
+        """Return ``(word, distance, count)`` suggestions for term.
+
+        Suggestions are ordered by distance, then by frequency.
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        max_distance = min(max_distance, self.max_distance)
+        seen = set()
+        suggestions = []
+        for delete in self._deletes(term):
+            for word in self.deletes.get(delete, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                distance = edit_distance(term, word, max_distance)
+                if distance is not None:
+                    suggestions.append((word, distance, self.words[word]))
+        suggestions.sort(key=lambda item: (item[1], -item[2], item[0]))
+        return suggestions[:limit]
+
+    def to_dict(self):
+        return {
+            'max_distance': self.max_distance,
+            'prefix_length': self.prefix_length,
+            'words': self.words,
+            'deletes': self.deletes,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        dictionary = cls(data['max_distance'], data['prefix_length'])
+        dictionary.words = data['words']
+        dictionary.deletes = data['deletes']
+        return dictionary
+
+
+def build_dictionary(names, max_distance=2):
+    """Build a dictionary of whole names and the words inside them."""
+    dictionary = SymSpell(max_distance=max_distance)
+    for name in names:
+        name = normalize_term(name)
+        if not name:
+            continue
+        dictionary.add(name)
+        words = name.split()
+        if len(words) > 1:
+            for word in words:
+                dictionary.add(word)
+    return dictionary
+
+
+def dictionary_path():
+    return getattr(
+        settings,
+        'SEARCH_SPELLING_DICTIONARY',
+        os.path.join(settings.BASE_DIR, 'search_spelling.json'),
+    )
+
+
+def save_dictionary(dictionary, path=None):
+    """Write a dictionary to disk atomically."""
+    path = path or dictionary_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(dictionary.to_dict(), f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def get_dictionary():
+    """Return the dictionary on disk, loading it on first use.
+
+    The file is reloaded when its modification time changes, so rebuilding
+    it with the management command reaches running workers.
+    """
+    path = dictionary_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    loaded = _loaded.get(path)
+    if loaded is None or loaded[0] != mtime:
+        with _load_lock:
+            loaded = _loaded.get(path)
+            if loaded is None or loaded[0] != mtime:
+                with open(path, encoding='utf-8') as f:
+                    dictionary = SymSpell.from_dict(json.load(f))
+                loaded = (mtime, dictionary)
+                _loaded[path] = loaded
+    return loaded[1]
+
+
+def suggest(term, limit=5):
+    """Return corrected search terms for a normalized term.
+
+    Whole catalog names close to the term are preferred. Otherwise each
+    word is corrected on its own and the corrected phrase is suggested.
+    """
+    dictionary = get_dictionary()
+    if dictionary is None or not term:
+        return []
+    suggestions = [
+        word for word, distance, _count in dictionary.lookup(term, limit=limit)
+        if distance > 0
+    ]
+    if suggestions or ' ' not in term:
+        return suggestions
+    corrected = []
+    for word in term.split():
+        matches = dictionary.lookup(word, limit=1)
+        corrected.append(matches[0][0] if matches else word)
+    phrase = ' '.join(corrected)
+    return [phrase] if phrase != term else []
@@ -0,0 +1,145 @@
+"""
+Tests for search analytics and cache warming.
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Artist, SearchTerm
+
+from search.analytics import TermRecorder, term_recorder
+from search.cache import search_cache, search_variant
+from search.results import SEARCH_MODELS
+
+
+SEARCH_URL = reverse('search:search')
+
+
+class TermRecorderTests(TestCase):
+    """Test buffered term recording."""
+
+    def test_record_is_buffered(self):
+        """Test terms are not written before the buffer fills."""
+        recorder = TermRecorder(flush_size=3)
+
+        with self.assertNumQueries(0):
+            recorder.record('radiohead')
+            recorder.record('radiohead')
+
+        self.assertFalse(SearchTerm.objects.exists())
+
+    def test_flush_writes_batch_in_one_query(self):
+        """Test a full buffer is written with a single statement."""
+        recorder = TermRecorder(flush_size=3)
+        recorder.record('radiohead')
+        recorder.record('radiohead')
+
+        with CaptureQueriesContext(connection) as queries:
+            recorder.record('portishead')
+
+        inserts = [q for q in queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+
+        counts = dict(SearchTerm.objects.values_list('term', 'count'))
+        self.assertEqual(counts, {'radiohead': 2, 'portishead': 1})
+
+    def test_flush_accumulates_counts(self):
+        """Test flushed counts are added to existing terms."""
+        recorder = TermRecorder()
+        recorder.record('radiohead')
+        recorder.flush()
+        recorder.record('radiohead')
+        recorder.flush()
+
+        self.assertEqual(SearchTerm.objects.get(term='radiohead').count, 2)
+
+    def test_flush_sorts_terms(self):
+        """Test terms are written in order, whatever order they came in."""
+        recorder = TermRecorder()
+        for term in ['portishead', 'air', 'radiohead']:
+            recorder.record(term)
+
+        with CaptureQueriesContext(connection) as queries:
+            recorder.flush()
+
+        sql, = [q['sql'] for q in queries if q['sql'].startswith('INSERT')]
+        self.assertLess(sql.index("'air'"), sql.index("'portishead'"))
+        self.assertLess(sql.index("'portishead'"), sql.index("'radiohead'"))
+
+    def test_failed_flush_keeps_counts(self):
+        """Test counts of a failed flush are written by the next one."""
+        recorder = TermRecorder()
+        recorder.record('radiohead')
+
+        with patch('search.analytics.connection.cursor',
+                   side_effect=DatabaseError('deadlock detected')), \
+                self.assertLogs('search.analytics', 'WARNING'):
+            recorder.flush()
+        recorder.record('radiohead')
+        recorder.flush()
+
+        self.assertEqual(SearchTerm.objects.get(term='radiohead').count, 2)
+
+    @patch('search.analytics.time.monotonic')
+    def test_flush_after_interval(self, patched_monotonic):
+        """Test buffered terms are flushed once the interval passed."""
+        patched_monotonic.return_value = 0
+        recorder = TermRecorder(flush_size=100, flush_interval=30)
+        recorder.record('radiohead')
+
+        patched_monotonic.return_value = 31
+        recorder.record('radiohead')
+
+        self.assertEqual(SearchTerm.objects.get(term='radiohead').count, 2)
+
+    def test_search_records_normalized_term(self):
+        """Test searching records the normalized term."""
+        term_recorder.flush()
+
+        APIClient().get(SEARCH_URL, {'term': ' RadioHead '})
+        term_recorder.flush()
+
+        self.assertEqual(SearchTerm.objects.get().term, 'radiohead')
+
+
+class WarmSearchCacheTests(TestCase):
+    """Test the warm_search_cache command."""
+
+    def setUp(self):
+        search_cache.invalidate()
+
+    def test_warm_top_terms(self):
+        """Test results for the top terms are cached."""
+        artist = Artist.objects.create(name='radiohead')
+        SearchTerm.objects.create(
+            term='radiohead', count=10, last_searched='2024-01-01',
+        )
+        SearchTerm.objects.create(
+            term='portishead', count=1, last_searched='2024-01-01',
+        )
+        variant = search_variant({t: None for t in SEARCH_MODELS})
+
+        call_command('warm_search_cache', '--top', '1', stdout=StringIO(),
+                     stderr=StringIO())
+
+        cached = search_cache.get('radiohead', variant)
+        self.assertEqual([ref[:2] for ref in cached], [('artist', artist.id)])
+        self.assertIsNone(search_cache.get('portishead', variant))
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_warns_about_local_cache(self):
+        """Test warming a cache other workers can't read is reported."""
+        err = StringIO()
+
+        call_command('warm_search_cache', stdout=StringIO(), stderr=err)
+
+        self.assertIn('Set REDIS_URL', err.getvalue())
@@ -1,6 +1,8 @@
 """
 Tests for artist APIs.
 """
+from unittest.mock import patch
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
@@ -8,9 +10,11 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Artist
+from core.models import Artist, Genre
 
 from search.serializers import SearchSerializer
+from search.cache import search_cache
+from search.analytics import term_recorder
 
 
 
@@ -29,11 +33,24 @@ def create_artist(**params):
     artist = Artist.objects.create(**defaults)
     return artist
 
+def create_genre(**params):
+    """Create and return a sample genre"""
+    defaults = {
+        'name': 'Sample Genre Name',
+    }
+    defaults.update(params)
+
+    genre = Genre.objects.create(**defaults)
+    return genre
+
+
 class PublicArtistAPITests(TestCase):
     """Test unauthenticated API requests."""
 
     def setUp(self):
         self.client = APIClient()
+        search_cache.invalidate()
+        term_recorder.flush()
 
     def test_search(self):
         """Test search returns artist with matching name."""
@@ -75,3 +92,86 @@ class PublicArtistAPITests(TestCase):
 
 
 
+
+
+    def test_search_normalizes_term(self):
+        """Test terms differing in case, accents and spacing match alike."""
+        art1 = create_artist(name='abcde 123')
+
+        res = self.client.get(SEARCH_URL, {'term': '  ÀBCD   123 '})
+
+        serial_res = SearchSerializer(art1)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [serial_res.data])
+
+    def test_search_results_refresh_after_rename(self):
+        """Test cached results are invalidated when a name changes."""
+        art1 = create_artist(name='abcde 123')
+        res = self.client.get(SEARCH_URL, {'term': 'abcd 123'})
+        self.assertEqual(len(res.data['results']), 1)
+
+        art1.name = 'zyx'
+        art1.save()
+        res = self.client.get(SEARCH_URL, {'term': 'abcd 123'})
+
+        self.assertEqual(len(res.data['results']), 0)
+
+    def test_search_results_kept_when_name_unchanged(self):
+        """Test saves leaving searchable names alone keep cached results."""
+        art1 = create_artist(name='abcde 123')
+
+        with patch.object(search_cache, 'invalidate') as invalidate:
+            art1.origin_country = 'GBR'
+            art1.save()
+            art1.save(update_fields=['start_year'])
+
+        invalidate.assert_not_called()
+
+    def test_search_filter_by_type(self):
+        """Test only requested result types are returned."""
+        create_artist(name='abcde 123')
+        genre = create_genre(name='abcde 123')
+
+        res = self.client.get(SEARCH_URL, {'term': 'abcd 123', 'types': 'genre'})
+
+        serial_res = SearchSerializer(genre)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [serial_res.data])
+
+    def test_search_skips_unrequested_types(self):
+        """Test unrequested models are never queried."""
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                SEARCH_URL,
+                {'term': 'abcd 123', 'types': 'genre'},
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_search_per_type_limit(self):
+        """Test per type limits keep the best matches of each type."""
+        art1 = create_artist(name='abcde 123')
+        create_artist(name='bcd 123')
+        genre1 = create_genre(name='abcd 123')
+        genre2 = create_genre(name='abcd 12')
+
+        res = self.client.get(
+            SEARCH_URL,
+            {'term': 'abcd 123', 'limit': 2, 'artist_limit': 1},
+        )
+
+        serial_res = SearchSerializer([genre1, art1, genre2], many=True)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], serial_res.data)
+
+    def test_search_invalid_type(self):
+        """Test unknown result types are rejected."""
+        res = self.client.get(SEARCH_URL, {'term': 'abcd', 'types': 'song'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_invalid_limit(self):
+        """Test limits must be positive integers."""
+        res = self.client.get(SEARCH_URL, {'term': 'abcd', 'limit': '-1'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
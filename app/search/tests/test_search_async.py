@@ -0,0 +1,74 @@
+"""
+Tests for the async search view.
+"""
+import json
+
+from asgiref.sync import async_to_sync
+
+from django.test import AsyncRequestFactory, TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from album.tests.test_album_api import create_album
+from core.models import Artist, Genre
+
+from search.analytics import term_recorder
+from search.cache import search_cache
+from search.views import search_async
+
+
+SEARCH_URL = reverse('search:search')
+
+
+class AsyncSearchTests(TransactionTestCase):
+    """Test searching through the ASGI application.
+
+    Queries run on worker threads with connections of their own, so data
+    has to be committed for them to see it.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.factory = AsyncRequestFactory()
+        search_cache.invalidate()
+        term_recorder.flush()
+        Artist.objects.create(name='abcde 123', start_year=2000)
+        Artist.objects.create(name='bcd 123', start_year=2000)
+        Genre.objects.create(name='abcd rock')
+        create_album(title='abcd 123', image='uploads/album/abcd.jpg')
+
+    def _search(self, params):
+        request = self.factory.get(SEARCH_URL, params)
+        return async_to_sync(search_async)(request)
+
+    def test_matches_sync_search(self):
+        """Test async results equal the sync view's results."""
+        for params in [
+            {'term': 'abcd 123'},
+            {'term': 'abcd 123', 'types': 'artist,genre'},
+            {'term': 'abcd 123', 'limit': 1},
+            {'term': 'zzzz'},
+            {},
+        ]:
+            expected = self.client.get(SEARCH_URL, params)
+            search_cache.invalidate()
+
+            res = self._search(params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(json.loads(res.content), expected.json())
+
+    def test_unknown_type(self):
+        """Test unknown result types are rejected."""
+        res = self._search({'term': 'abcd', 'types': 'song'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('types', json.loads(res.content))
+
+    def test_page_out_of_range(self):
+        """Test pages past the last one are not found."""
+        res = self._search({'term': 'abcd 123', 'page': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,133 @@
+"""
+Tests for the search backends.
+"""
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Artist, Genre
+
+from search.backends import (
+    trigrams,
+    PostgresTrigramBackend,
+    InMemoryTrigramBackend,
+    TrigramIndex,
+)
+from search.cache import search_cache
+from search.results import SEARCH_MODELS
+from search.serializers import SearchSerializer
+
+
+SEARCH_URL = reverse('search:search')
+
+MEMORY_BACKEND = 'search.backends.InMemoryTrigramBackend'
+
+
+class TrigramTests(SimpleTestCase):
+    """Test trigram extraction."""
+
+    def test_trigrams_match_pg_trgm(self):
+        """Test words are padded and split like pg_trgm's show_trgm()."""
+        self.assertEqual(
+            trigrams('Cat, Dog'),
+            {'  c', ' ca', 'cat', 'at ', '  d', ' do', 'dog', 'og '},
+        )
+
+    def test_trigrams_empty(self):
+        """Test text without words has no trigrams."""
+        self.assertEqual(trigrams(' -- '), set())
+
+    def test_patched_index(self):
+        """Test patching replaces entries and leaves the original alone."""
+        index = TrigramIndex([(1, 'abcd'), (2, 'wxyz')])
+
+        patched = index.patched({1, 3}, [(1, 'wxyz'), (3, 'abcde')])
+
+        self.assertEqual([pk for pk, _ in patched.rank('wxyz')], [1, 2])
+        self.assertEqual([pk for pk, _ in patched.rank('abcd')], [3])
+        self.assertEqual(patched.dead, 1)
+        self.assertEqual([pk for pk, _ in index.rank('abcd')], [1])
+
+
+class BackendTests(TestCase):
+    """Test backends rank results alike."""
+
+    def setUp(self):
+        search_cache.invalidate()
+        for name in ['abcde 123', 'bcd 123', 'zyx 123', 'abcd 12', 'ab']:
+            Artist.objects.create(name=name)
+            Genre.objects.create(name=name.upper())
+
+    def test_memory_backend_matches_postgres(self):
+        """Test the in-memory backend ranks like the Postgres backend."""
+        type_limits = {type_name: None for type_name in SEARCH_MODELS}
+        for term in ['abcd 123', 'bcd', 'zyx', '123', 'nothing']:
+            with self.subTest(term=term):
+                self.assertEqual(
+                    InMemoryTrigramBackend().search(term, type_limits),
+                    PostgresTrigramBackend().search(term, type_limits),
+                )
+
+    def test_memory_backend_limit(self):
+        """Test the in-memory backend keeps the best matches."""
+        ranked = InMemoryTrigramBackend().rank('artist', 'abcd 123', 2)
+
+        self.assertEqual(
+            ranked,
+            PostgresTrigramBackend().rank('artist', 'abcd 123', 2),
+        )
+        self.assertEqual(len(ranked), 2)
+
+    def test_memory_backend_sees_new_names(self):
+        """Test the in-memory index is rebuilt after names change."""
+        backend = InMemoryTrigramBackend()
+        backend.rank('artist', 'qwerty')
+
+        artist = Artist.objects.create(name='qwerty')
+
+        self.assertEqual(backend.rank('artist', 'qwerty')[0][0], artist.id)
+
+    def test_memory_backend_patches_renames(self):
+        """Test renamed objects are patched in without indexing again."""
+        backend = InMemoryTrigramBackend()
+        backend.rank('artist', 'qwerty')
+        artist = Artist.objects.get(name='abcde 123')
+
+        with patch.object(backend, '_build') as build:
+            artist.name = 'qwerty'
+            artist.save()
+            ranked = backend.rank('artist', 'qwerty')
+            stale = backend.rank('artist', 'abcde 123')
+
+        build.assert_not_called()
+        self.assertEqual(ranked[0][0], artist.id)
+        self.assertNotIn(artist.id, [pk for pk, _score in stale])
+
+    @override_settings(SEARCH_BACKEND=MEMORY_BACKEND)
+    def test_search_api_with_memory_backend(self):
+        """Test the search API uses the configured backend."""
+        artist = Artist.objects.get(name='abcde 123')
+
+        res = APIClient().get(
+            SEARCH_URL,
+            {'term': 'abcde 123', 'types': 'artist', 'limit': 1},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [SearchSerializer(artist).data])
+
+    def test_benchmark_command(self):
+        """Test the benchmark command reports every backend."""
+        out = StringIO()
+
+        call_command('benchmark_search', '--repeat', '1', stdout=out)
+
+        self.assertIn('postgres', out.getvalue())
+        self.assertIn('memory', out.getvalue())
+        self.assertIn('Identical rankings for 10 of 10 terms.', out.getvalue())
@@ -0,0 +1,102 @@
+"""
+Tests for the search result cache.
+"""
+from unittest.mock import Mock, patch
+
+from django.test import SimpleTestCase
+
+from core.cache import LRUCache
+from search.cache import SearchCache, normalize_term
+
+
+class NormalizeTermTests(SimpleTestCase):
+    """Test search term normalization."""
+
+    def test_normalize_term(self):
+        """Test case, accents and whitespace are folded."""
+        self.assertEqual(normalize_term('  Beyoncé\tKNOWLES '), 'beyonce knowles')
+        self.assertEqual(normalize_term('Sigur Rós'), normalize_term('sigur ros'))
+
+
+class LRUCacheTests(SimpleTestCase):
+    """Test the in-process LRU cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    @patch('core.cache.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        """Test entries are dropped after their timeout."""
+        patched_monotonic.return_value = 100
+        cache = LRUCache(timeout=10)
+        cache.set('a', 1)
+
+        patched_monotonic.return_value = 111
+
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_hit_ratio(self):
+        """Test hits and misses are counted."""
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+
+        self.assertEqual(cache.hit_ratio, 0.5)
+
+
+class SearchCacheTests(SimpleTestCase):
+    """Test the two tier search cache."""
+
+    def setUp(self):
+        self.cache = SearchCache()
+        self.cache.invalidate()
+
+    def test_get_or_compute_caches_results(self):
+        """Test results are only computed once per term."""
+        compute = Mock(return_value=[('artist', 1, 0.5)])
+
+        self.cache.get_or_compute('abc', compute)
+        results = self.cache.get_or_compute('abc', compute)
+
+        self.assertEqual(results, [('artist', 1, 0.5)])
+        compute.assert_called_once_with('abc')
+
+    def test_shared_tier_serves_other_workers(self):
+        """Test a cold local tier falls back to the shared cache."""
+        self.cache.set('abc', [('genre', 2, 0.4)])
+        other = SearchCache()
+
+        self.assertEqual(other.get('abc'), [('genre', 2, 0.4)])
+
+    def test_invalidate_drops_both_tiers(self):
+        """Test invalidation hides results in local and shared tiers."""
+        self.cache.set('abc', [('genre', 2, 0.4)])
+        other = SearchCache()
+
+        self.cache.invalidate()
+
+        self.assertIsNone(self.cache.get('abc'))
+        self.assertIsNone(other.get('abc'))
+
+    def test_changes_logged_per_type(self):
+        """Test changed ids are logged until a full invalidation."""
+        since = self.cache.generation('artist')
+
+        self.cache.invalidate('artist', [1])
+        self.cache.invalidate('artist', [2])
+
+        self.assertEqual(self.cache.changes('artist', since),
+                         (since + 2, {1, 2}))
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.changes('artist', since)[1])
@@ -0,0 +1,126 @@
+"""
+Tests for search spelling suggestions.
+"""
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Artist, Genre
+
+from search.cache import search_cache
+from search.spelling import (
+    edit_distance,
+    build_dictionary,
+    save_dictionary,
+    get_dictionary,
+    suggest,
+)
+
+
+SEARCH_URL = reverse('search:search')
+
+
+class EditDistanceTests(SimpleTestCase):
+    """Test the bounded edit distance."""
+
+    def test_edit_distance(self):
+        """Test insertions, deletions, substitutions and transpositions."""
+        self.assertEqual(edit_distance('radiohead', 'radiohead', 2), 0)
+        self.assertEqual(edit_distance('radiohed', 'radiohead', 2), 1)
+        self.assertEqual(edit_distance('raidohead', 'radiohead', 2), 1)
+        self.assertEqual(edit_distance('radiohat', 'radiohead', 2), 2)
+
+    def test_edit_distance_bounded(self):
+        """Test distances above the bound are rejected."""
+        self.assertIsNone(edit_distance('abc', 'xyz', 2))
+        self.assertIsNone(edit_distance('a', 'abcd', 2))
+
+
+class SymSpellTests(SimpleTestCase):
+    """Test dictionary lookups."""
+
+    def setUp(self):
+        self.dictionary = build_dictionary([
+            'Radiohead', 'Kid A', 'Rain Dogs', 'Post-Punk', 'Radio',
+        ])
+
+    def test_lookup_orders_by_distance(self):
+        """Test the closest words are suggested first."""
+        suggestions = self.dictionary.lookup('radiohed')
+
+        self.assertEqual(suggestions[0], ('radiohead', 1, 1))
+
+    def test_lookup_words_inside_names(self):
+        """Test words of multi word names are indexed."""
+        self.assertEqual(self.dictionary.lookup('dgos')[0][0], 'dogs')
+
+    def test_lookup_beyond_max_distance(self):
+        """Test nothing is suggested for distant terms."""
+        self.assertEqual(self.dictionary.lookup('zzzzzz'), [])
+
+
+class SuggestionTests(TestCase):
+    """Test suggestions from the dictionary on disk."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'spelling.json')
+        self.settings_override = override_settings(
+            SEARCH_SPELLING_DICTIONARY=self.path
+        )
+        self.settings_override.enable()
+        search_cache.invalidate()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def test_missing_dictionary(self):
+        """Test no suggestions are made before the dictionary is built."""
+        self.assertIsNone(get_dictionary())
+        self.assertEqual(suggest('radiohed'), [])
+
+    def test_dictionary_reloaded_when_rebuilt(self):
+        """Test a rebuilt dictionary replaces the loaded one."""
+        save_dictionary(build_dictionary(['Radiohead']), self.path)
+        self.assertEqual(suggest('radiohed'), ['radiohead'])
+
+        save_dictionary(build_dictionary(['Portishead']), self.path)
+        os.utime(self.path, ns=(0, 0))
+
+        self.assertEqual(suggest('portshead'), ['portishead'])
+
+    def test_suggest_corrects_each_word(self):
+        """Test phrases are corrected word by word."""
+        save_dictionary(build_dictionary(['Rain Dogs', 'Kid A']), self.path)
+
+        self.assertEqual(suggest('kid dgos'), ['kid dogs'])
+
+    def test_build_command_and_search_suggestions(self):
+        """Test zero result searches suggest catalog names."""
+        Artist.objects.create(name='Radiohead')
+        Genre.objects.create(name='Shoegaze')
+        call_command('build_spelling_dictionary', stdout=StringIO())
+
+        res = APIClient().get(SEARCH_URL, {'term': 'shoegzae'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['suggestions'], ['shoegaze'])
+
+    def test_no_suggestions_for_good_searches(self):
+        """Test searches with enough results skip suggestions."""
+        for name in ['Shoegaze', 'Shoegazer', 'Shoegazing']:
+            Genre.objects.create(name=name)
+        call_command('build_spelling_dictionary', stdout=StringIO())
+
+        res = APIClient().get(SEARCH_URL, {'term': 'shoegaze'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['suggestions'], [])
@@ -10,6 +10,7 @@ from django.urls import (
 from rest_framework.routers import DefaultRouter
 
 
+from core.async_views import async_views_enabled
 from search import views
 
 # router = DefaultRouter()
@@ -17,6 +18,11 @@ from search import views
 
 app_name = 'search'
 
+if async_views_enabled():
+    search_view = views.search_async
+else:
+    search_view = views.Search.as_view({'get': 'list'})
+
 urlpatterns = [
-    path('', views.Search.as_view({'get': 'list'}), name='search')
+    path('', search_view, name='search')
 ]
\ No newline at end of file
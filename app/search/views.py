@@ -1,10 +1,23 @@
+import asyncio
+
 from django.shortcuts import render
 from rest_framework import serializers, fields, views, generics, viewsets
-from core.models import Artist, Album, List, Genre
-from django.contrib.postgres.search import TrigramSimilarity
+from rest_framework.exceptions import ValidationError
+from core.models import Artist
 from search.serializers import SearchSerializer
-from itertools import chain
-from operator import attrgetter
+from search.cache import normalize_term, search_cache, search_variant
+from search.results import SearchResults, SEARCH_MODELS
+from search.backends import get_backend
+from search.spelling import suggest
+from search.analytics import term_recorder
+from core.async_views import (
+    InvalidPage,
+    page_bounds,
+    paginated_data,
+    run_sync,
+    serve,
+)
+from django.conf import settings
 
 
 from drf_spectacular.utils import (
@@ -23,6 +36,21 @@ from drf_spectacular.utils import (
                 'term',
                 OpenApiTypes.STR,
                 description='Search Term'),
+            OpenApiParameter(
+                'types',
+                OpenApiTypes.STR,
+                description='Comma separated list of result types to '
+                            'search: artist, album, list, genre'),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Maximum number of results per type'),
+        ] + [
+            OpenApiParameter(
+                f'{type_name}_limit',
+                OpenApiTypes.INT,
+                description=f'Maximum number of {type_name} results')
+            for type_name in SEARCH_MODELS
         ],
         responses=OpenApiResponse(
         )
@@ -32,31 +60,103 @@ from drf_spectacular.utils import (
 class Search(viewsets.ReadOnlyModelViewSet):
     serializer_class = SearchSerializer
 
+    def _params_to_limit(self, name):
+        """Convert a limit query parameter to a positive integer."""
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        try:
+            limit = int(value)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError({name: 'Must be a positive integer.'})
+        return limit
+
+    def _get_type_limits(self):
+        """Return the requested result types mapped to their limits."""
+        types = self.request.query_params.get('types')
+        if types:
+            types = [type_name.strip() for type_name in types.split(',')]
+            unknown = [t for t in types if t not in SEARCH_MODELS]
+            if unknown:
+                raise ValidationError(
+                    {'types': f'Unknown types: {", ".join(unknown)}.'}
+                )
+        else:
+            types = list(SEARCH_MODELS)
+        limit = self._params_to_limit('limit')
+        type_limits = {}
+        for type_name in SEARCH_MODELS:
+            if type_name in types:
+                type_limit = self._params_to_limit(f'{type_name}_limit')
+                type_limits[type_name] = type_limit or limit
+        return type_limits
+
+    def list(self, request, *args, **kwargs):
+        """List results, suggesting corrections when there are few."""
+        response = super().list(request, *args, **kwargs)
+        term = normalize_term(request.query_params.get('term', ''))
+        if term:
+            term_recorder.record(term)
+        suggestions = []
+        if term and response.data['count'] < getattr(
+                settings, 'SEARCH_SUGGESTION_THRESHOLD', 3):
+            suggestions = suggest(term)
+        response.data['suggestions'] = suggestions
+        return response
+
     def get_queryset(self):
-        term = self.request.query_params.get('term', None)
+        term = normalize_term(self.request.query_params.get('term', ''))
         if term:
-            artist_res = Artist.objects.all().annotate(
-                    similarity=TrigramSimilarity('name', term)
-                ).filter(
-                    similarity__gt=0.3
-                )
-            album_res = Album.objects.all().annotate(
-                    similarity=TrigramSimilarity('title', term)
-                ).filter(
-                    similarity__gt=0.3
-                )
-            list_res = List.objects.all().annotate(
-                    similarity=TrigramSimilarity('label', term)
-                ).filter(
-                    similarity__gt=0.3
-                )
-            genre_res = Genre.objects.all().annotate(
-                    similarity=TrigramSimilarity('name', term)
-                ).filter(
-                    similarity__gt=0.3
-                )
-            full_res = list(chain(artist_res, album_res, list_res, genre_res))
-            return sorted(full_res, key=attrgetter('similarity'), reverse=True)
+            type_limits = self._get_type_limits()
+            refs = search_cache.get_or_compute(
+                term,
+                lambda term: get_backend().search(term, type_limits),
+                variant=search_variant(type_limits),
+            )
+            return SearchResults(refs)
         else:
             return Artist.objects.none()
 
+
+def _serialize(results):
+    return SearchSerializer(results, many=True).data
+
+
+async def search_async(request):
+    """Serve Search.list from the ASGI application.
+
+    The requested types are ranked concurrently, then the objects of the
+    page are loaded one type per query, also concurrently.
+    """
+    return await serve(Search, request, 'list', _search)
+
+
+async def _search(view):
+    request = view.request
+    term = normalize_term(request.query_params.get('term', ''))
+    type_limits = view._get_type_limits() if term else {}
+    number, start, stop = page_bounds(request)
+
+    refs = []
+    if term:
+        variant = search_variant(type_limits)
+        refs = await run_sync(search_cache.get, term, variant)
+        if refs is None:
+            refs = await get_backend().asearch(term, type_limits)
+            await run_sync(search_cache.set, term, refs, variant)
+        await run_sync(term_recorder.record, term)
+    if number > 1 and start >= len(refs):
+        raise InvalidPage()
+
+    results = await SearchResults(refs).aslice(start, stop)
+    jobs = [run_sync(_serialize, results)]
+    if term and len(refs) < getattr(
+            settings, 'SEARCH_SUGGESTION_THRESHOLD', 3):
+        jobs.append(run_sync(suggest, term))
+    data, *suggestions = await asyncio.gather(*jobs)
+    return {
+        **paginated_data(request, number, len(refs), data),
+        'suggestions': suggestions[0] if suggestions else [],
+    }
@@ -0,0 +1,120 @@
+"""
+Token authentication with cached token lookups.
+
+The id and flags of resolved users are kept per token key in a small
+in-process LRU and in the shared Django cache, so most authenticated
+requests skip the token and user query. Password hashes and profiles are
+never cached; users are rebuilt with those fields deferred. Entries are
+dropped when the user is saved or the token deleted. The local tier of
+other workers can't be reached and relies on its short timeout instead,
+so the shared tier has to be shared by every worker, see CACHES.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+
+from core import metrics
+from core.cache import LRUCache
+
+
+class TokenCache:
+    """Cache the user owning each token key.
+
+    Only the fields authentication and permission checks read are stored.
+    Any other field of a cached user is loaded from the database when it's
+    first read.
+    """
+
+    fields = ('id', 'is_active', 'is_staff', 'is_superuser')
+
+    def __init__(self, alias='default', timeout=60, local_maxsize=4096,
+                 local_timeout=5):
+        self.alias = alias
+        self.timeout = timeout
+        self.local = LRUCache(maxsize=local_maxsize, timeout=local_timeout)
+        self.shared_hits = 0
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    @property
+    def hit_ratio(self):
+        """Return the share of lookups served from either tier."""
+        total = self.local.hits + self.local.misses
+        hits = self.local.hits + self.shared_hits
+        return hits / total if total else 0.0
+
+    def _key(self, key):
+        # Hashed so raw tokens are never stored in the shared cache.
+        return f'token:{hashlib.sha256(key.encode("utf-8")).hexdigest()}'
+
+    def get(self, key):
+        """Return the cached user of a token key or None.
+
+        Each call builds a new user, so requests can't see each other's
+        changes to it.
+        """
+        values = self.local.get(key)
+        if values is None:
+            values = self.shared.get(self._key(key))
+            if values is None:
+                return None
+            self.shared_hits += 1
+            self.local.set(key, values)
+        model = get_user_model()
+        names = [
+            field.attname for field in model._meta.concrete_fields
+            if field.attname in values
+        ]
+        return model.from_db(None, names, [values[name] for name in names])
+
+    def set(self, key, user):
+        """Store the user of a token key in both tiers."""
+        values = {field: getattr(user, field) for field in self.fields}
+        self.shared.set(self._key(key), values, timeout=self.timeout)
+        self.local.set(key, values)
+
+    def delete(self, key):
+        """Forget a token key in both tiers."""
+        self.shared.delete(self._key(key))
+        self.local.delete(key)
+
+    def invalidate_user(self, user):
+        """Forget the tokens of a user."""
+        for key in Token.objects.filter(user=user).values_list(
+                'key', flat=True):
+            self.delete(key)
+
+
+token_cache = TokenCache(**{
+    key.lower(): value
+    for key, value in getattr(settings, 'TOKEN_CACHE', {}).items()
+})
+
+
+@metrics.registry.collector
+def _collect_token_cache():
+    metrics.record_cache('token', token_cache.local, token_cache.shared_hits)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication answering repeated tokens from the cache."""
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is not None:
+            if not user.is_active:
+                token_cache.delete(key)
+                raise AuthenticationFailed(_('User inactive or deleted.'))
+            return user, Token(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user)
+        return user, token
@@ -0,0 +1,70 @@
+"""
+Password hashing on a bounded pool of worker threads.
+
+PBKDF2 releases the GIL while it runs, so capping the threads allowed to
+hash caps the CPU a burst of sign ins can take from a worker process. When
+every thread is busy and the queue is full, hashing fails fast with a 503
+instead of piling up.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    """Raised when the hashing pool has no room for another password."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many sign ins in progress, try again shortly.')
+    default_code = 'hashing_busy'
+
+
+class HashingPool:
+    """Run hashing on up to workers threads, queueing up to queue_size."""
+
+    def __init__(self, workers=0, queue_size=16):
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix='password-hashing',
+                )
+            return self._executor
+
+    def run(self, func, *args, **kwargs):
+        """Return func(*args, **kwargs), run on the pool if it has one."""
+        if not self.workers:
+            return func(*args, **kwargs)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            return self._get_executor().submit(func, *args, **kwargs).result()
+        finally:
+            self._slots.release()
+
+
+hashing_pool = HashingPool(**{
+    key.lower(): value
+    for key, value in getattr(settings, 'PASSWORD_HASHING_POOL', {}).items()
+})
+
+
+class PooledPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher running on the hashing pool.
+
+    It uses the same algorithm name, so existing hashes verify unchanged.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        return hashing_pool.run(super().encode, password, salt, iterations)
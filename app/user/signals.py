@@ -0,0 +1,23 @@
+"""
+Signal handlers keeping cached token lookups fresh.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import token_cache
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_on_user_save(sender, instance, created, **kwargs):
+    """Drop cached tokens of a user whose password or status may change."""
+    if not created:
+        token_cache.invalidate_user(instance)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_on_token_delete(sender, instance, **kwargs):
+    """Drop a deleted token, as on logout."""
+    token_cache.delete(instance.key)
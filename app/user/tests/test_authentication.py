@@ -0,0 +1,151 @@
+"""
+Tests for cached token authentication.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import CachedTokenAuthentication, token_cache
+
+
+ME_URL = reverse('user:me')
+LOGOUT_URL = reverse('user:logout')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating with cached tokens."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.delete(self.token.key)
+
+    def test_repeated_requests_skip_token_query(self):
+        """Test a cached token is authenticated without token queries."""
+        self.client.get(ME_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(ME_URL)
+
+        self.assertFalse(
+            any('authtoken_token' in query['sql'] for query in queries)
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'Test Name')
+
+    def test_authentication_without_queries(self):
+        """Test authenticating a cached token runs no query at all."""
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(self.token.key)
+
+        with self.assertNumQueries(0):
+            user, _token = authentication.authenticate_credentials(
+                self.token.key,
+            )
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertTrue(user.is_active)
+
+    def test_password_not_cached(self):
+        """Test the password hash and profile stay out of the cache."""
+        token_cache.set(self.token.key, self.user)
+
+        cached = token_cache.shared.get(token_cache._key(self.token.key))
+
+        self.assertEqual(set(cached), set(token_cache.fields))
+
+    def test_shared_tier_refills_local(self):
+        """Test a token evicted locally is served from the shared cache."""
+        self.client.get(ME_URL)
+        token_cache.local.clear()
+        shared_hits = token_cache.shared_hits
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(ME_URL)
+
+        self.assertFalse(
+            any('authtoken_token' in query['sql'] for query in queries)
+        )
+
+        self.assertEqual(token_cache.shared_hits, shared_hits + 1)
+        self.assertIn(self.token.key, token_cache.local)
+
+    def test_profile_update_invalidates(self):
+        """Test updating the user drops the cached user."""
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'New Name'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    def test_deactivation_invalidates(self):
+        """Test a deactivated user can't use a cached token."""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_inactive_user_rejected(self):
+        """Test a stale cache entry of an inactive user is not accepted."""
+        self.user.is_active = False
+        token_cache.set(self.token.key, self.user)
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_cached_user_not_shared(self):
+        """Test each request gets its own copy of a cached user."""
+        authentication = CachedTokenAuthentication()
+        token_cache.set(self.token.key, self.user)
+
+        first, _token = authentication.authenticate_credentials(
+            self.token.key,
+        )
+        first.name = 'Changed'
+        second, _token = authentication.authenticate_credentials(
+            self.token.key,
+        )
+
+        self.assertIsNot(first, second)
+        self.assertEqual(second.name, 'Test Name')
+
+    def test_logout_invalidates(self):
+        """Test logging out deletes the token and its cache entry."""
+        self.client.get(ME_URL)
+
+        res = self.client.post(LOGOUT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_hit_ratio(self):
+        """Test the hit ratio counts lookups served from the cache."""
+        token_cache.local.hits = token_cache.local.misses = 0
+        token_cache.shared_hits = 0
+
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+
+        self.assertEqual(token_cache.hit_ratio, 0.5)
@@ -0,0 +1,181 @@
+"""
+Tests for throttling and pooling password hashing.
+"""
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+
+from user.hashers import HashingBusy, HashingPool
+from user.throttling import AuthIPThrottle
+
+
+CREATE_USER_URL = reverse('user:create')
+TOKEN_URL = reverse('user:token')
+
+RATES = {
+    'REST_FRAMEWORK': {
+        'DEFAULT_THROTTLE_RATES': {
+            'auth_ip': '3/min',
+            'auth_email': '2/min',
+        },
+    },
+}
+
+# Buckets drained here mustn't throttle the requests of other tests.
+THROTTLE_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'throttle-tests',
+    },
+}
+
+
+@override_settings(CACHES=THROTTLE_CACHES)
+class TokenBucketTests(SimpleTestCase):
+    """Test the token bucket algorithm."""
+
+    def setUp(self):
+        cache.clear()
+        self.request = APIRequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        self.now = 1000.0
+
+    def _allow(self):
+        with override_settings(**RATES):
+            throttle = AuthIPThrottle()
+        throttle.timer = lambda: self.now
+        return throttle.allow_request(self.request, None), throttle
+
+    def test_burst_then_refill(self):
+        """Test a full bucket allows a burst and refills over time."""
+        self.assertEqual([self._allow()[0] for _ in range(4)],
+                         [True, True, True, False])
+
+        allowed, throttle = self._allow()
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 20.0)
+
+        self.now += 20
+        self.assertTrue(self._allow()[0])
+        self.assertFalse(self._allow()[0])
+
+    def test_buckets_per_address(self):
+        """Test each address has its own bucket."""
+        for _ in range(3):
+            self._allow()
+        self.request = APIRequestFactory().post('/', REMOTE_ADDR='10.0.0.2')
+
+        self.assertTrue(self._allow()[0])
+
+
+@override_settings(CACHES=THROTTLE_CACHES, **RATES)
+class AuthThrottleAPITests(TestCase):
+    """Test throttling the endpoints that hash passwords."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        get_user_model().objects.create_user('test@example.com', 'goodpass')
+
+    def tearDown(self):
+        cache.clear()
+
+    @patch('user.serializers.authenticate')
+    def test_throttled_login_skips_authenticate(self, patched_authenticate):
+        """Test throttled sign ins are rejected before authenticating."""
+        patched_authenticate.return_value = None
+        payload = {'email': 'test@example.com', 'password': 'badpass'}
+        for _ in range(2):
+            self.client.post(TOKEN_URL, payload)
+        patched_authenticate.reset_mock()
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        patched_authenticate.assert_not_called()
+
+    def test_email_bucket_ignores_case(self):
+        """Test the per email bucket is shared by differently cased emails."""
+        for email in ['test@example.com', 'TEST@example.com']:
+            self.client.post(TOKEN_URL, {'email': email, 'password': 'x'})
+
+        res = self.client.post(
+            TOKEN_URL, {'email': 'Test@Example.com', 'password': 'goodpass'},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_body_without_email_throttled_per_address(self):
+        """Test bodies that aren't objects fall back to the address."""
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, [1], format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, 'x', format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_signup_throttled_per_address(self):
+        """Test creating users is throttled per client address."""
+        for index in range(3):
+            self.client.post(CREATE_USER_URL, {
+                'email': f'user{index}@example.com',
+                'password': 'testpass123',
+                'name': 'Test Name',
+            })
+
+        res = self.client.post(CREATE_USER_URL, {
+            'email': 'user3@example.com',
+            'password': 'testpass123',
+            'name': 'Test Name',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertFalse(
+            get_user_model().objects.filter(email='user3@example.com').exists()
+        )
+
+
+class HashingPoolTests(SimpleTestCase):
+    """Test running hashing on a bounded pool."""
+
+    def test_inline_without_workers(self):
+        """Test functions run in the calling thread without workers."""
+        pool = HashingPool(workers=0)
+
+        self.assertEqual(pool.run(threading.get_ident), threading.get_ident())
+
+    def test_runs_on_worker_thread(self):
+        """Test functions run on the pool's threads."""
+        pool = HashingPool(workers=1)
+
+        name = pool.run(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith('password-hashing'))
+
+    def test_full_pool_fails_fast(self):
+        """Test a call is rejected when every slot is taken."""
+        pool = HashingPool(workers=1, queue_size=0)
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            started.set()
+            release.wait()
+
+        worker = threading.Thread(target=pool.run, args=(hold,))
+        worker.start()
+        started.wait()
+        try:
+            with self.assertRaises(HashingBusy):
+                pool.run(lambda: None)
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(pool.run(lambda: 1), 1)
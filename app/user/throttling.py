@@ -0,0 +1,80 @@
+"""
+Token bucket throttles for the endpoints that hash passwords.
+
+Buckets hold up to the number of requests of their rate and refill evenly
+over its period. They're kept in the default Django cache, so every worker
+draws from the same bucket as long as CACHES is shared between them, as it
+is with REDIS_URL set. Throttles run before the view, so a rejected request
+never reaches password hashing.
+"""
+import hashlib
+from collections.abc import Mapping
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Allow bursts up to a rate's request count, refilling over its period.
+
+    Reading and writing a bucket isn't atomic, so concurrent requests may
+    occasionally both take the last token.
+    """
+
+    def get_rate(self):
+        # Rates are looked up when the throttle is created rather than
+        # when the class is, so they follow settings changes.
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        return super().get_rate()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        refill = self.num_requests / self.duration
+        tokens, updated = self.cache.get(self.key, (self.num_requests, now))
+        tokens = min(self.num_requests, tokens + (now - updated) * refill)
+        if tokens < 1:
+            self.wait_time = (1 - tokens) / refill
+            return False
+        # An untouched bucket is full again once a whole period passed.
+        self.cache.set(self.key, (tokens - 1, now), self.duration)
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class AuthIPThrottle(TokenBucketThrottle):
+    """Throttle password hashing requests per client address."""
+    scope = 'auth_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class AuthEmailThrottle(TokenBucketThrottle):
+    """Throttle sign in attempts per account email.
+
+    Requests without a usable email draw from a bucket of their address.
+    """
+    scope = 'auth_email'
+
+    def get_cache_key(self, request, view):
+        email = None
+        if isinstance(request.data, Mapping):
+            email = request.data.get('email')
+        if isinstance(email, str) and email.strip():
+            ident = hashlib.sha256(
+                email.strip().lower().encode('utf-8')
+            ).hexdigest()
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
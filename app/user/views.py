@@ -1,10 +1,17 @@
 """
 Views for the user API.
 """
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+
+from rest_framework import generics, permissions, status, views
+from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from user.authentication import CachedTokenAuthentication
+from user.throttling import AuthEmailThrottle, AuthIPThrottle
+
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -14,20 +21,36 @@ from user.serializers import (
 class CreateUserView(generics.CreateAPIView):
     """Create a new user in the system."""
     serializer_class = UserSerializer
+    throttle_classes = [AuthIPThrottle]
 
 
 class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [AuthIPThrottle, AuthEmailThrottle]
 
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        """Retrieve and return the authenticated user."""
-        return self.request.user
\ No newline at end of file
+        """Retrieve and return the authenticated user.
+
+        Loaded in full, as cached token users only carry their flags.
+        """
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+
+class LogoutView(views.APIView):
+    """Delete the auth token of the request."""
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        """Log out by deleting the token used."""
+        Token.objects.filter(key=request.auth.key).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)